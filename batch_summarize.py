@@ -0,0 +1,224 @@
+import argparse
+import asyncio
+import re
+import sys
+import threading
+import time
+import traceback
+import model_backend
+import summary_of_arxiv
+import summary_of_youtube
+from tokens import model_name_of
+
+
+VIDEO_ID_PATTERN = re.compile(r"^[a-zA-Z0-9_-]{11}$")
+
+
+def parse_item(line: str):
+    """
+    입력 줄을 (kind, key)로 바꾼다. kind는 "arxiv" 또는 "youtube"이고,
+    key는 각 FileStore에서 쓰는 key(PDF URL 또는 video id)이다.
+    """
+
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+
+    if "arxiv.org/" in line:
+        return "arxiv", summary_of_arxiv.normalize_url(line)
+
+    if "youtube.com/" in line or "youtu.be/" in line:
+        video_id = summary_of_youtube.extract_video_id(line)
+        if not video_id and "youtu.be/" in line:
+            video_id = line.rstrip("/").rsplit("/", 1)[-1].split("?")[0]
+        return ("youtube", video_id) if video_id else None
+
+    if VIDEO_ID_PATTERN.match(line):
+        return "youtube", line
+
+    return None
+
+
+class RateLimiter:
+    """
+    요청 시작 간격을 60 / requests_per_minute 초 이상으로 유지한다.
+    최종 요약은 wait()로, 작업 스레드에서 보내는 부분 요약은 wait_blocking()으로 같은 간격을 나누어 쓴다.
+    """
+
+    def __init__(self, requests_per_minute: float):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        return delay
+
+    async def wait(self) -> None:
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def wait_blocking(self) -> None:
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class RateLimitedModel:
+    """
+    generate_content를 호출하기 전마다 rate_limiter를 기다린다. 긴 원문을 부분별로 요약하는 요청도 rpm 한도에 들어간다.
+    그 밖의 속성은 감싼 모델(wrapped)의 것을 그대로 쓴다.
+    """
+
+    def __init__(self, model, rate_limiter: RateLimiter):
+        self.wrapped = model
+        self.rate_limiter = rate_limiter
+
+    def __getattr__(self, name):
+        return getattr(self.wrapped, name)
+
+    def generate_content(self, contents, **kwargs):
+        self.rate_limiter.wait_blocking()
+        return self.wrapped.generate_content(contents, **kwargs)
+
+
+def _is_rate_limited(error: Exception) -> bool:
+    try:
+        from google.api_core import exceptions
+    except ImportError:
+        return False
+    return isinstance(error, (exceptions.ResourceExhausted, exceptions.ServiceUnavailable))
+
+
+class BatchRunner:
+    def __init__(self, model, concurrency: int, requests_per_minute: float, retries: int):
+        self.model = model
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.rate_limiter = RateLimiter(requests_per_minute)
+        # 원문을 가져오는 단계의 부분 요약 요청도 같은 rpm 한도를 따른다.
+        self.map_model = RateLimitedModel(model, self.rate_limiter)
+        self.retries = retries
+
+        self.stats = {"done": 0, "skipped": 0, "failed": 0,
+                      "fetch_seconds": 0.0, "generate_seconds": 0.0, "chars": 0}
+
+    def _cache(self, kind: str):
+        return summary_of_arxiv.cache if kind == "arxiv" else summary_of_youtube.cache
+
+    def _fetch(self, kind: str, key: str) -> list:
+        """
+        원문을 가져와 요약 요청 contents를 만든다. 긴 원문은 이 단계에서 부분별로 요약되며, 부분 요약 요청도 rpm 한도를 따른다.
+        """
+
+        module = summary_of_arxiv if kind == "arxiv" else summary_of_youtube
+        info = {}
+        contents = module.build_contents(key, self.map_model, info)
+        if info.get("parts"):
+            print(f"  {key}: summarized in {info['parts']} parts.", file=sys.stderr)
+        return contents
+
+    def _generate(self, contents: list) -> str:
+        response = self.model.generate_content(contents, stream=True)
+        return "".join(chunk.text for chunk in response)
+
+    async def run_item(self, kind: str, key: str) -> None:
+        cache = self._cache(kind)
+        model_name = model_name_of(self.model)
+
+        # 현재 버전의 요약이 있으면 건너뛴다. 중단된 작업을 다시 실행하면 남은 항목만 처리되고,
+        # 모델이나 요약 지침을 바꾼 뒤 실행하면 이전 버전 요약을 rpm 한도 안에서 다시 만든다.
+        if cache.get(key, model_name)[1]:
+            self.stats["skipped"] += 1
+            return
+
+        async with self.semaphore:
+            try:
+                item_start = start = time.perf_counter()
+                contents = await asyncio.to_thread(self._fetch, kind, key)
+                self.stats["fetch_seconds"] += time.perf_counter() - start
+
+                for attempt in range(self.retries + 1):
+                    await self.rate_limiter.wait()
+                    start = time.perf_counter()
+                    try:
+                        summary = await asyncio.to_thread(self._generate, contents)
+                        break
+                    except Exception as e:
+                        if attempt == self.retries or not _is_rate_limited(e):
+                            raise
+                        await asyncio.sleep(2 ** attempt * 5)
+                    finally:
+                        self.stats["generate_seconds"] += time.perf_counter() - start
+
+                if not summary:
+                    raise ValueError("The model returned an empty summary.")
+
+                cache.put(key, summary, model_name, time.perf_counter() - item_start)
+                self.stats["done"] += 1
+                self.stats["chars"] += len(summary)
+                print(f"[done] {kind} {key}", file=sys.stderr)
+            except Exception as e:
+                traceback.print_exc()
+                self.stats["failed"] += 1
+                print(f"[failed] {kind} {key}: {e}", file=sys.stderr)
+
+    async def run(self, items: list) -> None:
+        await asyncio.gather(*(self.run_item(kind, key) for kind, key in items))
+
+
+def read_items(path: str) -> list:
+    if path == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+
+    items = []
+    seen = set()
+    for line in lines:
+        item = parse_item(line)
+        if item is None:
+            if line.strip() and not line.strip().startswith("#"):
+                print(f"Skipping unrecognized line: {line}", file=sys.stderr)
+            continue
+        if item not in seen:
+            seen.add(item)
+            items.append(item)
+    return items
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Summarize arXiv papers and YouTube videos in bulk into the FileStore caches.")
+    parser.add_argument("input", help="File with one arXiv URL or YouTube URL/ID per line, or - for stdin.")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rpm", type=float, default=10, help="Maximum model requests per minute.")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--model", default=model_backend.MODEL_NAME)
+    args = parser.parse_args()
+
+    items = read_items(args.input)
+    runner = BatchRunner(model_backend.get_model(args.model), args.concurrency, args.rpm, args.retries)
+
+    start = time.perf_counter()
+    asyncio.run(runner.run(items))
+    elapsed = time.perf_counter() - start
+
+    stats = runner.stats
+    print(f"{len(items)} items: {stats['done']} done, {stats['skipped']} skipped, "
+          f"{stats['failed']} failed in {elapsed:.1f}s")
+    if stats["done"]:
+        print(f"  throughput: {stats['done'] / elapsed * 60:.2f} summaries/min, "
+              f"{stats['chars'] / elapsed:.0f} chars/s")
+        print(f"  fetch:      {stats['fetch_seconds'] / stats['done']:.2f}s per item")
+        print(f"  generate:   {stats['generate_seconds'] / stats['done']:.2f}s per item")
+
+    sys.exit(1 if stats["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
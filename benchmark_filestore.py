@@ -0,0 +1,84 @@
+import argparse
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from filestore import FileStore, SqliteStore
+from percentiles import percentile
+
+
+def fill(store, num_keys, value):
+    items = [(f"https://arxiv.org/pdf/{i:07d}", value) for i in range(num_keys)]
+
+    start = time.perf_counter()
+    store.set_many(items)
+    return time.perf_counter() - start
+
+
+def measure_lookups(store, names):
+    latencies = []
+    for name in names:
+        start = time.perf_counter()
+        store[name]
+        latencies.append(time.perf_counter() - start)
+
+    latencies.sort()
+    return latencies
+
+
+def report(label, fill_time, hit_latencies, miss_latencies, batch_time, batch_size):
+    def us(seconds):
+        return f"{seconds * 1e6:8.1f}us"
+
+    print(f"[{label}]")
+    print(f"  fill:         {fill_time:8.2f}s")
+    print(f"  hit  mean {us(statistics.mean(hit_latencies))}  "
+          f"p50 {us(percentile(hit_latencies, 50))}  p99 {us(percentile(hit_latencies, 99))}")
+    print(f"  miss mean {us(statistics.mean(miss_latencies))}  "
+          f"p50 {us(percentile(miss_latencies, 50))}  p99 {us(percentile(miss_latencies, 99))}")
+    print(f"  get_many({batch_size}): {batch_time * 1e3:8.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare lookup latency of FileStore and SqliteStore.")
+    parser.add_argument("--keys", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=10000)
+    parser.add_argument("--value-size", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    value = "가" * (args.value_size // 3) or "x"
+    rng = random.Random(0)
+    hits = [f"https://arxiv.org/pdf/{rng.randrange(args.keys):07d}"
+            for _ in range(args.lookups)]
+    misses = [f"https://arxiv.org/abs/{i:07d}" for i in range(args.lookups)]
+    batch = hits[:args.batch_size]
+
+    work_dir = tempfile.mkdtemp(prefix="filestore-bench-")
+    try:
+        stores = [
+            ("FileStore", FileStore(os.path.join(work_dir, "files"))),
+            ("SqliteStore", SqliteStore(os.path.join(work_dir, "store.sqlite3"))),
+        ]
+
+        print(f"{args.keys} keys, {args.lookups} lookups, {len(value.encode('utf-8'))} byte values")
+
+        for label, store in stores:
+            fill_time = fill(store, args.keys, value)
+            hit_latencies = measure_lookups(store, hits)
+            miss_latencies = measure_lookups(store, misses)
+
+            start = time.perf_counter()
+            store.get_many(batch)
+            batch_time = time.perf_counter() - start
+
+            report(label, fill_time, hit_latencies, miss_latencies, batch_time, len(batch))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import argparse
+import glob
+import os
+import random
+import statistics
+import time
+import html_text
+import model_backend
+from tokens import estimate_tokens
+
+
+WORDS = ("transformer attention gradient layer token model training loss dataset "
+         "benchmark 모델 학습 데이터 결과 성능 방법 실험").split()
+
+
+def make_page(seed: int, paragraphs: int = 40) -> str:
+    """
+    스크립트, 스타일, 메뉴, 광고가 섞인 블로그 글 형태의 HTML을 만든다.
+    """
+
+    rng = random.Random(seed)
+
+    def words(count):
+        return " ".join(rng.choice(WORDS) for _ in range(count))
+
+    head = ("<head><title>" + words(6) + "</title>"
+            + "<style>" + ".c{color:red;margin:0 auto}" * 200 + "</style>"
+            + "<script>" + "window.dataLayer.push({event:'x'});" * 300 + "</script></head>")
+    nav = ('<nav class="gnb"><ul>'
+           + "".join(f'<li><a href="/category/{i}">{words(2)}</a></li>' for i in range(40))
+           + "</ul></nav>")
+    body = "".join(
+        f'<div class="para" style="padding:4px"><p><span class="t">{words(60)}</span></p></div>'
+        + (f'<div class="ad-banner"><iframe src="/ads/{i}"></iframe></div>' if i % 5 == 0 else "")
+        for i in range(paragraphs)
+    )
+    article = f'<article class="entry"><h1>{words(6)}</h1>{body}</article>'
+    footer = '<footer class="footer">' + words(80) + "</footer>"
+    return f"<!DOCTYPE html><html>{head}<body>{nav}{article}{footer}</body></html>"
+
+
+def load_corpus(paths: list) -> list:
+    if not paths:
+        return [(f"synthetic-{seed}", make_page(seed)) for seed in range(20)]
+
+    files = []
+    for path in paths:
+        files.extend(sorted(glob.glob(os.path.join(path, "*.htm*"))) if os.path.isdir(path) else [path])
+
+    corpus = []
+    for file_path in files:
+        with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+            corpus.append((os.path.basename(file_path), f.read()))
+    return corpus
+
+
+def time_to_first_token(model, prompt: str) -> float:
+    start = time.perf_counter()
+    for _ in model.generate_content([{"role": "user", "parts": [prompt]}], stream=True):
+        return time.perf_counter() - start
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark prompt size and latency of raw HTML versus reduced page text.")
+    parser.add_argument("paths", nargs="*", help="Saved .html files or directories. Synthetic pages if omitted.")
+    parser.add_argument("--max-chars", type=int, default=html_text.MAX_CHARS)
+    parser.add_argument("--backend", choices=["fake", "gemini"],
+                        help="Also measure time to first token for both prompts.")
+    args = parser.parse_args()
+
+    model = model_backend.get_model(backend=args.backend) if args.backend else None
+
+    raw_tokens = []
+    reduced_tokens = []
+    parse_times = []
+    ttft_gains = []
+
+    for name, html in load_corpus(args.paths):
+        start = time.perf_counter()
+        text = html_text.reduce_html([html[i:i + 65536] for i in range(0, len(html), 65536)],
+                                     max_chars=args.max_chars)
+        parse_times.append(time.perf_counter() - start)
+
+        raw_tokens.append(estimate_tokens(html))
+        reduced_tokens.append(estimate_tokens(text))
+
+        line = (f"{name:30.30s} {raw_tokens[-1]:8d} -> {reduced_tokens[-1]:7d} tokens "
+                f"({reduced_tokens[-1] / raw_tokens[-1]:6.1%}), parse {parse_times[-1] * 1e3:6.1f}ms")
+
+        if model:
+            raw_ttft = time_to_first_token(model, html)
+            reduced_ttft = time_to_first_token(model, text)
+            ttft_gains.append(raw_ttft - reduced_ttft)
+            line += f", ttft {raw_ttft * 1e3:7.0f}ms -> {reduced_ttft * 1e3:7.0f}ms"
+
+        print(line)
+
+    print(f"total: {sum(raw_tokens)} -> {sum(reduced_tokens)} tokens "
+          f"({sum(reduced_tokens) / sum(raw_tokens):.1%}), "
+          f"median parse {statistics.median(parse_times) * 1e3:.1f}ms")
+    if ttft_gains:
+        print(f"median ttft gain: {statistics.median(ttft_gains) * 1e3:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
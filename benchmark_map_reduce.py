@@ -0,0 +1,35 @@
+import argparse
+import time
+import map_reduce
+from benchmark_retrieval import make_pages
+from model_backend import FakeModel
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark map-reduce summarization of long documents with the fake model.")
+    parser.add_argument("--pages", type=int, nargs="+", default=[300, 1000])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--ttft", type=float, default=0.2)
+    parser.add_argument("--tokens-per-sec", type=float, default=2000)
+    args = parser.parse_args()
+
+    model = FakeModel(ttft=args.ttft, tokens_per_sec=args.tokens_per_sec)
+
+    for num_pages in args.pages:
+        pages = make_pages(num_pages)
+        chars = sum(len(page) for page in pages)
+
+        for workers in args.workers:
+            info = {}
+            start = time.perf_counter()
+            contents = map_reduce.build_contents(model, pages, "Summarize.", info, max_workers=workers)
+            elapsed = time.perf_counter() - start
+
+            print(f"{num_pages:5d} pages ({chars / 1e6:.1f}M chars), {workers:2d} workers: "
+                  f"{info.get('parts', 0):3d} parts, {info['levels']} levels, "
+                  f"map {elapsed:6.2f}s, reduce prompt {len(contents[0]['parts'][0]) / 1e3:.0f}K chars")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import argparse
+import io
+import random
+import time
+from PyPDF2 import PdfReader
+import pdf_extract
+
+
+WORDS = ("transformer attention gradient layer token model training loss "
+         "dataset benchmark convolution encoder decoder embedding inference").split()
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(num_pages: int, lines_per_page: int = 60, seed: int = 0) -> bytes:
+    """
+    외부 라이브러리 없이 텍스트만 있는 num_pages 페이지짜리 PDF를 만든다.
+    """
+
+    rng = random.Random(seed)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # 페이지 목록은 페이지 객체 번호가 정해진 뒤에 채운다.
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+
+    for page_num in range(num_pages):
+        lines = [f"Page {page_num + 1}"]
+        lines += [" ".join(rng.choice(WORDS) for _ in range(12)) for _ in range(lines_per_page)]
+        content = "BT /F1 9 Tf 11 TL 40 810 Td " + " ".join(
+            f"({_escape(line)}) Tj T*" for line in lines) + " ET"
+        stream = content.encode("latin-1")
+
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id)
+        page_ids.append(len(objects))
+
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, num_pages)
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (i, obj))
+
+    xref_offset = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+              % (len(objects) + 1, xref_offset))
+
+    return out.getvalue()
+
+
+def extract_baseline(pdf_data: bytes) -> str:
+    """
+    기존 코드와 같은 방식: 한 프로세스에서 페이지마다 문자열을 이어 붙인다.
+    """
+
+    reader = PdfReader(io.BytesIO(pdf_data))
+    text = ""
+    for page in reader.pages:
+        text += page.extract_text() or ""
+    return text
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF text extraction.")
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 300, 600])
+    parser.add_argument("--max-chars", type=int, default=30000,
+                        help="Budget used for the early-stop measurement.")
+    args = parser.parse_args()
+
+    print(f"workers: {pdf_extract.MAX_WORKERS}")
+
+    # 프로세스 풀 시작 비용이 첫 측정에 섞이지 않도록 미리 데운다.
+    pdf_extract.extract_text(make_pdf(pdf_extract.MIN_PAGES_FOR_POOL, 1), use_cache=False)
+
+    for num_pages in args.pages:
+        pdf_data = make_pdf(num_pages)
+
+        baseline_time, baseline_text = timed(extract_baseline, pdf_data)
+        parallel_time, (parallel_text, _) = timed(
+            pdf_extract.extract_text, pdf_data, use_cache=False)
+        budget_time, (budget_text, truncated) = timed(
+            pdf_extract.extract_text, pdf_data, max_chars=args.max_chars, use_cache=False)
+
+        assert parallel_text == baseline_text, "parallel extraction changed the text"
+
+        print(f"{num_pages:5d} pages, {len(pdf_data) / 1e6:5.1f} MB, {len(baseline_text):,} chars")
+        print(f"  baseline:           {baseline_time:7.2f}s")
+        print(f"  parallel:           {parallel_time:7.2f}s  ({baseline_time / parallel_time:4.1f}x)")
+        print(f"  max_chars={args.max_chars}: {budget_time:7.2f}s  "
+              f"({len(budget_text):,} chars, truncated={truncated})")
+
+
+if __name__ == "__main__":
+    main()
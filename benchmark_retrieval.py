@@ -0,0 +1,69 @@
+import argparse
+import random
+import statistics
+import time
+import retrieval
+
+
+WORDS = ("transformer attention gradient layer token model training loss dataset "
+         "benchmark convolution encoder decoder embedding inference optimizer "
+         "regularization dropout batch normalization residual scaling").split()
+
+QUESTIONS = [
+    "What optimizer and learning rate are used for training?",
+    "How is dropout applied to the attention layers?",
+    "residual scaling 결과를 설명해줘.",
+    "Which dataset is used for the benchmark?",
+]
+
+
+def make_pages(num_pages: int, lines_per_page: int = 50, seed: int = 0) -> list:
+    """
+    절과 소절 제목이 있는 논문 형태의 페이지 텍스트를 만든다.
+    """
+
+    rng = random.Random(seed)
+    pages = []
+    section = 0
+    for page_num in range(num_pages):
+        lines = []
+        for line_num in range(lines_per_page):
+            if line_num % 25 == 0:
+                section += 1
+                lines.append(f"{section // 4 + 1}.{section % 4 + 1} {rng.choice(WORDS).title()}")
+            lines.append(" ".join(rng.choice(WORDS) for _ in range(12)))
+        pages.append("\n".join(lines))
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the PDF retrieval index.")
+    parser.add_argument("--pages", type=int, nargs="+", default=[30, 300, 1000])
+    parser.add_argument("--top-k", type=int, default=6)
+    args = parser.parse_args()
+
+    for num_pages in args.pages:
+        pages = make_pages(num_pages)
+        full_prompt_chars = sum(len(page) for page in pages)
+
+        start = time.perf_counter()
+        index = retrieval.build_index(pages)
+        build_time = time.perf_counter() - start
+
+        search_times = []
+        prompt_chars = []
+        for question in QUESTIONS:
+            start = time.perf_counter()
+            results = index.search(question, args.top_k)
+            search_times.append(time.perf_counter() - start)
+            prompt_chars.append(len(retrieval.format_context(results)))
+
+        print(f"{num_pages:5d} pages, {len(index.chunks):,} chunks")
+        print(f"  index build:   {build_time * 1e3:9.1f}ms")
+        print(f"  search (mean): {statistics.mean(search_times) * 1e3:9.2f}ms")
+        print(f"  prompt size:   {full_prompt_chars:,} -> {int(statistics.mean(prompt_chars)):,} chars "
+              f"({statistics.mean(prompt_chars) / full_prompt_chars:.1%})")
+
+
+if __name__ == "__main__":
+    main()
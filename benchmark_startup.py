@@ -0,0 +1,83 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+APPS = ["main.py", "demo-genai-streamlit.py", "demo-genai-pdf.py"]
+
+# 첫 화면을 그리는 데 필요 없어야 하는 무거운 모듈.
+HEAVY_MODULES = ["PyPDF2", "requests", "youtube_transcript_api", "google.generativeai"]
+
+
+def run_app(app: str, reruns: int) -> dict:
+    """
+    새 프로세스에서 실행되어 app의 첫 실행(cold start)과 이후 rerun 시간을 잰다.
+    """
+
+    start = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    import_time = time.perf_counter() - start
+
+    at = AppTest.from_file(app, default_timeout=60)
+
+    start = time.perf_counter()
+    at.run()
+    cold_time = time.perf_counter() - start
+
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    rerun_times = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        at.run()
+        rerun_times.append(time.perf_counter() - start)
+
+    return {
+        "app": app,
+        "streamlit_import": import_time,
+        "cold": cold_time,
+        "rerun_p50": statistics.median(rerun_times) if rerun_times else float("nan"),
+        "rerun_max": max(rerun_times) if rerun_times else float("nan"),
+        "heavy_modules": loaded,
+        "errors": [str(e.value) for e in at.exception],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark cold start and rerun time of the Streamlit apps with the fake model.")
+    parser.add_argument("--apps", nargs="+", default=APPS)
+    parser.add_argument("--reruns", type=int, default=20)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_app(args.child, args.reruns)))
+        return
+
+    # 실제 API를 부르지 않도록 가짜 모델을 사용하고, 앱마다 새 프로세스에서 측정한다.
+    env = dict(os.environ, MODEL_BACKEND="fake")
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    for app in args.apps:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", app, "--reruns", str(args.reruns)],
+            cwd=here, env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        report = json.loads(output.strip().splitlines()[-1])
+
+        print(f"[{report['app']}]")
+        print(f"  streamlit import: {report['streamlit_import'] * 1e3:8.1f}ms")
+        print(f"  cold start:       {report['cold'] * 1e3:8.1f}ms")
+        print(f"  rerun:            p50 {report['rerun_p50'] * 1e3:6.1f}ms  max {report['rerun_max'] * 1e3:6.1f}ms")
+        print(f"  heavy modules:    {', '.join(report['heavy_modules']) or '-'}")
+        for error in report["errors"]:
+            print(f"  error: {error}")
+
+
+if __name__ == "__main__":
+    main()
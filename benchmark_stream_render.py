@@ -0,0 +1,93 @@
+import argparse
+import time
+
+
+PARAGRAPHS = [
+    "## 방법\n\n제안한 방법은 attention 계산을 블록 단위로 나누어 메모리 사용량을 줄인다. "
+    "블록 크기 $B$와 sequence length $N$에 대해 메모리는 $O(N \\cdot B)$로 줄어든다.\n\n",
+    "$$\n\\mathrm{Attention}(Q, K, V) = \\mathrm{softmax}\\left(\\frac{QK^T}{\\sqrt{d_k}}\\right) V\n$$\n\n",
+    "- 실험 결과 기존 baseline보다 처리량이 **2.3배** 향상되었다.\n"
+    "- perplexity 차이는 $0.1\\%$ 이내이다.\n\n",
+    "```python\nfor block in range(num_blocks):\n    scores = q @ k[block].T / math.sqrt(d)\n    out += softmax(scores) @ v[block]\n```\n\n",
+    "추가 실험에서 batch size와 sequence length에 따른 latency 변화를 분석한다. "
+    "긴 입력에서는 `flash` 커널이 특히 효과적이다.\n\n",
+]
+
+
+def sample_chunks(total_chars: int, chunk_chars: int) -> list:
+    """
+    수식과 코드 블록이 섞인 한국어 요약을 chunk_chars 글자씩 나눈 청크 목록을 반환한다.
+    """
+
+    text = "# Benchmark summary\n\n"
+    index = 0
+    while len(text) < total_chars:
+        text += PARAGRAPHS[index % len(PARAGRAPHS)]
+        index += 1
+    return [text[i:i + chunk_chars] for i in range(0, len(text), chunk_chars)]
+
+
+def app(chunks: list, coalesced: bool, chunk_delay: float, stats: dict) -> None:
+    # AppTest.from_function은 함수 본문만 실행하므로 필요한 모듈은 여기서 import한다.
+    import time
+    import streamlit as st
+    import stream_render
+
+    def source():
+        for chunk in chunks:
+            time.sleep(chunk_delay)
+            yield chunk
+
+    def counted(texts):
+        # st.write_stream은 갱신마다 지금까지의 전체 markdown을 보낸다.
+        rendered = 0
+        for text in texts:
+            rendered += len(text.encode("utf-8"))
+            stats["deltas"] += 1
+            stats["delta_bytes"] += rendered
+            yield text
+
+    stream = stream_render.coalesce(source()) if coalesced else source()
+    stats["text"] = st.write_stream(counted(stream))
+
+
+def run(chunks: list, coalesced: bool, chunk_delay: float) -> dict:
+    from streamlit.testing.v1 import AppTest
+
+    stats = {"deltas": 0, "delta_bytes": 0}
+    at = AppTest.from_function(app, args=(chunks, coalesced, chunk_delay, stats), default_timeout=600)
+
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    at.run()
+    stats["seconds"] = time.perf_counter() - start
+    stats["cpu_seconds"] = time.process_time() - cpu_start
+    stats["errors"] = [str(e.value) for e in at.exception]
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare websocket deltas and server CPU of st.write_stream with and without coalescing.")
+    parser.add_argument("--chars", type=int, default=12000, help="Length of the streamed summary.")
+    parser.add_argument("--chunk-chars", type=int, default=16, help="Characters per model chunk.")
+    parser.add_argument("--chunk-delay", type=float, default=0.005, help="Seconds between model chunks.")
+    args = parser.parse_args()
+
+    chunks = sample_chunks(args.chars, args.chunk_chars)
+    text = "".join(chunks)
+    print(f"{len(chunks)} chunks, {len(text)} chars, {args.chunk_delay * 1e3:.1f}ms apart")
+
+    for name, coalesced in (("write_stream", False), ("coalesced", True)):
+        stats = run(chunks, coalesced, args.chunk_delay)
+        print(f"[{name}]")
+        print(f"  deltas:      {stats['deltas']:8d}  ({stats['delta_bytes'] / 2**20:.1f} MB of markdown re-sent)")
+        print(f"  server CPU:  {stats['cpu_seconds'] * 1e3:8.1f}ms  (wall {stats['seconds']:.2f}s)")
+        if stats.get("text") != text:
+            print("  error: rendered text differs from the input")
+        for error in stats["errors"]:
+            print(f"  error: {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+import os
+import time
+import hashlib
+import lzma
+import tempfile
+import zlib
+import metrics
+from filestore import FileStore
+
+
+CODECS = {
+    "zlib": (lambda data: zlib.compress(data, 9), zlib.decompress),
+    "lzma": (lzma.compress, lzma.decompress),
+}
+
+
+class BlobStore(FileStore):
+    """
+    값을 압축하여 SHA-256 digest 이름의 blob으로 저장하는 FileStore.
+    같은 내용은 blob 하나만 저장되고, 각 name은 blob을 가리키는
+    "<codec>:<digest>:<size>" 형식의 작은 포인터 파일이 된다.
+
+    root/refs/<base64 name>   포인터 파일
+    root/blobs/<ab>/<digest>  압축된 blob
+    """
+
+    # gc()가 방금 쓰였거나 재사용된 blob을 지우지 않도록 두는 유예 시간(초).
+    GC_GRACE_SECONDS = 60
+
+    def __init__(self, root: str = "data", codec: str = "zlib"):
+        if codec not in CODECS:
+            raise ValueError(f"Unsupported codec: {codec}")
+
+        self.root = root
+        self.codec = codec
+        self.blob_dir = os.path.join(root, "blobs")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        super().__init__(os.path.join(root, "refs"))
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def _parse_pointer(self, pointer: str):
+        codec, digest, size = pointer.split(":")
+        return codec, digest, int(size)
+
+    def _write_blob(self, digest: str, payload: bytes) -> None:
+        blob_path = self._blob_path(digest)
+
+        if os.path.exists(blob_path):
+            # 재사용하는 blob은 gc 유예 시간 안에 들도록 수정 시각을 갱신한다.
+            os.utime(blob_path)
+            return
+
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(blob_path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, blob_path)
+        except:
+            os.remove(tmp_path)
+            raise
+
+    def __setitem__(self, name: str, data: str) -> None:
+        """
+        data를 압축하여 blob으로 저장하고 name에 포인터를 기록.
+        data가 비어 있으면 포인터만 삭제하며, blob은 gc()에서 정리된다.
+        """
+
+        if not data:
+            super().__setitem__(name, data)
+            return
+
+        raw = data.encode("utf-8")
+        digest = hashlib.sha256(raw).hexdigest()
+        compress, _ = CODECS[self.codec]
+
+        payload = compress(raw)
+        try:
+            self._write_blob(digest, payload)
+        except OSError:
+            print("Error while accessing", self._blob_path(digest))
+            return
+
+        if self._write_file(name, f"{self.codec}:{digest}:{len(raw)}"):
+            metrics.record_write(self.root, len(payload))
+            self._notify(name, data)
+
+    def __getitem__(self, name: str) -> str:
+        """
+        name의 포인터를 따라가 blob을 읽고 압축을 풀어 반환, 없으면 None 반환.
+        """
+
+        pointer = self._read_file(name)
+        if not pointer:
+            metrics.record_cache(self.root, False)
+            return None
+
+        try:
+            codec, digest, _ = self._parse_pointer(pointer)
+            _, decompress = CODECS[codec]
+            with open(self._blob_path(digest), "rb") as f:
+                payload = f.read()
+            data = decompress(payload).decode("utf-8")
+        except (OSError, ValueError, KeyError, zlib.error, lzma.LZMAError):
+            print("Error while accessing blob of", name)
+            metrics.record_cache(self.root, False)
+            return None
+
+        # 디스크에서 읽은 압축된 크기를 센다.
+        metrics.record_cache(self.root, True, len(payload))
+        return data
+
+    def _iter_pointers(self):
+        # gc와 통계는 캐시 조회가 아니므로 metrics에 세지 않도록 포인터 파일을 직접 읽는다.
+        for name in self.keys():
+            pointer = self._read_file(name)
+            if not pointer:
+                continue
+
+            try:
+                yield name, self._parse_pointer(pointer)
+            except ValueError:
+                print("Invalid pointer for", name)
+
+    def _iter_blobs(self):
+        for dir_entry in os.scandir(self.blob_dir):
+            if not dir_entry.is_dir():
+                continue
+            for entry in os.scandir(dir_entry.path):
+                if entry.is_file() and len(entry.name) == 64:
+                    yield entry
+
+    def refcounts(self) -> dict:
+        """
+        포인터 파일을 훑어 digest별 참조 횟수를 계산한다.
+        """
+
+        counts = {}
+        for _, (_, digest, _) in self._iter_pointers():
+            counts[digest] = counts.get(digest, 0) + 1
+        return counts
+
+    def gc(self, dry_run: bool = False) -> dict:
+        """
+        참조 횟수가 0인 blob을 삭제하고 삭제한 개수와 바이트 수를 반환.
+        유예 시간 안에 쓰인 blob은 동시에 진행 중인 저장을 위해 남겨 둔다.
+        """
+
+        counts = self.refcounts()
+        deadline = time.time() - self.GC_GRACE_SECONDS
+        removed = 0
+        removed_bytes = 0
+
+        for entry in self._iter_blobs():
+            if counts.get(entry.name):
+                continue
+
+            stat = entry.stat()
+            if stat.st_mtime > deadline:
+                continue
+
+            if not dry_run:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    print("Error while accessing", entry.path)
+                    continue
+
+            removed += 1
+            removed_bytes += stat.st_size
+
+        return {"removed_blobs": removed, "removed_bytes": removed_bytes}
+
+    def usage(self) -> dict:
+        """
+        디스크 사용량 보고서를 반환한다.
+        logical_bytes는 압축과 중복 제거 없이 저장했을 때의 크기이다.
+        """
+
+        counts = {}
+        logical_bytes = 0
+        unique_bytes = 0
+        pointer_bytes = 0
+        keys = 0
+
+        for name, (_, digest, size) in self._iter_pointers():
+            keys += 1
+            logical_bytes += size
+            pointer_bytes += os.path.getsize(os.path.join(self.data_dir, self._encode_name(name)))
+            if digest not in counts:
+                unique_bytes += size
+            counts[digest] = counts.get(digest, 0) + 1
+
+        blob_bytes = 0
+        blobs = 0
+        orphan_blobs = 0
+        for entry in self._iter_blobs():
+            blobs += 1
+            blob_bytes += entry.stat().st_size
+            if not counts.get(entry.name):
+                orphan_blobs += 1
+
+        stored_bytes = blob_bytes + pointer_bytes
+        return {
+            "keys": keys,
+            "blobs": blobs,
+            "orphan_blobs": orphan_blobs,
+            "logical_bytes": logical_bytes,
+            "unique_bytes": unique_bytes,
+            "blob_bytes": blob_bytes,
+            "pointer_bytes": pointer_bytes,
+            "stored_bytes": stored_bytes,
+            "savings": 1 - stored_bytes / logical_bytes if logical_bytes else 0.0,
+        }
+
+
+def estimate_usage(data_dir: str, codec: str = "zlib") -> dict:
+    """
+    평문 FileStore 디렉터리를 BlobStore로 옮겼을 때의 사용량을 추정한다.
+    """
+
+    store = FileStore(data_dir)
+    compress, _ = CODECS[codec]
+    seen = set()
+    keys = 0
+    logical_bytes = 0
+    unique_bytes = 0
+    blob_bytes = 0
+
+    for name in store.keys():
+        data = store[name]
+        if not data:
+            continue
+
+        raw = data.encode("utf-8")
+        keys += 1
+        logical_bytes += len(raw)
+
+        digest = hashlib.sha256(raw).hexdigest()
+        if digest in seen:
+            continue
+
+        seen.add(digest)
+        unique_bytes += len(raw)
+        blob_bytes += len(compress(raw))
+
+    return {
+        "keys": keys,
+        "blobs": len(seen),
+        "logical_bytes": logical_bytes,
+        "unique_bytes": unique_bytes,
+        "blob_bytes": blob_bytes,
+        "savings": 1 - blob_bytes / logical_bytes if logical_bytes else 0.0,
+    }
+
+
+def convert(data_dir: str, root: str, codec: str = "zlib") -> int:
+    """
+    평문 FileStore 디렉터리의 모든 항목을 BlobStore로 복사하고 복사한 개수를 반환.
+    """
+
+    source = FileStore(data_dir)
+    target = BlobStore(root, codec)
+
+    count = 0
+    for name in source.keys():
+        data = source[name]
+        if data:
+            target[name] = data
+            count += 1
+
+    return count
+
+
+def print_report(report: dict) -> None:
+    for key, value in report.items():
+        if key == "savings":
+            print(f"  {key:14s} {value:.1%}")
+        else:
+            print(f"  {key:14s} {value:,}")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compressed blob store maintenance tool")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    usage_parser = subparsers.add_parser("usage", help="Report disk usage of a blob store.")
+    usage_parser.add_argument("root", help="BlobStore directory, e.g. data/arxiv.blobs")
+
+    estimate_parser = subparsers.add_parser(
+        "estimate", help="Estimate savings for a plain FileStore directory.")
+    estimate_parser.add_argument("data_dir", help="FileStore directory, e.g. data/arxiv")
+    estimate_parser.add_argument("--codec", choices=sorted(CODECS), default="zlib")
+
+    gc_parser = subparsers.add_parser("gc", help="Delete unreferenced blobs.")
+    gc_parser.add_argument("root", help="BlobStore directory, e.g. data/arxiv.blobs")
+    gc_parser.add_argument("--dry-run", action="store_true")
+
+    convert_parser = subparsers.add_parser(
+        "convert", help="Copy a plain FileStore directory into a blob store.")
+    convert_parser.add_argument("data_dir", help="FileStore directory, e.g. data/arxiv")
+    convert_parser.add_argument("--root", help="Target directory (default: <data_dir>.blobs)")
+    convert_parser.add_argument("--codec", choices=sorted(CODECS), default="zlib")
+
+    args = parser.parse_args()
+
+    if args.command == "usage":
+        print(f"{args.root}:")
+        print_report(BlobStore(args.root).usage())
+    elif args.command == "estimate":
+        print(f"{args.data_dir} ({args.codec}, estimated):")
+        print_report(estimate_usage(args.data_dir, args.codec))
+    elif args.command == "gc":
+        print_report(BlobStore(args.root).gc(args.dry_run))
+    elif args.command == "convert":
+        root = args.root or args.data_dir.rstrip("/\\") + ".blobs"
+        count = convert(args.data_dir, root, args.codec)
+        print(f"Converted {count} entries from {args.data_dir} to {root}")
+
+
+if __name__ == "__main__":
+    main()
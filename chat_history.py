@@ -0,0 +1,140 @@
+import os
+import traceback
+from tokens import estimate_tokens
+
+
+# 모델에 다시 보내는 대화 기록의 최대 추정 토큰 수.
+MAX_TOKENS = int(os.getenv("CHAT_HISTORY_MAX_TOKENS", "32000"))
+
+# 압축할 때 요약하지 않고 그대로 남겨 두는 최근 메시지 수.
+KEEP_RECENT = int(os.getenv("CHAT_HISTORY_KEEP_RECENT", "4"))
+
+# 요약할 때 메시지마다 모델에 보내는 최대 글자 수.
+SUMMARY_INPUT_CHARS = 4000
+
+SUMMARY_PREFIX = "[Summary of the earlier conversation]\n"
+
+summary_guide = """Summarize the conversation below so that it can replace the original messages as context.
+Keep the facts, decisions, documents and URLs that were discussed, and the open questions.
+Be concise. Write the summary in the language used in the conversation."""
+
+
+def model_summarizer(model):
+    """
+    model.generate_content로 오래된 메시지를 요약하는 summarizer를 만든다.
+    """
+
+    def summarize(messages: list) -> str:
+        lines = []
+        for message in messages:
+            text = message["parts"][0]
+            if len(text) > SUMMARY_INPUT_CHARS:
+                text = text[:SUMMARY_INPUT_CHARS] + " ..."
+            lines.append(f"{message['role']}: {text}")
+
+        prompt = summary_guide + "\n\nConversation:\n" + "\n\n".join(lines)
+        return model.generate_content(prompt).text
+
+    return summarize
+
+
+class ChatHistory:
+    """
+    모델에 전달하기 위한 메시지 기록 저장소.
+    메시지마다 추정 토큰 수를 기록해 두고, 합계가 max_tokens를 넘으면
+    최근 keep_recent개의 메시지를 제외한 오래된 메시지를 요약 한 쌍으로 바꾼다.
+    summarizer가 없거나 요약에 실패하면 오래된 메시지를 버린다.
+    """
+
+    def __init__(self, max_tokens: int = MAX_TOKENS, keep_recent: int = KEEP_RECENT,
+                 summarizer=None):
+        self.max_tokens = max_tokens
+        self.keep_recent = keep_recent
+        self.summarizer = summarizer
+
+        self.messages = []
+        self.token_counts = []
+        self.total_tokens = 0
+        self.compactions = 0
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def clear(self) -> None:
+        self.messages = []
+        self.token_counts = []
+        self.total_tokens = 0
+
+    def contents(self) -> list:
+        """
+        generate_content에 전달할 메시지 목록을 반환한다.
+        """
+
+        return list(self.messages)
+
+    def _push(self, role: str, content: str, index: int = None) -> None:
+        tokens = estimate_tokens(content)
+        message = {"role": role, "parts": [content]}
+
+        if index is None:
+            self.messages.append(message)
+            self.token_counts.append(tokens)
+        else:
+            self.messages.insert(index, message)
+            self.token_counts.insert(index, tokens)
+
+        self.total_tokens += tokens
+
+    def _drop_front(self, count: int) -> list:
+        dropped = self.messages[:count]
+        self.total_tokens -= sum(self.token_counts[:count])
+        del self.messages[:count]
+        del self.token_counts[:count]
+        return dropped
+
+    def append(self, role: str, content: str) -> None:
+        self._push(role, content)
+
+        if self.total_tokens > self.max_tokens:
+            self._compact()
+
+    def _split_point(self) -> int:
+        """
+        남겨 둘 최근 메시지가 "user" 메시지로 시작하도록 압축할 메시지 개수를 정한다.
+        """
+
+        count = max(0, len(self.messages) - self.keep_recent)
+        while 0 < count < len(self.messages) and self.messages[count]["role"] != "user":
+            count -= 1
+        return count
+
+    def _compact(self) -> None:
+        count = self._split_point()
+
+        # 이미 요약한 메시지만 남았다면 요약을 다시 요약하지 않는다.
+        if count == 2 and self.messages[0]["parts"][0].startswith(SUMMARY_PREFIX):
+            count = 0
+
+        if count > 0:
+            old_messages = self._drop_front(count)
+            self.compactions += 1
+
+            summary = None
+            if self.summarizer:
+                try:
+                    summary = self.summarizer(old_messages)
+                except Exception:
+                    traceback.print_exc()
+
+            if summary:
+                self._push("user", SUMMARY_PREFIX + summary, 0)
+                self._push("model", "OK.", 1)
+
+        # 최근 메시지만으로도 예산을 넘으면 가장 오래된 턴부터 버린다.
+        while self.total_tokens > self.max_tokens:
+            end = 1
+            while end < len(self.messages) and self.messages[end]["role"] != "user":
+                end += 1
+            if end >= len(self.messages):
+                break
+            self._drop_front(end)
@@ -0,0 +1,136 @@
+import functools
+import os
+import streamlit as st
+
+
+# 한 번에 보여 주는 최근 메시지 수. 이전 메시지는 이 단위로 더 불러온다.
+PAGE_SIZE = int(os.getenv("CHAT_VIEW_PAGE_SIZE", "20"))
+
+# 이보다 긴 이전 메시지는 앞부분만 보여 주고 "전체 보기"를 누르면 펼친다.
+PREVIEW_CHARS = 1500
+
+# 가장 최근 메시지 몇 개는 길어도 전체를 보여 준다.
+EXPANDED_RECENT = 2
+
+FENCES = ("```", "~~~", "$$")
+
+
+def _fence(line: str) -> str:
+    """
+    line이 코드 블록이나 수식 블록의 fence로 시작하면 그 fence를 반환, 아니면 None.
+    """
+
+    for fence in FENCES:
+        if line.startswith(fence):
+            return fence
+    return None
+
+
+@functools.lru_cache(maxsize=1024)
+def preview(content: str, max_chars: int = PREVIEW_CHARS) -> str:
+    """
+    긴 메시지의 앞부분을 코드 블록이나 수식 블록 밖의 문단 경계에서 잘라 반환한다.
+    문단 경계가 없으면 블록 밖의 줄 경계에서 자르고, 첫 블록이 max_chars보다 길면 블록 안에서 자른 뒤 fence를 닫는다.
+    max_chars보다 짧으면 None을 반환한다.
+    rerun마다 같은 메시지를 다시 처리하지 않도록 결과를 캐시한다.
+    """
+
+    if len(content) <= max_chars:
+        return None
+
+    paragraph_cut = line_cut = 0
+    offset = 0
+    block = None
+    for line in content.splitlines(keepends=True):
+        if offset + len(line) > max_chars:
+            break
+
+        stripped = line.strip()
+        fence = _fence(stripped)
+        if block == "$$":
+            # 수식 블록은 "\frac{a}{b} $$"처럼 줄 끝의 $$로도 닫힌다.
+            if stripped.endswith("$$"):
+                block = None
+        elif block:
+            if fence == block:
+                block = None
+        elif fence:
+            # "$$ x $$"처럼 한 줄에서 열고 닫는 수식은 블록이 아니다.
+            if not (fence == "$$" and len(stripped) > 2 and stripped.endswith("$$")):
+                block = fence
+
+        offset += len(line)
+        if block is None:
+            line_cut = offset
+            if not stripped:
+                paragraph_cut = offset
+
+    if paragraph_cut or line_cut:
+        return content[:paragraph_cut or line_cut].rstrip()
+
+    if not offset:
+        # 첫 줄이 max_chars보다 길면 글자 수로 자른다. 그 줄이 블록을 열면 닫는다.
+        offset = max_chars
+        block = _fence(content.lstrip())
+    return content[:offset].rstrip() + ("\n" + block if block else "")
+
+
+def _state(key: str) -> dict:
+    if key not in st.session_state:
+        st.session_state[key] = {"shown": PAGE_SIZE, "expanded": set()}
+    return st.session_state[key]
+
+
+def reset(key: str = "chat_view") -> None:
+    """
+    대화 기록을 지웠을 때 페이지와 펼친 메시지 정보를 초기화한다.
+    """
+
+    st.session_state.pop(key, None)
+
+
+@st.fragment
+def render_messages(messages: list, key: str = "chat_view", page_size: int = PAGE_SIZE) -> None:
+    """
+    최근 page_size개의 메시지만 출력하고, 이전 메시지는 버튼을 눌러 page_size개씩 더 불러온다.
+    fragment로 실행되므로 페이지를 넘기거나 펼쳐도 스크립트 전체가 다시 실행되지 않는다.
+    """
+
+    state = _state(key)
+    total = len(messages)
+    start = max(0, total - state["shown"])
+
+    if start > 0 or state["shown"] > page_size:
+        more, recent = st.columns(2)
+        if start > 0:
+            more.button(
+                f"이전 메시지 {min(page_size, start)}개 더 보기 (숨김 {start}개)",
+                key=f"{key}_more",
+                on_click=lambda: state.update(shown=state["shown"] + page_size),
+            )
+        if state["shown"] > page_size:
+            recent.button(
+                "최근 메시지만 보기",
+                key=f"{key}_recent",
+                on_click=lambda: state.update(shown=page_size, expanded=set()),
+            )
+
+    for index in range(start, total):
+        message = messages[index]
+        content = message["content"]
+
+        short = None
+        if index < total - EXPANDED_RECENT and index not in state["expanded"]:
+            short = preview(content)
+
+        with st.chat_message(message["role"]):
+            if short is None:
+                st.markdown(content)
+                continue
+
+            st.markdown(short + "\n\n…")
+            st.button(
+                f"전체 보기 ({len(content):,}자)",
+                key=f"{key}_expand_{index}",
+                on_click=lambda index=index: state["expanded"].add(index),
+            )
@@ -1,36 +1,186 @@
-import google.generativeai as genai
-import os
-from dotenv import load_dotenv
+import argparse
+import collections
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import model_backend
+from percentiles import percentile
+from tokens import estimate_tokens
 
 
 def list_available_models():
     """Lists the available Gemini models that support content generation."""
 
+    import google.generativeai as genai
+
     print("\nAvailable Gemini models:")
     for m in genai.list_models():
         if 'generateContent' in m.supported_generation_methods:
             print(f"  - {m.name}")
 
 
+def parse_request(line: str) -> dict:
+    """
+    Parses one JSONL batch line into {"id", "contents"}.
+
+    A line is either {"id": ..., "prompt": "..."} for a single prompt or
+    {"id": ..., "messages": [{"role": "user" | "model", "content": "..."}, ...]}
+    for a conversation whose last message is the one to answer.
+    A bare JSON string is treated as a prompt.
+    """
+
+    request = json.loads(line)
+    if isinstance(request, str):
+        request = {"prompt": request}
+    if not isinstance(request, dict):
+        raise ValueError("Each line must be a JSON object or string.")
+
+    if "messages" in request:
+        contents = []
+        for message in request["messages"]:
+            role = "model" if message.get("role") in ("model", "assistant") else "user"
+            parts = message.get("parts") or [message.get("content", "")]
+            contents.append({"role": role, "parts": parts})
+    elif "prompt" in request:
+        contents = [{"role": "user", "parts": [request["prompt"]]}]
+    else:
+        raise ValueError('Each line needs a "prompt" or "messages" field.')
+
+    if not contents or contents[-1]["role"] != "user":
+        raise ValueError("The conversation must end with a user message.")
+
+    return {"id": request.get("id"), "contents": contents}
+
+
+def run_request(model, index: int, line: str) -> dict:
+    """Sends one batch request and returns its JSONL result with timings."""
+
+    result = {"index": index}
+    start = time.perf_counter()
+    try:
+        request = parse_request(line)
+        result["id"] = request["id"]
+
+        response = model.generate_content(request["contents"], stream=True)
+        texts = []
+        for chunk in response:
+            if not texts:
+                result["ttft"] = time.perf_counter() - start
+            texts.append(chunk.text)
+        text = "".join(texts)
+
+        # The Gemini API reports the exact count once the stream is consumed; other backends are estimated.
+        usage = getattr(response, "usage_metadata", None)
+        result["response"] = text
+        result["output_tokens"] = getattr(usage, "candidates_token_count", None) or estimate_tokens(text)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+
+    result["latency"] = time.perf_counter() - start
+    return result
+
+
+def read_lines(path: str):
+    f = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        for line in f:
+            if line.strip():
+                yield line
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def run_batch(model, input_path: str, output_path: str, concurrency: int) -> dict:
+    """
+    Runs every request in input_path with at most `concurrency` requests in flight and
+    writes the results to output_path in input order as soon as they are ready.
+    Input is read lazily, so at most 2 * concurrency requests are buffered at a time.
+    """
+
+    out = sys.stdout if output_path == "-" else open(output_path, "w", encoding="utf-8")
+    results = []
+    start = time.perf_counter()
+
+    def write(result):
+        out.write(json.dumps(result, ensure_ascii=False) + "\n")
+        out.flush()
+        results.append({key: value for key, value in result.items() if key != "response"})
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            pending = collections.deque()
+            for index, line in enumerate(read_lines(input_path)):
+                pending.append(pool.submit(run_request, model, index, line))
+                if len(pending) >= concurrency * 2:
+                    write(pending.popleft().result())
+            while pending:
+                write(pending.popleft().result())
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    ok = [r for r in results if "error" not in r]
+    latencies = [r["latency"] for r in ok]
+    ttfts = [r["ttft"] for r in ok if "ttft" in r]
+    output_tokens = sum(r["output_tokens"] for r in ok)
+
+    return {
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "elapsed": elapsed,
+        "throughput": len(ok) / elapsed if elapsed else 0.0,
+        "tokens_per_sec": output_tokens / elapsed if elapsed else 0.0,
+        "output_tokens": output_tokens,
+        "ttft_p50": percentile(ttfts, 50),
+        "ttft_p99": percentile(ttfts, 99),
+        "latency_p50": percentile(latencies, 50),
+        "latency_p90": percentile(latencies, 90),
+        "latency_p99": percentile(latencies, 99),
+    }
+
+
+def print_batch_report(report: dict) -> None:
+    print(f"{report['requests']} requests, {report['errors']} errors, {report['elapsed']:.2f}s", file=sys.stderr)
+    print(f"  throughput: {report['throughput']:8.2f} req/s  {report['tokens_per_sec']:8.1f} output tokens/s "
+          f"({report['output_tokens']} tokens)", file=sys.stderr)
+    print(f"  ttft:       p50 {report['ttft_p50'] * 1e3:8.1f}ms  p99 {report['ttft_p99'] * 1e3:8.1f}ms",
+          file=sys.stderr)
+    print(f"  latency:    p50 {report['latency_p50'] * 1e3:8.1f}ms  p90 {report['latency_p90'] * 1e3:8.1f}ms  "
+          f"p99 {report['latency_p99'] * 1e3:8.1f}ms", file=sys.stderr)
+
+
 def main():
     """Main function to run the console-based Gemini chatbot."""
 
-    load_dotenv()
+    parser = argparse.ArgumentParser(description="Chat with Gemini, or run a JSONL batch of prompts.")
+    parser.add_argument("--batch", metavar="INPUT",
+                        help="Run prompts or conversations from a JSONL file (- for stdin) instead of chatting.")
+    parser.add_argument("--output", default="-", help="JSONL file for batch results (default: stdout).")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum batch requests in flight.")
+    parser.add_argument("--model", default="gemini-2.5-flash")
+    args = parser.parse_args()
+
+    model_backend.load_env()
+
+    if args.batch:
+        model = model_backend.get_model(args.model)
+        report = run_batch(model, args.batch, args.output, max(1, args.concurrency))
+        print_batch_report(report)
+        sys.exit(1 if report["errors"] else 0)
 
     print("Hello from hello-gemini!")
 
-    # Configure the Gemini API with your API key
-    # It's recommended to store your API key securely, e.g., in an environment variable.
-    # For this example, we'll use a placeholder. Replace 'YOUR_API_KEY' with your actual key.
+    # The Gemini API is configured with GEMINI_API_KEY from the environment or .env file.
     # You can get an API key from Google AI Studio: https://aistudio.google.com/app/apikey
-    # Replace with your actual API key or set as environment variable
-    api_key = os.getenv("GEMINI_API_KEY")
-    genai.configure(api_key=api_key)
+    # Set MODEL_BACKEND=fake to chat with a local fake model instead of the API.
 
     # list_available_models()
 
-    # Initialize the Gemini model (replace 'gemini-pro' with an available model name from the list above)
-    model = genai.GenerativeModel('gemini-2.5-flash')
+    # Initialize the Gemini model (replace 'gemini-2.5-flash' with an available model name from the list above)
+    model = model_backend.get_model(args.model)
 
     # Start a chat session
     chat = model.start_chat(history=[])
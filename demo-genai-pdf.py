@@ -1,30 +1,44 @@
 
 import streamlit as st
-import google.generativeai as genai
-from PyPDF2 import PdfReader
-import requests
-import io
-import os
-from dotenv import load_dotenv
+import model_backend
+import retrieval
+import doc_store
+import metrics
+import stream_render
+import tokens
 import html
 
 
-def init_pdf_info(pdf_url: str = None, pdf_text: str = None) -> None:
+# 질문마다 프롬프트에 넣는 청크 수.
+TOP_K = 6
+
+
+def init_pdf_info(pdf_url: str = None, pdf_doc: doc_store.DocHandle = None) -> None:
+    # 세션에는 공유 문서 저장소의 handle만 둔다. 이전 문서의 참조는 바로 푼다.
+    if st.session_state.get("pdf_doc") is not None:
+        st.session_state.pdf_doc.release()
+
     st.session_state.pdf_url = pdf_url
-    st.session_state.pdf_text = pdf_text
+    st.session_state.pdf_doc = pdf_doc
     st.session_state.chat_history = []
 
 
-def get_pdf_text(pdf_url):
+def get_pdf_doc(pdf_url) -> doc_store.DocHandle:
+    # PyPDF2와 requests는 PDF URL을 처음 입력할 때 import한다.
+    import requests
+    import http_client
+    import pdf_extract
+
     try:
-        response = requests.get(pdf_url)
-        response.raise_for_status()  # Raise an exception for HTTP errors
-        with io.BytesIO(response.content) as pdf_file:
-            reader = PdfReader(pdf_file)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text() or ""
-            return text
+        with metrics.span("pdf_chat.download"):
+            response = http_client.fetch(pdf_url)  # Raises an exception for HTTP errors
+            pdf_data = response.content
+
+        def load_pages():
+            with metrics.span("pdf_chat.extract"):
+                return list(pdf_extract.iter_pages(pdf_data))
+
+        return doc_store.store.acquire(pdf_extract.cache_key(pdf_data), load_pages)
     except requests.exceptions.RequestException as e:
         st.error(f"Error fetching PDF from URL: {e}")
         return None
@@ -33,31 +47,49 @@ def get_pdf_text(pdf_url):
         return None
 
 
-def get_gemini_response(question) -> None:
+def get_gemini_response(question, use_retrieval: bool = True) -> None:
+    """
+    use_retrieval이 True이면 질문과 관련된 청크만 페이지 번호와 함께 프롬프트에 넣는다.
+    관련 청크가 없거나 문서가 짧으면 전체 텍스트를 넣는다.
+    """
+
     st.markdown("## 👨‍🦰 " + question)
 
     with st.spinner("Asking..."):
-        prompt = (f"Based on the following context, answer the question (in Korean):\n\n" +
-                  f"Context: {st.session_state.pdf_text}\n\n" +
-                  f"Question: {question}")
-        response = st.session_state.model.generate_content(prompt, stream=True)
-        answer = st.write_stream(
-            chunk.text for chunk in response)
+        doc = st.session_state.pdf_doc.doc
+        index = doc.index
+        results = None
+        if use_retrieval and len(index.chunks) > TOP_K:
+            with metrics.span("pdf_chat.retrieval"):
+                results = index.search(question, TOP_K)
+
+        if results:
+            prompt = (f"Based on the following excerpts, answer the question (in Korean).\n" +
+                      f"Each excerpt starts with its page numbers in brackets. " +
+                      f"Cite the pages you used, e.g. (p. 3).\n\n" +
+                      f"Context:\n{retrieval.format_context(results)}\n\n" +
+                      f"Question: {question}")
+        else:
+            # 문서가 모델의 입력 한도보다 길면 예산에 맞게 뒷부분을 잘라낸다.
+            budget = tokens.TokenBudget(st.session_state.model, template=question)
+            prompt = budget.fit_contents(
+                lambda text: (f"Based on the following context, answer the question (in Korean):\n\n" +
+                              f"Context: {text}\n\n" +
+                              f"Question: {question}"),
+                doc.text)
+        chunks = metrics.generate_stream(st.session_state.model, prompt, "pdf_chat")
+        answer = stream_render.write_stream(chunks)
 
         st.session_state.chat_history = [
             {"question": question,
              "answer": answer}]
 
 
-load_dotenv()
-
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-
 if "model" not in st.session_state:
-    # 모델을 선택한다.
+    # 모델을 선택한다. 모델은 프로세스 전체에서 한 번만 만든다.
     MODEL_NAME = "gemini-2.5-flash"
 
-    st.session_state.model = genai.GenerativeModel(MODEL_NAME)
+    st.session_state.model = model_backend.shared_model(MODEL_NAME)
     init_pdf_info()
 
 
@@ -87,13 +119,13 @@ with col1:
                  unsafe_allow_html=True)
 
         if pdf_url != st.session_state.pdf_url:
-            init_pdf_info(pdf_url, get_pdf_text(pdf_url))
+            init_pdf_info(pdf_url, get_pdf_doc(pdf_url))
     else:
         init_pdf_info()
 
 
 with col2:
-    if st.session_state.pdf_text:
+    if st.session_state.pdf_doc:
         with st.container(height=800, border=True):
             container = st.container()
 
@@ -104,10 +136,21 @@ with col2:
 
                 if len(st.session_state.chat_history) == 0:
                     for request in ["논문 내용을 요약해줘."]:
-                        get_gemini_response(request)
+                        get_gemini_response(request, use_retrieval=False)
 
                 question = st.text_input("Question:",
                                          placeholder='Input question here')
 
                 if question:
                     get_gemini_response(question)
+
+
+with st.sidebar:
+    stats = doc_store.store.stats()
+    st.caption(
+        f"문서 {stats['in_memory']}/{stats['documents']}개 · 참조 {stats['refs']}  \n"
+        f"메모리 {stats['bytes'] / 2**20:.1f}/{stats['max_bytes'] / 2**20:.0f}MB"
+        + (f" · RSS {stats['rss_bytes'] / 2**20:.0f}MB" if stats["rss_bytes"] else "")
+    )
+
+metrics.sidebar_panel()
@@ -1,15 +1,17 @@
-from dotenv import load_dotenv
-from youtube_transcript_api import YouTubeTranscriptApi
-import google.generativeai as genai
-import google.generativeai.types as genai_types
-import io
-import os
-import PyPDF2
+import chat_history
+import chat_view
+import jobs
+import metrics
+import stream_render
+import model_backend
 import re
-import requests
 import streamlit as st
+import tokens
 import traceback
-import urllib.parse
+
+
+# streamlit은 입력마다 스크립트 전체를 다시 실행하므로, 무거운 모듈(PyPDF2, requests,
+# youtube_transcript_api, google.generativeai)은 필요한 명령을 처리할 때 import한다.
 
 
 # 페이지 설정
@@ -21,19 +23,16 @@ st.set_page_config(
 
 st.title("Gemini Chatbot")
 
-load_dotenv()
-
 print('Starting streamlit app...')
 
 # 제너레이티브 AI 모델을 설정한다.
-# 'YOUR_API_KEY'를 실제 API 키로 대체한다.
-api_key = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=api_key)
-
+# API 키는 .env 파일의 GEMINI_API_KEY에서 읽는다.
+# MODEL_BACKEND=fake이면 API 없이 로컬 가짜 모델을 사용한다.
+# 모델은 프로세스 전체에서 한 번만 만들어 모든 세션이 공유한다.
 if "model" not in st.session_state:
     # 모델을 선택한다.
     MODEL_NAME = "gemini-2.5-flash"
-    st.session_state.model = genai.GenerativeModel(MODEL_NAME)
+    st.session_state.model = model_backend.shared_model(MODEL_NAME)
 
 # st.session_state.messages는 GUI에 메시지 기록을 출력하기 위한 메시지 기록 저장소이다.
 # 이 목록은 "user"와 "assistant" 두 가지 역할을 가질 수 있다.
@@ -44,20 +43,25 @@ if "messages" not in st.session_state:
 # st.session_state.chat_history는 모델에 전달하기 위한 메시지 기록 저장소이다.
 # 이 목록은 "user"와 "model" 두 가지 역할을 가질 수 있다.
 # 메시지 정보는 "parts" 키에 저장된다.
+# 토큰 예산을 넘으면 오래된 메시지는 요약으로 바뀌며, st.session_state.messages에는 영향이 없다.
 if "chat_history" not in st.session_state:
-    st.session_state.chat_history = []
+    st.session_state.chat_history = chat_history.ChatHistory(
+        summarizer=chat_history.model_summarizer(st.session_state.model))
+
+# 명령 처리 작업은 백그라운드에서 실행되므로, 응답을 스트리밍하는 중에도 사이드바에서 취소할 수 있다.
+jobs.sidebar_panel()
 
 # GUI에 메시지 기록을 출력한다.
-for message in st.session_state.messages:
-    with st.chat_message(message["role"]):
-        st.markdown(message["content"])
+# 최근 메시지만 출력하므로 대화가 길어져도 rerun 시간이 늘지 않는다.
+# fragment만 다시 실행될 때 이번 실행에서 추가한 메시지가 아래 출력과 겹쳐 두 번 그려지지 않도록 사본을 넘긴다.
+chat_view.render_messages(list(st.session_state.messages))
 
 
 def add_message(role, content):
     assert role in ["user", "model"], f"Invalid role: {role}"
 
     # genai 모델에 전달하기 위해 메시지 기록 저장소에 메시지를 추가한다.
-    st.session_state.chat_history.append({"role": role, "parts": [content]})
+    st.session_state.chat_history.append(role, content)
 
     # streamlit은 모델 역할을 표시하기 위해 "assistant"로 표시되어야 한다.
     # 따라서 "model" 역할을 "assistant" 역할로 변환한다.
@@ -68,9 +72,61 @@ def add_message(role, content):
     st.session_state.messages.append({"role": role, "content": content})
 
 
+def _record_reply(job):
+    """
+    끝난 명령 작업의 응답을 대화 기록에 한 번만 추가한다.
+    ChatHistory에는 lock이 없고 append가 압축(모델 요청)까지 할 수 있으므로 백그라운드 스레드가 아니라
+    스크립트 스레드에서 추가한다.
+    """
+
+    recorded = st.session_state.setdefault("recorded_replies", set())
+    if job.id not in recorded and job.state == "done":
+        recorded.add(job.id)
+        add_message("model", job.flight.text)
+
+
+def _stream_reply(job):
+    with st.chat_message("assistant"):
+        return stream_render.write_stream(jobs.watch(job))
+
+
+def _run_reply_job(title, produce):
+    """
+    produce(task)를 백그라운드 작업으로 실행하고 응답을 스트리밍한다.
+    입력이나 메뉴 조작으로 스크립트가 다시 실행되어도 작업은 계속되고, 다음 실행에서 응답을 대화 기록에 추가한다.
+    """
+
+    job = jobs.queue.submit(None, title, produce, kind="chat")
+    jobs.track(job)
+    text = _stream_reply(job)
+    _record_reply(job)
+    return text
+
+
+def _resume_replies():
+    """
+    이전 실행에서 시작한 명령 작업 중 대화 기록에 아직 없는 응답을 보여 주고 기록에 추가한다.
+    끝난 작업은 모은 텍스트를 그리고, 진행 중인 작업은 끝날 때까지 스트리밍한다.
+    기록에 추가한 응답은 다음 실행부터 render_messages가 그리므로 두 번 그려지지 않는다.
+    """
+
+    recorded = st.session_state.setdefault("recorded_replies", set())
+    for job in jobs.session_jobs(kind="chat"):
+        if job.id in recorded or job.state in ("failed", "cancelled"):
+            continue
+        try:
+            _stream_reply(job)
+            _record_reply(job)
+        except jobs.JobCancelled:
+            st.info("응답 생성을 취소했다.")
+        except Exception as e:
+            st.error(f"An error occurred: {e}")
+
+
 def _handle_clear_command():
     st.session_state.messages = []
-    st.session_state.chat_history = []
+    st.session_state.chat_history.clear()
+    chat_view.reset()
     st.success("Chat history cleared!")
     st.rerun()
 
@@ -85,7 +141,7 @@ Available commands:
 * `/clear`: Clear chat history.
 * `/pdf <url>`: Read PDF from URL and summarize its contents.
 * `/html <url>`: Read HTML from URL and summarize its contents.
-* `/youtube <url>`: Read YouTube transcripts from URL and summarize them.
+* `/youtube <url> [start-end]`: Read YouTube transcripts from URL and summarize them, optionally only a time range such as `10:00-25:00`.
 * `/subject <topic>`: Search arXiv for a topic and summarize the results.
 """
 
@@ -95,30 +151,39 @@ Available commands:
 
 def _handle_html_command(url):
     """
-    requests를 이용해서 웹 페치 기능을 대신한다.
+    html_text로 웹 페이지를 내려받으면서 태그와 메뉴 등을 걷어내고 본문과 링크만 추린다.
     """
 
+    import google.generativeai.types as genai_types
+    import html_text
+
     try:
         prompt = f"Analyze and summarize the content from {url}"
         st.chat_message("user").markdown(prompt)
         add_message("user", prompt)
 
-        with st.spinner(f"Downloading HTML from {url}..."):
-            response = requests.get(url)
-            response.raise_for_status()
-            html_content = response.text
+        history = st.session_state.chat_history.contents()
+        prefix = "Please analyze and summarize the following web page contents:\n\n"
+        budget = tokens.TokenBudget(st.session_state.model, template=prefix, history=history)
 
-        prompt = f"Please analyze and summarize the following HTML contents:\n\n{html_content}"
+        model = st.session_state.model
 
-        with st.spinner("Analyzing HTML content..."):
-            response = st.session_state.model.generate_content(
-                st.session_state.chat_history + [{"role": "user", "parts": [prompt]}], stream=True)
+        def produce(task):
+            # 본문이 토큰 예산을 채우면 더 내려받지 않는다.
+            task.info["stage"] = f"Downloading HTML from {url}..."
+            with metrics.span("html.download"):
+                page_text = html_text.fetch_text(
+                    url, max_chars=budget.max_chars(), check_cancel=task.stop_if_cancelled)
 
-        with st.chat_message("assistant"):
-            ai_response = st.write_stream(chunk.text for chunk in response)
+            task.info["stage"] = "Analyzing HTML content..."
+            contents = budget.fit_contents(
+                lambda text: history + [{"role": "user", "parts": [prefix + text]}], page_text)
+            yield from metrics.generate_stream(model, contents, "html", check_cancel=task.stop_if_cancelled)
 
-        add_message("model", ai_response)
+        _run_reply_job(f"HTML 요약: {url}", produce)
 
+    except jobs.JobCancelled:
+        st.info("응답 생성을 취소했다.")
     except genai_types.BlockedPromptException as e:
         st.error(
             f"The prompt was blocked due to safety concerns or other reasons: {e}")
@@ -133,59 +198,57 @@ def _handle_pdf_command(url):
     PDF 파일을 URL에서 다운로드하고 텍스트를 추출한 후 Gemini 모델로 요약한다.
     """
 
+    import google.generativeai.types as genai_types
+    import PyPDF2
+    import requests
+    import http_client
+    import pdf_extract
+
     try:
         prompt = f"Analyze the PDF content from {url}"
         st.chat_message("user").markdown(prompt)
         add_message("user", prompt)
 
-        # Step 1: Get PDF document from URL
-        with st.spinner(f"Downloading PDF from {url}..."):
-            response = requests.get(url)
-            response.raise_for_status()  # HTTP 오류가 있으면 예외 발생
+        history = st.session_state.chat_history.contents()
+        prefix = "Please analyze and summarize the following PDF content:\n\n"
+        budget = tokens.TokenBudget(st.session_state.model, template=prefix, history=history)
 
-            if not response.headers.get('content-type', '').lower().startswith('application/pdf'):
-                st.error("The URL does not point to a valid PDF file.")
-                return
+        model = st.session_state.model
 
-        # Step 2: Get text from PDF
-        with st.spinner("Extracting text from PDF..."):
-            pdf_file = io.BytesIO(response.content)
-
-            try:
-                pdf_reader = PyPDF2.PdfReader(pdf_file)
-
-                # PDF 텍스트 추출
-                text_content = ""
-                for page_num in range(len(pdf_reader.pages)):
-                    page = pdf_reader.pages[page_num]
-                    text_content += page.extract_text() + "\n"
-
-                if not text_content.strip():
-                    st.error(
-                        "Could not extract text from the PDF. The PDF might be image-based or encrypted.")
-                    return
-
-                # 텍스트가 너무 길면 잘라내기 (모델 토큰 제한 고려)
-                if len(text_content) > 30000:  # 약 30KB 제한
-                    text_content = text_content[:30000] + \
-                        "\n\n[Content truncated due to length...]"
-
-            except PyPDF2.PdfReadError as e:
-                st.error(f"Error reading PDF: {e}")
-                return
-
-        # Step 3: Summarize pdf text by using model
-        with st.spinner("Summarizing PDF content..."):
-            prompt = f"Please analyze and summarize the following PDF content:\n\n{text_content}"
-
-            response = st.session_state.model.generate_content(
-                st.session_state.chat_history + [{"role": "user", "parts": [prompt]}], stream=True)
-
-        with st.chat_message("assistant"):
-            ai_response = st.write_stream(chunk.text for chunk in response)
-
-        add_message("model", ai_response)
+        def produce(task):
+            # Step 1: Get PDF document from URL
+            task.info["stage"] = f"Downloading PDF from {url}..."
+            with metrics.span("pdf.download"):
+                response = http_client.fetch(url, check_cancel=task.stop_if_cancelled)  # HTTP 오류가 있으면 예외 발생
 
+            if not response.headers.get('content-type', '').lower().startswith('application/pdf'):
+                raise ValueError("The URL does not point to a valid PDF file.")
+
+            # Step 2: Get text from PDF
+            # PDF 텍스트 추출 (모델의 토큰 예산을 채울 분량까지만 추출한다)
+            task.info["stage"] = "Extracting text from PDF..."
+            with metrics.span("pdf.extract"):
+                text_content, _ = pdf_extract.extract_text(
+                    response.content, max_tokens=budget.tokens, estimate=budget.estimate,
+                    separator="\n", check_cancel=task.stop_if_cancelled)
+
+            if not text_content.strip():
+                raise ValueError(
+                    "Could not extract text from the PDF. The PDF might be image-based or encrypted.")
+
+            # Step 3: Summarize pdf text by using model
+            # 예산을 넘은 마지막 페이지는 잘라낸다.
+            task.info["stage"] = "Summarizing PDF content..."
+            contents = budget.fit_contents(
+                lambda text: history + [{"role": "user", "parts": [prefix + text]}], text_content)
+            yield from metrics.generate_stream(model, contents, "pdf", check_cancel=task.stop_if_cancelled)
+
+        _run_reply_job(f"PDF 요약: {url}", produce)
+
+    except jobs.JobCancelled:
+        st.info("응답 생성을 취소했다.")
+    except PyPDF2.PdfReadError as e:
+        st.error(f"Error reading PDF: {e}")
     except requests.RequestException as e:
         st.error(f"Error downloading PDF: {e}")
     except genai_types.BlockedPromptException as e:
@@ -201,8 +264,16 @@ def _handle_pdf_command(url):
 def _handle_youtube_command(url):
     """
     YouTube 동영상 URL에서 스크립트를 추출하고 Gemini 모델로 요약한다.
+    URL 뒤에 "10:00-25:00"처럼 구간을 주면 그 구간의 스크립트만 요약한다.
+    스크립트는 transcripts 저장소에 저장되므로 같은 영상은 다시 내려받지 않는다.
     """
+
+    import transcripts
+
     try:
+        url, _, time_range = url.partition(" ")
+        start, _, end = time_range.strip().partition("-")
+
         video_id_match = re.search(r"(?<=v=)[a-zA-Z0-9_-]+", url)
         if not video_id_match:
             st.error(
@@ -211,35 +282,39 @@ def _handle_youtube_command(url):
         video_id = video_id_match.group(0)
 
         prompt = f"Analyze the YouTube video transcript from {url}"
+        if time_range.strip():
+            prompt += f" ({time_range.strip()})"
         st.chat_message("user").markdown(prompt)
         add_message("user", prompt)
 
-        with st.spinner(f"Fetching transcript from YouTube video {url}..."):
-            transcript_list = YouTubeTranscriptApi.get_transcript(
-                video_id, languages=("ko", "en"))
-            transcript_text = " ".join([d['text'] for d in transcript_list])
-
-        if not transcript_text.strip():
-            st.error(
-                "Could not extract transcript from the YouTube video. It might not have captions or be unavailable.")
-            return
+        start = transcripts.parse_time(start) if start else None
+        end = transcripts.parse_time(end) if end else None
 
-        # 텍스트가 너무 길면 잘라내기 (모델 토큰 제한 고려)
-        if len(transcript_text) > 30000:  # 약 30KB 제한
-            transcript_text = transcript_text[:30000] + \
-                "\n\n[Content truncated due to length...]"
+        # 텍스트가 모델의 토큰 예산을 넘으면 잘라낸다.
+        history = st.session_state.chat_history.contents()
+        prefix = "Please analyze and summarize the following YouTube video transcript:\n\n"
+        budget = tokens.TokenBudget(st.session_state.model, template=prefix, history=history)
+        model = st.session_state.model
 
-        with st.spinner("Summarizing YouTube transcript..."):
-            prompt = f"Please analyze and summarize the following YouTube video transcript:\n\n{transcript_text}"
+        def produce(task):
+            task.info["stage"] = f"Fetching transcript from YouTube video {url}..."
+            with metrics.span("youtube.transcript"):
+                transcript_text = transcripts.get_transcript(video_id).slice(start, end).text
+            task.stop_if_cancelled()
 
-            response = st.session_state.model.generate_content(
-                st.session_state.chat_history + [{"role": "user", "parts": [prompt]}], stream=True)
+            if not transcript_text.strip():
+                raise ValueError(
+                    "Could not extract transcript from the YouTube video. It might not have captions or be unavailable.")
 
-        with st.chat_message("assistant"):
-            ai_response = st.write_stream(chunk.text for chunk in response)
+            task.info["stage"] = "Summarizing YouTube transcript..."
+            contents = budget.fit_contents(
+                lambda text: history + [{"role": "user", "parts": [prefix + text]}], transcript_text)
+            yield from metrics.generate_stream(model, contents, "youtube", check_cancel=task.stop_if_cancelled)
 
-        add_message("model", ai_response)
+        _run_reply_job(f"YouTube 요약: {video_id}", produce)
 
+    except jobs.JobCancelled:
+        st.info("응답 생성을 취소했다.")
     except Exception as e:
         traceback.print_exc()
         st.error(f"An error occurred while processing YouTube video: {e}")
@@ -249,6 +324,11 @@ def _handle_subject_command(topic):
     """
     arXiv에서 주제를 검색하고 결과를 Gemini 모델로 요약한다.
     """
+    import urllib.parse
+    import google.generativeai.types as genai_types
+    import requests
+    import html_text
+
     try:
         encoded_topic = urllib.parse.quote_plus(topic)
         search_url = f"https://arxiv.org/search/?query={encoded_topic}&searchtype=all&source=header"
@@ -256,27 +336,28 @@ def _handle_subject_command(topic):
         st.chat_message("user").markdown(prompt)
         add_message("user", prompt)
 
-        with st.spinner(f"Searching arXiv for '{topic}'..."):
-            response = requests.get(search_url)
-            response.raise_for_status()
-            html_content = response.text
+        history = st.session_state.chat_history.contents()
+        prefix = "Please analyze and summarize the following arXiv search results:\n\n"
+        budget = tokens.TokenBudget(st.session_state.model, template=prefix, history=history)
 
-        # 텍스트가 너무 길면 잘라내기 (모델 토큰 제한 고려)
-        if len(html_content) > 30000:  # 약 30KB 제한
-            html_content = html_content[:30000] + \
-                "\n\n[Content truncated due to length...]"
+        model = st.session_state.model
 
-        with st.spinner("Summarizing arXiv search results..."):
-            prompt = f"Please analyze and summarize the following arXiv search results (HTML content):\n\n{html_content}"
+        def produce(task):
+            # 태그를 걷어낸 본문과 링크를 모델의 토큰 예산만큼 사용한다.
+            task.info["stage"] = f"Searching arXiv for '{topic}'..."
+            with metrics.span("subject.search"):
+                page_text = html_text.fetch_text(
+                    search_url, max_chars=budget.max_chars(), check_cancel=task.stop_if_cancelled)
 
-            response = st.session_state.model.generate_content(
-                st.session_state.chat_history + [{"role": "user", "parts": [prompt]}], stream=True)
+            task.info["stage"] = "Summarizing arXiv search results..."
+            contents = budget.fit_contents(
+                lambda text: history + [{"role": "user", "parts": [prefix + text]}], page_text)
+            yield from metrics.generate_stream(model, contents, "subject", check_cancel=task.stop_if_cancelled)
 
-        with st.chat_message("assistant"):
-            ai_response = st.write_stream(chunk.text for chunk in response)
-
-        add_message("model", ai_response)
+        _run_reply_job(f"arXiv 검색 요약: {topic}", produce)
 
+    except jobs.JobCancelled:
+        st.info("응답 생성을 취소했다.")
     except requests.RequestException as e:
         st.error(f"Error searching arXiv: {e}")
     except genai_types.BlockedPromptException as e:
@@ -297,11 +378,18 @@ def _handle_user_input():
     /pdf https://arxiv.org/pdf/2506.21384
     /html https://cadabra.tistory.com/138
     /youtube https://www.youtube.com/watch?v=dQw4w9WgXcQ
+    /youtube https://www.youtube.com/watch?v=dQw4w9WgXcQ 1:00-2:30
     """
 
+    num_messages = len(st.session_state.messages)
+
     if prompt := st.chat_input("Say something..."):
         prompt = prompt.strip()
 
+        # user와 model 메시지가 번갈아 기록되도록, 이전 명령 작업의 응답은 진행 중이면 끝날 때까지 스트리밍하여
+        # 새 입력보다 먼저 대화 기록에 넣는다.
+        _resume_replies()
+
         if prompt.lower() == "/clear":
             _handle_clear_command()
         elif prompt.lower() == "/help":
@@ -347,15 +435,16 @@ def _handle_user_input():
             # Add user message to chat history
             add_message("user", prompt)
 
+            import google.generativeai.types as genai_types
+
             try:
                 with st.spinner("Waiting for response..."):
-                    response = st.session_state.model.generate_content(
-                        st.session_state.chat_history, stream=True)
+                    chunks = metrics.generate_stream(
+                        st.session_state.model, st.session_state.chat_history.contents(), "chat")
 
                 # Display assistant response in chat message container
                 with st.chat_message("assistant"):
-                    ai_response = st.write_stream(
-                        chunk.text for chunk in response)
+                    ai_response = stream_render.write_stream(chunks)
                 # Add assistant response to chat history
                 add_message("model", ai_response)
 
@@ -367,6 +456,16 @@ def _handle_user_input():
             except Exception as e:
                 traceback.print_exc()
                 st.error(f"An error occurred: {e}")
+    else:
+        _resume_replies()
+
+    # 응답을 기록했으면 다시 실행하여 render_messages가 새 메시지까지 그리게 한다.
+    # 오류만 보여 준 실행은 메시지가 사라지지 않도록 다시 실행하지 않는다.
+    messages = st.session_state.messages
+    if len(messages) > num_messages and messages[-1]["role"] == "assistant":
+        st.rerun()
 
 
 _handle_user_input()
+
+metrics.sidebar_panel()
@@ -0,0 +1,265 @@
+import atexit
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import weakref
+import metrics
+import retrieval
+
+
+# 메모리에 올려 두는 문서(텍스트와 검색 색인)의 최대 추정 크기.
+MAX_BYTES = int(os.getenv("DOC_STORE_MB", "256")) * 1024 * 1024
+
+# 메모리가 부족할 때 사용 중인 문서를 내려 두는 디렉터리의 상위 디렉터리.
+SPILL_DIR = os.getenv("DOC_STORE_SPILL_DIR", "data/doc_store")
+
+# 검색 색인의 posting 하나((doc_id, tf) 튜플과 리스트 슬롯)의 추정 크기.
+POSTING_BYTES = 72
+
+
+def process_rss() -> int:
+    """
+    현재 프로세스의 RSS(바이트)를 반환한다. 알 수 없으면 None.
+    """
+
+    try:
+        with open("/proc/self/statm", "r", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+
+    try:
+        import resource
+
+        # 최대 RSS이며, macOS는 바이트, Linux는 KB 단위이다.
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except (ImportError, OSError):
+        return None
+
+
+class Document:
+    """
+    추출한 PDF 텍스트 하나. 페이지 목록, 전체 텍스트, 검색 색인을 함께 들고 있다.
+    """
+
+    def __init__(self, key: str, pages: list):
+        self.key = key
+        self.pages = pages
+        self.text = "".join(pages)
+        self.index = retrieval.build_index(pages)
+        self.nbytes = self._estimate_bytes()
+
+    def _estimate_bytes(self) -> int:
+        size = sys.getsizeof(self.text) + sum(sys.getsizeof(page) for page in self.pages)
+        size += sum(sys.getsizeof(chunk.text) for chunk in self.index.chunks)
+        size += sum(len(posting) for posting in self.index.postings.values()) * POSTING_BYTES
+        size += len(self.index.postings) * 100
+        return size
+
+
+class DocHandle:
+    """
+    세션이 들고 있는 문서 참조. 세션이 끝나 handle이 사라지거나 release()하면 참조가 풀린다.
+    """
+
+    def __init__(self, store: "DocumentStore", key: str):
+        self.store = store
+        self.key = key
+        self._finalizer = weakref.finalize(self, store.release, key)
+
+    @property
+    def doc(self) -> Document:
+        return self.store.get(self.key)
+
+    def release(self) -> None:
+        self._finalizer()
+
+
+class DocumentStore:
+    """
+    프로세스 전체에서 공유하는 문서 저장소. key는 PDF 내용의 해시이다.
+    같은 문서를 여러 세션이 열어도 메모리에는 하나만 올라가며, 세션은 DocHandle만 들고 있다.
+
+    메모리 사용량이 max_bytes를 넘으면 오래 쓰지 않은 문서부터 내린다.
+    아무도 참조하지 않는 문서는 버리고(다시 열면 페이지 캐시에서 읽는다),
+    참조 중인 문서는 spill 디렉터리에 페이지를 써 두었다가 다시 접근할 때 읽어 온다.
+    """
+
+    def __init__(self, max_bytes: int = MAX_BYTES, spill_dir: str = SPILL_DIR):
+        self.max_bytes = max_bytes
+
+        # 이전 프로세스가 남긴 파일과 섞이지 않도록 프로세스마다 새 디렉터리를 쓴다.
+        os.makedirs(spill_dir, exist_ok=True)
+        self.spill_dir = tempfile.mkdtemp(prefix=f"{os.getpid()}-", dir=spill_dir)
+        atexit.register(shutil.rmtree, self.spill_dir, True)
+
+        self._lock = threading.RLock()
+        self._key_locks = {}
+
+        # key -> {"doc", "refs", "bytes", "last_used", "spilled"}
+        self._entries = {}
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.disk_loads = 0
+        self.spills = 0
+        self.evictions = 0
+
+    def _spill_path(self, key: str) -> str:
+        return os.path.join(self.spill_dir, key + ".json")
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _put(self, doc: Document) -> None:
+        with self._lock:
+            entry = self._entries.setdefault(doc.key, {"refs": 0, "spilled": False})
+            entry.update(doc=doc, bytes=doc.nbytes, last_used=time.monotonic())
+            self._bytes += doc.nbytes
+
+    def _load_spilled(self, key: str) -> Document:
+        try:
+            with open(self._spill_path(key), "r", encoding="utf-8") as f:
+                pages = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        with self._lock:
+            self.disk_loads += 1
+        return Document(key, pages)
+
+    def acquire(self, key: str, loader) -> DocHandle:
+        """
+        key 문서의 handle을 반환한다. 메모리나 디스크에 없으면 loader()가 반환한 페이지 목록으로 만든다.
+        """
+
+        with self._key_lock(key):
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry["doc"] is not None:
+                    self.hits += 1
+                    metrics.record_cache("doc_store", True)
+                    entry["refs"] += 1
+                    entry["last_used"] = time.monotonic()
+                    return DocHandle(self, key)
+
+            doc = self._load_spilled(key) if entry is not None else None
+            if doc is None:
+                with self._lock:
+                    self.misses += 1
+                metrics.record_cache("doc_store", False)
+                doc = Document(key, loader())
+
+            self._put(doc)
+            with self._lock:
+                self._entries[key]["refs"] += 1
+
+        self._enforce_budget(keep=key)
+        return DocHandle(self, key)
+
+    def get(self, key: str) -> Document:
+        """
+        참조 중인 문서를 반환한다. 디스크로 내려 둔 문서이면 다시 읽어 온다.
+        """
+
+        with self._key_lock(key):
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is None:
+                    return None
+                entry["last_used"] = time.monotonic()
+                doc = entry["doc"]
+
+            if doc is None:
+                doc = self._load_spilled(key)
+                if doc is None:
+                    return None
+                self._put(doc)
+
+        self._enforce_budget(keep=key)
+        return doc
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+
+            entry["refs"] -= 1
+            if entry["refs"] > 0:
+                return
+
+            # 아무도 참조하지 않으면 디스크 사본은 지운다. 메모리의 문서는 예산이 남는 동안 재사용한다.
+            if entry["spilled"]:
+                try:
+                    os.remove(self._spill_path(key))
+                except OSError:
+                    pass
+                entry["spilled"] = False
+            if entry["doc"] is None:
+                del self._entries[key]
+
+    def _enforce_budget(self, keep: str = None) -> None:
+        with self._lock:
+            if self._bytes <= self.max_bytes:
+                return
+
+            # 참조하지 않는 문서부터, 그다음 오래 쓰지 않은 문서부터 내린다.
+            candidates = sorted(
+                (entry["refs"] > 0, entry["last_used"], key)
+                for key, entry in self._entries.items()
+                if entry["doc"] is not None and key != keep
+            )
+
+            for referenced, _, key in candidates:
+                # 매번 내리지 않도록 한도의 90%까지 비운다.
+                if self._bytes <= self.max_bytes * 0.9:
+                    break
+
+                entry = self._entries[key]
+                if referenced and not entry["spilled"]:
+                    try:
+                        with open(self._spill_path(key), "w", encoding="utf-8") as f:
+                            json.dump(entry["doc"].pages, f, ensure_ascii=False)
+                    except OSError:
+                        print("Error while accessing", self._spill_path(key))
+                        continue
+                    entry["spilled"] = True
+
+                self._bytes -= entry["bytes"]
+                entry["doc"] = None
+
+                if referenced:
+                    self.spills += 1
+                else:
+                    self.evictions += 1
+                    del self._entries[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            in_memory = [entry for entry in self._entries.values() if entry["doc"] is not None]
+            return {
+                "documents": len(self._entries),
+                "in_memory": len(in_memory),
+                "on_disk": sum(1 for entry in self._entries.values() if entry["spilled"]),
+                "refs": sum(entry["refs"] for entry in self._entries.values()),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_loads": self.disk_loads,
+                "spills": self.spills,
+                "evictions": self.evictions,
+                "rss_bytes": process_rss(),
+            }
+
+
+# 프로세스 전체에서 공유하는 문서 저장소. 모든 streamlit 세션이 함께 사용한다.
+store = DocumentStore()
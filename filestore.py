@@ -1,9 +1,35 @@
 import os
 import base64
+import binascii
+import sqlite3
+import threading
+import traceback
+import metrics
 
 
-class FileStore:
+class StoreListeners:
+    """
+    저장소에 값이 저장되거나 삭제될 때마다 callback(name, data)를 호출한다.
+    삭제이면 data는 None이다. callback의 예외는 저장에 영향을 주지 않는다.
+    """
+
+    def __init__(self):
+        self._listeners = []
+
+    def add_listener(self, callback) -> None:
+        self._listeners.append(callback)
+
+    def _notify(self, name: str, data: str) -> None:
+        for callback in self._listeners:
+            try:
+                callback(name, data or None)
+            except Exception:
+                traceback.print_exc()
+
+
+class FileStore(StoreListeners):
     def __init__(self, data_dir: str = "data"):
+        super().__init__()
         self.data_dir = data_dir
         os.makedirs(self.data_dir, exist_ok=True)
 
@@ -14,12 +40,29 @@ class FileStore:
 
         return base64.urlsafe_b64encode(name.encode("utf-8")).decode("ascii")
 
+    def _decode_name(self, encoded_name: str) -> str:
+        """
+        base64로 인코딩된 파일 이름을 원래의 name 문자열로 복원.
+        디코딩할 수 없는 파일 이름이면 None 반환.
+        """
+
+        try:
+            return base64.urlsafe_b64decode(encoded_name.encode("ascii")).decode("utf-8")
+        except (binascii.Error, UnicodeError, ValueError):
+            return None
+
     def __setitem__(self, name: str, data: str) -> None:
         """
         name을 base64로 인코딩하여 파일 이름으로 사용.
         해당 경로에 텍스트 파일로 data 저장.
         """
 
+        if self._write_file(name, data):
+            if data:
+                metrics.record_write(self.data_dir, len(data.encode("utf-8")))
+            self._notify(name, data)
+
+    def _write_file(self, name: str, data: str) -> bool:
         encoded_name = self._encode_name(name)
         file_path = os.path.join(self.data_dir, encoded_name)
 
@@ -29,9 +72,10 @@ class FileStore:
                     f.write(data)
             else:
                 os.remove(file_path)
+            return True
         except:
             print("Error while accessing", file_path)
-            pass
+            return False
 
     def __getitem__(self, name: str) -> str:
         """
@@ -39,6 +83,11 @@ class FileStore:
         해당 파일이 존재하면 내용을 반환, 없으면 None 반환.
         """
 
+        data = self._read_file(name)
+        metrics.record_cache(self.data_dir, data is not None, len(data.encode("utf-8")) if data else 0)
+        return data
+
+    def _read_file(self, name: str) -> str:
         encoded_name = self._encode_name(name)
         file_path = os.path.join(self.data_dir, encoded_name)
 
@@ -51,3 +100,297 @@ class FileStore:
         except:
             print("Error while accessing", file_path)
             pass
+
+    def __contains__(self, name: str) -> bool:
+        return os.path.isfile(os.path.join(self.data_dir, self._encode_name(name)))
+
+    def __iter__(self):
+        return self.keys()
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.keys())
+
+    def keys(self):
+        """
+        data_dir에 저장된 모든 name을 순회한다.
+        """
+
+        with os.scandir(self.data_dir) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+
+                name = self._decode_name(entry.name)
+                if name is not None:
+                    yield name
+
+    def get_many(self, names) -> dict:
+        """
+        여러 name을 한 번에 조회하여 {name: data} 형태로 반환.
+        존재하지 않는 name은 결과에서 제외된다.
+        """
+
+        results = {}
+        for name in names:
+            data = self[name]
+            if data is not None:
+                results[name] = data
+        return results
+
+    def set_many(self, items) -> None:
+        """
+        {name: data} 또는 (name, data) 목록을 한 번에 저장.
+        data가 비어 있으면 해당 name을 삭제한다.
+        """
+
+        if isinstance(items, dict):
+            items = items.items()
+
+        for name, data in items:
+            self[name] = data
+
+
+class SqliteStore(StoreListeners):
+    """
+    FileStore와 같은 인터페이스를 제공하는 SQLite 기반 저장소.
+    모든 name을 하나의 WAL 모드 데이터베이스 파일에 저장하므로
+    name이 많아도 조회, 목록, 일괄 처리가 빠르다.
+    """
+
+    # SQLite의 바인딩 변수 개수 제한을 넘지 않도록 IN (...) 질의를 나눈다.
+    _BATCH_SIZE = 500
+
+    def __init__(self, db_path: str = "data/store.sqlite3"):
+        super().__init__()
+        self.db_path = db_path
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        # streamlit은 스크립트를 여러 스레드에서 실행하므로 연결 하나를 lock으로 보호한다.
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            db_path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS store (name TEXT PRIMARY KEY, data TEXT NOT NULL)"
+        )
+
+    def __setitem__(self, name: str, data: str) -> None:
+        """
+        name에 data를 저장. data가 비어 있으면 name을 삭제한다.
+        """
+
+        try:
+            with self._lock:
+                if data:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO store (name, data) VALUES (?, ?)",
+                        (name, data),
+                    )
+                else:
+                    self._conn.execute("DELETE FROM store WHERE name = ?", (name,))
+        except sqlite3.Error as e:
+            print("Error while accessing", self.db_path, e)
+            return
+
+        if data:
+            metrics.record_write(self.db_path, len(data.encode("utf-8")))
+        self._notify(name, data)
+
+    def __getitem__(self, name: str) -> str:
+        """
+        name에 저장된 data를 반환, 없으면 None 반환.
+        """
+
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT data FROM store WHERE name = ?", (name,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            print("Error while accessing", self.db_path, e)
+            return None
+
+        data = row[0] if row else None
+        metrics.record_cache(self.db_path, data is not None, len(data.encode("utf-8")) if data else 0)
+        return data
+
+    def __contains__(self, name: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM store WHERE name = ?", (name,)
+            ).fetchone()
+        return row is not None
+
+    def __iter__(self):
+        return self.keys()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM store").fetchone()[0]
+
+    def keys(self):
+        """
+        저장된 모든 name을 순회한다.
+        순회 중에도 다른 스레드가 저장소를 쓸 수 있도록 목록을 먼저 읽어 둔다.
+        """
+
+        with self._lock:
+            names = [row[0] for row in self._conn.execute("SELECT name FROM store")]
+        return iter(names)
+
+    def get_many(self, names) -> dict:
+        """
+        여러 name을 한 번에 조회하여 {name: data} 형태로 반환.
+        존재하지 않는 name은 결과에서 제외된다.
+        """
+
+        names = list(names)
+        results = {}
+
+        try:
+            with self._lock:
+                for i in range(0, len(names), self._BATCH_SIZE):
+                    batch = names[i:i + self._BATCH_SIZE]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = self._conn.execute(
+                        f"SELECT name, data FROM store WHERE name IN ({placeholders})",
+                        batch,
+                    )
+                    results.update(rows)
+        except sqlite3.Error as e:
+            print("Error while accessing", self.db_path, e)
+
+        read_bytes = sum(len(data.encode("utf-8")) for data in results.values())
+        metrics.registry.inc("cache_requests_total", len(results), cache=self.db_path, result="hit")
+        metrics.registry.inc("cache_requests_total", len(names) - len(results), cache=self.db_path, result="miss")
+        metrics.registry.inc("cache_bytes_total", read_bytes, cache=self.db_path, op="read")
+        return results
+
+    def set_many(self, items) -> None:
+        """
+        {name: data} 또는 (name, data) 목록을 하나의 트랜잭션으로 저장.
+        data가 비어 있으면 해당 name을 삭제한다.
+        """
+
+        if isinstance(items, dict):
+            items = items.items()
+
+        upserts = []
+        deletes = []
+        for name, data in items:
+            if data:
+                upserts.append((name, data))
+            else:
+                deletes.append((name,))
+
+        try:
+            with self._lock:
+                self._conn.execute("BEGIN")
+                try:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO store (name, data) VALUES (?, ?)",
+                        upserts,
+                    )
+                    self._conn.executemany("DELETE FROM store WHERE name = ?", deletes)
+                except sqlite3.Error:
+                    self._conn.execute("ROLLBACK")
+                    raise
+                self._conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            print("Error while accessing", self.db_path, e)
+            return
+
+        metrics.record_write(self.db_path, sum(len(data.encode("utf-8")) for _, data in upserts))
+        for name, data in upserts:
+            self._notify(name, data)
+        for name, in deletes:
+            self._notify(name, None)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def open_store(data_dir: str):
+    """
+    FILESTORE_BACKEND 환경 변수에 따라 저장소를 연다.
+    "sqlite"이면 data_dir 옆의 <data_dir>.sqlite3 파일을,
+    "blob"이면 <data_dir>.blobs 디렉터리의 압축 BlobStore(FILESTORE_CODEC)를,
+    그 외에는 FileStore를 사용한다.
+    """
+
+    backend = os.getenv("FILESTORE_BACKEND", "file").lower()
+
+    if backend == "sqlite":
+        return SqliteStore(data_dir.rstrip("/\\") + ".sqlite3")
+
+    if backend == "blob":
+        from blobstore import BlobStore
+
+        codec = os.getenv("FILESTORE_CODEC", "zlib").lower()
+        return BlobStore(data_dir.rstrip("/\\") + ".blobs", codec)
+
+    return FileStore(data_dir)
+
+
+def migrate(data_dir: str, db_path: str = None, batch_size: int = 1000) -> int:
+    """
+    FileStore 디렉터리의 모든 항목을 SqliteStore로 복사하고 복사한 개수를 반환.
+    원본 디렉터리는 그대로 둔다.
+    """
+
+    source = FileStore(data_dir)
+    target = SqliteStore(db_path or data_dir.rstrip("/\\") + ".sqlite3")
+
+    count = 0
+    batch = []
+    for name in source.keys():
+        data = source[name]
+        if not data:
+            continue
+
+        batch.append((name, data))
+        if len(batch) >= batch_size:
+            target.set_many(batch)
+            count += len(batch)
+            batch = []
+
+    if batch:
+        target.set_many(batch)
+        count += len(batch)
+
+    target.close()
+    return count
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="FileStore maintenance tool")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    migrate_parser = subparsers.add_parser(
+        "migrate", help="Copy a FileStore directory into a SQLite database."
+    )
+    migrate_parser.add_argument("data_dir", help="FileStore directory, e.g. data/arxiv")
+    migrate_parser.add_argument("--db", help="Target database path (default: <data_dir>.sqlite3)")
+
+    count_parser = subparsers.add_parser("count", help="Count keys in a store.")
+    count_parser.add_argument("data_dir", help="FileStore directory, e.g. data/arxiv")
+
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        count = migrate(args.data_dir, args.db)
+        print(f"Migrated {count} entries from {args.data_dir}")
+    elif args.command == "count":
+        print(len(open_store(args.data_dir)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+import os
+import re
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+import http_client
+
+
+# 프롬프트에 넣는 본문의 기본 최대 글자 수.
+MAX_CHARS = 100000
+
+# HTML 페이지를 내려받는 최대 크기. 본문이 MAX_CHARS를 채우면 그 전에 멈춘다.
+MAX_BYTES = int(os.getenv("HTML_MAX_MB", "5")) * 1024 * 1024
+
+# 본문 뒤에 붙이는 링크의 최대 개수.
+MAX_LINKS = 100
+
+# 내용을 통째로 버리는 요소.
+SKIP_TAGS = frozenset(
+    "script style noscript template svg canvas iframe object head nav aside "
+    "form button select textarea dialog".split()
+)
+
+# 본문 요소 밖에 있으면 사이트 머리말과 꼬리말로 보고 버리는 요소.
+# article 안의 header에는 글 제목이 들어 있으므로 본문 요소 안에서는 남긴다.
+PAGE_CHROME_TAGS = frozenset(("header", "footer"))
+
+# 닫는 태그가 없는 요소.
+VOID_TAGS = frozenset(
+    "area base br col embed hr img input link meta param source track wbr".split()
+)
+
+# 앞뒤로 줄을 바꾸는 요소.
+BLOCK_TAGS = frozenset(
+    "address article blockquote dd div dl dt figcaption figure h1 h2 h3 h4 h5 h6 main "
+    "ol p pre section table tbody thead tr ul".split()
+)
+
+# 본문이 들어 있는 요소. 충분한 글자가 있으면 이 안의 텍스트만 사용한다.
+MAIN_TAGS = frozenset(("article", "main"))
+
+# class, id, role에 이런 단어가 있는 요소는 메뉴, 광고, 공유 버튼 등으로 보고 버린다.
+BOILERPLATE_PATTERN = re.compile(
+    r"(?:^|[\s_-])(?:nav|navbar|menu|breadcrumbs?|sidebar|footer|banner|cookie|"
+    r"consent|popup|modal|share|social|comments?|related|advert|ads?|promo|subscribe|"
+    r"newsletter|skip|navigation)(?:$|[\s_-])",
+    re.IGNORECASE,
+)
+
+# 본문 요소 안의 텍스트가 이보다 짧으면 페이지 전체 텍스트를 사용한다.
+MIN_MAIN_CHARS = 500
+
+WHITESPACE_PATTERN = re.compile(r"[ \t\r\f\v\n]+")
+
+
+class HtmlReducer(HTMLParser):
+    """
+    HTML을 조금씩 feed()하면서 프롬프트용 텍스트와 링크를 모은다.
+    스크립트, 스타일, 메뉴 등은 버리고, 제목은 markdown 제목으로, 목록은 "- "로 바꾼다.
+    본문 텍스트가 max_chars를 넘으면 full이 True가 되어 더 내려받지 않아도 된다.
+    """
+
+    def __init__(self, base_url: str = "", max_chars: int = MAX_CHARS):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.max_chars = max_chars
+
+        self.title = ""
+        self.links = {}
+
+        # (tag, skip, main) 목록. 닫는 태그가 빠진 HTML도 처리할 수 있도록 직접 관리한다.
+        self._stack = []
+        self._skip_depth = 0
+        self._main_depth = 0
+        self._in_title = False
+
+        self._all = []
+        self._main = []
+        self._all_chars = 0
+        self._main_chars = 0
+
+        self._link_href = None
+        self._link_text = []
+
+    @property
+    def full(self) -> bool:
+        return self._main_chars >= self.max_chars or (
+            self._main_chars < MIN_MAIN_CHARS and self._all_chars >= self.max_chars
+        )
+
+    def _emit(self, text: str) -> None:
+        if self._all_chars < self.max_chars:
+            self._all.append(text)
+            self._all_chars += len(text)
+        if self._main_depth and self._main_chars < self.max_chars:
+            self._main.append(text)
+            self._main_chars += len(text)
+
+    def _is_boilerplate(self, tag: str, attrs: dict) -> bool:
+        if tag in SKIP_TAGS:
+            return True
+        if tag in PAGE_CHROME_TAGS and not self._main_depth:
+            return True
+        if "hidden" in attrs or attrs.get("aria-hidden") == "true":
+            return True
+        names = " ".join(attrs.get(name) or "" for name in ("class", "id", "role"))
+        return bool(names) and BOILERPLATE_PATTERN.search(names) is not None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "title" and not self.title:
+            self._in_title = True
+            return
+
+        if tag in VOID_TAGS:
+            if tag == "br" and not self._skip_depth:
+                self._emit("\n")
+            return
+
+        attrs = dict(attrs)
+        skip = not self._skip_depth and self._is_boilerplate(tag, attrs)
+        main = tag in MAIN_TAGS
+        self._stack.append((tag, skip, main))
+        self._skip_depth += skip
+        self._main_depth += main
+
+        if self._skip_depth:
+            return
+
+        if tag in BLOCK_TAGS:
+            self._emit("\n\n")
+        if tag in ("h1", "h2", "h3", "h4", "h5", "h6"):
+            self._emit("#" * int(tag[1]) + " ")
+        elif tag == "li":
+            self._emit("\n- ")
+        elif tag == "a" and attrs.get("href"):
+            self._link_href = urljoin(self.base_url, attrs["href"])
+            self._link_text = []
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+            return
+
+        # 짝이 맞는 여는 태그까지 스택을 정리한다. 짝이 없으면 무시한다.
+        for index in range(len(self._stack) - 1, -1, -1):
+            if self._stack[index][0] == tag:
+                break
+        else:
+            return
+
+        while len(self._stack) > index:
+            open_tag, skip, main = self._stack.pop()
+            self._skip_depth -= skip
+            self._main_depth -= main
+            if open_tag == "a":
+                self._end_link()
+
+        if not self._skip_depth and tag in BLOCK_TAGS:
+            self._emit("\n\n")
+
+    def _end_link(self) -> None:
+        if self._link_href is None:
+            return
+
+        text = WHITESPACE_PATTERN.sub(" ", "".join(self._link_text)).strip()
+        href = self._link_href
+        self._link_href = None
+
+        if text and href.startswith(("http://", "https://")) and href not in self.links:
+            if len(self.links) < MAX_LINKS:
+                self.links[href] = text
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+            return
+
+        if self._skip_depth:
+            return
+
+        if self._link_href is not None:
+            self._link_text.append(data)
+
+        # 들여쓰기만 있는 텍스트 노드가 글자 수 예산을 차지하지 않게 한다.
+        self._emit(" " if data.isspace() else data)
+
+    def text(self) -> str:
+        """
+        모은 텍스트를 정리하여 반환. 본문 요소가 충분히 길면 그 안의 텍스트만 사용한다.
+        """
+
+        parts = self._main if self._main_chars >= MIN_MAIN_CHARS else self._all
+
+        paragraphs = []
+        for paragraph in "".join(parts).split("\n\n"):
+            lines = (WHITESPACE_PATTERN.sub(" ", line).strip() for line in paragraph.split("\n"))
+            paragraph = "\n".join(line for line in lines if line)
+            if paragraph and paragraph not in ("-", "#", "##", "###"):
+                paragraphs.append(paragraph)
+
+        text = "\n\n".join(paragraphs)
+        if self.full or len(text) > self.max_chars:
+            text = text[:self.max_chars] + "\n\n[Content truncated due to length...]"
+        return text
+
+    def markdown(self) -> str:
+        """
+        제목, 본문, 링크 목록을 합친 프롬프트용 텍스트를 반환.
+        """
+
+        parts = []
+        title = WHITESPACE_PATTERN.sub(" ", self.title).strip()
+        if title:
+            parts.append(f"Title: {title}")
+        parts.append(self.text())
+        if self.links:
+            parts.append("Links:\n" + "\n".join(f"- {text}: {href}" for href, text in self.links.items()))
+        return "\n\n".join(parts)
+
+
+def reduce_html(chunks, base_url: str = "", max_chars: int = MAX_CHARS) -> str:
+    """
+    HTML 텍스트 조각을 차례로 파싱하여 프롬프트용 텍스트를 반환.
+    본문이 max_chars를 채우면 나머지 조각은 읽지 않는다.
+    """
+
+    if isinstance(chunks, str):
+        chunks = [chunks]
+
+    reducer = HtmlReducer(base_url, max_chars)
+    for chunk in chunks:
+        reducer.feed(chunk)
+        if reducer.full:
+            break
+    reducer.close()
+    return reducer.markdown()
+
+
+def fetch_text(url: str, max_chars: int = MAX_CHARS, max_bytes: int = MAX_BYTES, check_cancel=None) -> str:
+    """
+    url을 스트리밍으로 내려받으면서 바로 텍스트로 줄인다.
+    check_cancel이 있으면 조각마다 호출하여 취소되었으면 내려받기를 멈춘다.
+    """
+
+    def checked(chunks):
+        for chunk in chunks:
+            if check_cancel:
+                check_cancel()
+            yield chunk
+
+    chunks = http_client.iter_text(url, max_bytes=max_bytes)
+    try:
+        return reduce_html(checked(chunks), url, max_chars)
+    finally:
+        chunks.close()
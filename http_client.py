@@ -0,0 +1,291 @@
+import codecs
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+
+# (연결, 읽기) 제한 시간(초).
+DEFAULT_TIMEOUT = (10, 60)
+
+# 한 번에 내려받는 응답 본문의 최대 크기.
+MAX_BYTES = int(os.getenv("HTTP_MAX_MB", "100")) * 1024 * 1024
+
+CHUNK_SIZE = 64 * 1024
+
+# 304 응답에서도 그대로 돌려주도록 저장해 두는 헤더.
+STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+
+class ResponseTooLarge(requests.RequestException):
+    pass
+
+
+def _charset(headers) -> str:
+    content_type = headers.get("Content-Type", "")
+    for param in content_type.split(";")[1:]:
+        key, _, value = param.strip().partition("=")
+        if key.lower() == "charset" and value:
+            return value.strip("\"'")
+    return "utf-8"
+
+
+class FetchResult:
+    """
+    fetch()의 결과. requests.Response처럼 content, text, headers를 제공한다.
+    from_cache가 True이면 서버가 304를 반환하여 저장된 본문을 사용한 것이다.
+    """
+
+    def __init__(self, url: str, status_code: int, headers, content: bytes,
+                 from_cache: bool = False):
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+        self.from_cache = from_cache
+
+    @property
+    def encoding(self) -> str:
+        return _charset(self.headers)
+
+    @property
+    def text(self) -> str:
+        try:
+            return self.content.decode(self.encoding, errors="replace")
+        except LookupError:
+            return self.content.decode("utf-8", errors="replace")
+
+
+class ValidatorStore:
+    """
+    URL마다 ETag/Last-Modified와 응답 본문을 디스크에 저장하여 조건부 GET에 사용한다.
+
+    store_dir/<sha256(url)>.json  요청한 URL, 리다이렉트 후 URL, 상태 코드, 저장된 헤더
+    store_dir/<sha256(url)>.body  응답 본문
+
+    전체 크기가 max_bytes를 넘으면 가장 오래 사용하지 않은 응답부터 지운다.
+    max_body_bytes보다 큰 본문은 저장하지 않는다. 큰 PDF 하나가 다른 응답을 모두 밀어내지 않게 한다.
+    """
+
+    def __init__(self, store_dir: str = "data/http", max_bytes: int = 256 * 1024 * 1024,
+                 max_body_bytes: int = 32 * 1024 * 1024):
+        self.store_dir = store_dir
+        self.max_bytes = max_bytes
+        self.max_body_bytes = max_body_bytes
+        os.makedirs(self.store_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._total_bytes = None
+        self.evictions = 0
+
+    def _path(self, url: str, suffix: str) -> str:
+        return os.path.join(self.store_dir, hashlib.sha256(url.encode("utf-8")).hexdigest() + suffix)
+
+    def _write(self, path: str, data: bytes) -> int:
+        fd, tmp_path = tempfile.mkstemp(dir=self.store_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except:
+            os.remove(tmp_path)
+            raise
+        return len(data)
+
+    def load(self, url: str) -> FetchResult:
+        try:
+            with open(self._path(url, ".json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(self._path(url, ".body"), "rb") as f:
+                content = f.read()
+        except (OSError, ValueError):
+            return None
+
+        if meta.get("url") != url:
+            return None
+
+        # 최근에 사용한 응답이 나중에 지워지도록 수정 시각을 갱신한다.
+        try:
+            os.utime(self._path(url, ".body"))
+        except OSError:
+            pass
+
+        return FetchResult(meta.get("final_url", url), meta["status_code"], meta["headers"], content, from_cache=True)
+
+    def save(self, result: FetchResult, key: str = None) -> None:
+        """
+        result를 key(기본값은 result.url)로 저장한다. 리다이렉트된 응답은 요청한 url을 key로 주어야
+        다음 요청에서 찾을 수 있다. result는 바꾸지 않는다.
+        """
+
+        if len(result.content) > self.max_body_bytes:
+            return
+
+        key = key or result.url
+        headers = {name: result.headers[name] for name in STORED_HEADERS if name in result.headers}
+        meta = {"url": key, "final_url": result.url, "status_code": result.status_code, "headers": headers}
+
+        body_path, meta_path = self._path(key, ".body"), self._path(key, ".json")
+        try:
+            # 같은 key의 응답을 덮어쓰면 이전 크기를 빼야 전체 크기가 두 번 세어지지 않는다.
+            old_size = sum(os.path.getsize(path) for path in (body_path, meta_path) if os.path.exists(path))
+            # 본문을 먼저 써야 메타데이터만 있고 본문이 없는 상태가 생기지 않는다.
+            size = self._write(body_path, result.content)
+            size += self._write(meta_path, json.dumps(meta).encode("utf-8"))
+        except OSError:
+            print("Error while accessing", meta_path)
+            return
+
+        self._add_bytes(size - old_size)
+        self._evict_if_needed()
+
+    def _scan(self) -> list:
+        """
+        (본문 수정 시각, 크기, 경로에서 확장자를 뺀 부분) 목록을 반환한다.
+        """
+
+        entries = []
+        for entry in os.scandir(self.store_dir):
+            if not entry.name.endswith(".body"):
+                continue
+            base = entry.path[:-len(".body")]
+            try:
+                stat = entry.stat()
+                size = stat.st_size + os.path.getsize(base + ".json")
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, size, base))
+        return entries
+
+    def _add_bytes(self, size: int) -> None:
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._scan())
+            else:
+                self._total_bytes += size
+
+    def _evict_if_needed(self) -> None:
+        with self._lock:
+            if self._total_bytes is None or self._total_bytes <= self.max_bytes:
+                return
+
+            entries = sorted(self._scan())
+            total = sum(size for _, size, _ in entries)
+
+            # 매번 지우지 않도록 한도의 90%까지 비운다.
+            for _, size, base in entries:
+                if total <= self.max_bytes * 0.9:
+                    break
+                # 메타데이터를 먼저 지워야 본문 없이 메타데이터만 남는 상태가 생기지 않는다.
+                for suffix in (".json", ".body"):
+                    try:
+                        os.remove(base + suffix)
+                    except OSError:
+                        pass
+                total -= size
+                self.evictions += 1
+
+            self._total_bytes = total
+
+
+def create_session(pool_maxsize: int = 16) -> requests.Session:
+    """
+    keep-alive 연결을 재사용하는 requests.Session을 만든다.
+    """
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = "hello-gemini/0.1"
+    return session
+
+
+# streamlit의 모든 세션과 스레드가 연결 풀을 공유한다.
+session = create_session()
+validators = ValidatorStore(
+    os.getenv("HTTP_CACHE_DIR", "data/http"),
+    int(os.getenv("HTTP_CACHE_MB", "256")) * 1024 * 1024,
+    int(os.getenv("HTTP_CACHE_BODY_MB", "32")) * 1024 * 1024,
+)
+
+
+def _read_body(response: requests.Response, max_bytes: int, check_cancel=None) -> bytes:
+    length = response.headers.get("Content-Length")
+    if length and length.isdigit() and int(length) > max_bytes:
+        raise ResponseTooLarge(f"Response is larger than {max_bytes} bytes: {response.url}")
+
+    chunks = []
+    size = 0
+    for chunk in response.iter_content(CHUNK_SIZE):
+        if check_cancel:
+            check_cancel()
+        size += len(chunk)
+        if size > max_bytes:
+            raise ResponseTooLarge(f"Response is larger than {max_bytes} bytes: {response.url}")
+        chunks.append(chunk)
+
+    return b"".join(chunks)
+
+
+def fetch(url: str, timeout=DEFAULT_TIMEOUT, max_bytes: int = MAX_BYTES,
+          revalidate: bool = True, check_cancel=None) -> FetchResult:
+    """
+    공유 세션으로 url을 내려받는다.
+    저장된 ETag/Last-Modified가 있으면 조건부 GET을 보내고, 304이면 저장된 본문을 반환한다.
+    HTTP 오류는 requests.HTTPError, 크기 초과는 ResponseTooLarge로 알린다.
+    check_cancel이 있으면 본문 조각을 읽을 때마다 호출한다. 취소되었으면 예외를 발생시켜 내려받기를 멈춘다.
+    """
+
+    cached = validators.load(url) if revalidate else None
+
+    headers = {}
+    if cached:
+        if "ETag" in cached.headers:
+            headers["If-None-Match"] = cached.headers["ETag"]
+        if "Last-Modified" in cached.headers:
+            headers["If-Modified-Since"] = cached.headers["Last-Modified"]
+
+    with session.get(url, headers=headers, timeout=timeout, stream=True) as response:
+        if response.status_code == 304 and cached:
+            return cached
+
+        response.raise_for_status()
+        content = _read_body(response, max_bytes, check_cancel)
+        result = FetchResult(response.url, response.status_code, response.headers, content)
+
+    if revalidate and ("ETag" in result.headers or "Last-Modified" in result.headers):
+        # 리다이렉트된 경우에도 요청한 url로 다시 찾을 수 있도록 저장한다.
+        validators.save(result, key=url)
+
+    return result
+
+
+def iter_text(url: str, timeout=DEFAULT_TIMEOUT, max_bytes: int = MAX_BYTES):
+    """
+    공유 세션으로 url을 내려받으면서 디코딩한 텍스트 조각을 내보내는 제너레이터.
+    max_bytes까지만 읽고 멈추며, 호출한 쪽이 중간에 close()하면 연결을 바로 닫는다.
+    조건부 GET 캐시는 사용하지 않는다.
+    """
+
+    with session.get(url, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+
+        try:
+            decoder = codecs.getincrementaldecoder(_charset(response.headers))(errors="replace")
+        except LookupError:
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+        size = 0
+        for chunk in response.iter_content(CHUNK_SIZE):
+            chunk = chunk[:max_bytes - size]
+            size += len(chunk)
+            yield decoder.decode(chunk)
+            if size >= max_bytes:
+                break
+
+        yield decoder.decode(b"", final=True)
@@ -0,0 +1,377 @@
+import os
+import threading
+import time
+import uuid
+from singleflight import flights
+
+
+# 동시에 실행하는 작업 수. 나머지는 차례를 기다린다.
+MAX_RUNNING = int(os.getenv("JOB_CONCURRENCY", "4"))
+
+# 끝난 작업은 이 시간(초)이 지나면 목록에서 지운다.
+KEEP_SECONDS = 3600
+
+# 사이드바 작업 패널과 진행 상황을 새로 고치는 간격(초).
+POLL_SECONDS = 1.0
+
+STATE_LABELS = {"queued": "대기 중", "running": "실행 중", "done": "완료", "failed": "실패", "cancelled": "취소됨"}
+
+
+class JobCancelled(Exception):
+    """
+    사용자가 작업을 취소했다.
+    """
+
+
+class Task:
+    """
+    같은 key로 요청한 Job들이 함께 쓰는 실행 단위. 실행과 스트리밍은 singleflight의 Flight가 맡는다.
+    Task를 구독한 Job이 모두 취소되어야 producer를 멈춘다.
+    """
+
+    def __init__(self, key: str, kind: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key or "job:" + self.id
+        self.kind = kind
+        self.flight = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._cancelled = False
+        self._stopping = False
+
+    @property
+    def active(self) -> bool:
+        return self.flight is None or not self.flight.done
+
+    @property
+    def info(self) -> dict:
+        return self.flight.info
+
+    @property
+    def cancelled(self) -> bool:
+        with self._lock:
+            return self._cancelled
+
+    @property
+    def subscribers(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def attach(self, job_id: str) -> bool:
+        """
+        job_id를 구독자로 더한다. 모두 취소했지만 producer가 아직 멈추지 않았으면 취소를 거두고 이어서 실행한다.
+        producer가 이미 멈추기 시작했으면 False.
+        """
+
+        with self._lock:
+            if self._stopping or not self.active:
+                return False
+            self._subscribers.add(job_id)
+            self._cancelled = False
+            return True
+
+    def detach(self, job_id: str) -> None:
+        with self._lock:
+            self._subscribers.discard(job_id)
+            if not self._subscribers:
+                self._cancelled = True
+
+    def stop_if_cancelled(self) -> None:
+        """
+        구독자가 모두 취소했으면 JobCancelled를 발생시킨다. 그 뒤에는 attach()로 되살릴 수 없다.
+        producer는 내려받기, 텍스트 추출, 부분 요약처럼 오래 걸리는 단계에 이 함수를 check_cancel로 넘긴다.
+        """
+
+        with self._lock:
+            if self._cancelled:
+                self._stopping = True
+                raise JobCancelled("The job was cancelled.")
+
+
+class Job:
+    """
+    한 세션이 요청한 백그라운드 작업. 같은 key의 작업이 진행 중이면 여러 Job이 Task 하나를 함께 쓰고,
+    Job은 id, 제목, 취소 여부를 더한다. 진행 단계는 producer가 task.info["stage"]에 쓴다.
+    """
+
+    def __init__(self, task: Task, title: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.task = task
+        self.title = title
+        self.created = time.time()
+
+        self._cancelled = False
+
+    @property
+    def key(self) -> str:
+        return self.task.key
+
+    @property
+    def kind(self) -> str:
+        return self.task.kind
+
+    @property
+    def flight(self):
+        return self.task.flight
+
+    @property
+    def started(self) -> float:
+        return self.task.started
+
+    @property
+    def finished(self) -> float:
+        return self.task.finished
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def cancel(self) -> None:
+        """
+        이 Job만 취소한다. 같은 작업을 구독한 다른 세션은 계속 결과를 받고,
+        남은 구독자가 없으면 작업은 다음 청크가 나올 때 멈추며 부분 결과는 journal에 남는다.
+        """
+
+        if not self._cancelled:
+            self._cancelled = True
+            self.task.detach(self.id)
+
+    @property
+    def active(self) -> bool:
+        return not self._cancelled and self.task.active
+
+    @property
+    def state(self) -> str:
+        if self._cancelled:
+            return "cancelled"
+        flight = self.flight
+        if flight is not None and flight.done:
+            if isinstance(flight.error, JobCancelled):
+                return "cancelled"
+            return "failed" if flight.error else "done"
+        return "running" if self.started else "queued"
+
+    def progress(self) -> dict:
+        flight = self.flight
+        info = dict(flight.info) if flight else {}
+        chars = sum(len(chunk) for chunk in flight.chunks) if flight else 0
+        end = self.finished or time.time()
+        return {
+            "state": self.state,
+            "stage": info.get("stage", ""),
+            "chars": chars,
+            "seconds": end - (self.started or end),
+            "error": str(flight.error) if flight and flight.error else None,
+        }
+
+    def waiting_for_output(self) -> bool:
+        return self.active and not (self.flight and self.flight.chunks)
+
+    def stream(self):
+        """
+        지금까지의 텍스트를 내보낸 뒤 작업이 끝날 때까지 새 청크를 내보낸다.
+        작업이 실패하거나 이 Job을 취소하면 예외를 발생시킨다.
+        """
+
+        if self._cancelled:
+            raise JobCancelled("The job was cancelled.")
+        for text in self.flight.stream():
+            if self._cancelled:
+                raise JobCancelled("The job was cancelled.")
+            yield text
+
+
+class JobQueue:
+    """
+    프로세스 전체의 작업 목록. 모든 streamlit 세션이 함께 사용한다.
+    같은 key의 작업이 진행 중이면 새로 시작하지 않고 그 Task를 구독하는 Job을 반환한다.
+    작업은 백그라운드 스레드에서 실행되므로 스크립트가 다시 실행되거나 메뉴를 바꿔도 계속된다.
+    """
+
+    def __init__(self, max_running: int = MAX_RUNNING):
+        self.max_running = max_running
+        self._slots = threading.Semaphore(max_running)
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._tasks = {}
+
+    def submit(self, key: str, title: str, producer, kind: str = "summary", on_complete=None,
+               journal=None, journal_key: str = None, on_error=None) -> Job:
+        """
+        producer(task)가 반환하는 텍스트 청크 iterator를 백그라운드에서 소비하는 작업을 만든다.
+        producer는 task.info에 진행 단계를 쓰고, 단계 사이와 단계 안에서 task.stop_if_cancelled()로 취소를 확인한다.
+        on_complete, on_error, journal, journal_key는 SingleFlight.join과 같다. key가 None이면 항상 새 작업을 만든다.
+        """
+
+        with self._lock:
+            self._prune()
+
+            task = self._tasks.get(key) if key else None
+            job = Job(task, title) if task is not None else None
+            if job is None or not task.attach(job.id):
+                # 멈추는 중인 이전 작업과 겹치지 않도록 Flight key에 task id를 붙인다.
+                task = Task(key, kind)
+                job = Job(task, title)
+                task.attach(job.id)
+                self._tasks[task.key] = task
+                task.flight = flights.join(
+                    f"{task.key}#{task.id}",
+                    lambda flight: self._produce(task, producer, flight),
+                    on_complete=on_complete,
+                    journal=journal,
+                    journal_key=journal_key or task.key,
+                    on_error=on_error,
+                )
+
+            self._jobs[job.id] = job
+            return job
+
+    def _produce(self, task: Task, producer, flight):
+        task.flight = flight
+        while not self._slots.acquire(timeout=0.2):
+            task.stop_if_cancelled()
+
+        try:
+            task.started = time.time()
+            task.stop_if_cancelled()
+            for text in producer(task):
+                task.stop_if_cancelled()
+                yield text
+        finally:
+            task.finished = time.time()
+            self._slots.release()
+
+    def _prune(self) -> None:
+        cutoff = time.time() - KEEP_SECONDS
+        for job_id, job in list(self._jobs.items()):
+            if not job.task.active and (job.finished or job.created) < cutoff:
+                del self._jobs[job_id]
+        for key, task in list(self._tasks.items()):
+            if not task.active:
+                del self._tasks[key]
+
+    def get(self, job_id: str) -> Job:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def running(self, key: str) -> Task:
+        """
+        key의 작업이 이 프로세스에서 진행 중이고 구독자가 있으면 그 Task를 반환. 없으면 None.
+        """
+
+        with self._lock:
+            task = self._tasks.get(key)
+        if task is not None and task.active and not task.cancelled:
+            return task
+        return None
+
+    def cancel(self, job_id: str) -> None:
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+
+
+# 프로세스 전체에서 공유하는 작업 목록.
+queue = JobQueue()
+
+
+def track(job: Job) -> None:
+    """
+    현재 세션의 작업 목록(st.session_state.jobs)에 job id를 추가한다.
+    """
+
+    import streamlit as st
+
+    job_ids = st.session_state.setdefault("jobs", [])
+    if job.id not in job_ids:
+        job_ids.append(job.id)
+
+
+def session_jobs(kind: str = None) -> list:
+    import streamlit as st
+
+    jobs = [queue.get(job_id) for job_id in st.session_state.get("jobs", [])]
+    return [job for job in jobs if job is not None and (kind is None or job.kind == kind)]
+
+
+def session_job(key: str) -> Job:
+    """
+    현재 세션에서 마지막으로 시작한 key의 작업. 없으면 None.
+    """
+
+    for job in reversed(session_jobs()):
+        if job.key == key:
+            return job
+    return None
+
+
+def watch(job: Job):
+    """
+    작업의 첫 청크가 나올 때까지 진행 단계를 보여 준 뒤 청크 iterator를 반환한다.
+    """
+
+    import streamlit as st
+
+    placeholder = st.empty()
+    while job.waiting_for_output():
+        progress = job.progress()
+        if progress["state"] == "queued":
+            placeholder.caption(f"⏳ 대기 중: 다른 작업 {queue.max_running}개가 실행 중이다.")
+        else:
+            placeholder.caption(f"⏳ {progress['stage'] or job.title} ({progress['seconds']:.0f}s)")
+        time.sleep(POLL_SECONDS / 4)
+    placeholder.empty()
+
+    return job.stream()
+
+
+def _render_progress(job_ids: list, had_active: bool) -> None:
+    import streamlit as st
+
+    jobs = [job for job in map(queue.get, job_ids) if job is not None]
+    for job in jobs:
+        progress = job.progress()
+        line = f"**{STATE_LABELS[progress['state']]}** · {job.title}"
+        if progress["state"] == "running":
+            line += f"  \n{progress['stage'] or '생성 중'} · {progress['chars']:,}자 · {progress['seconds']:.0f}s"
+        elif progress["error"] and progress["state"] == "failed":
+            line += f"  \n{progress['error']}"
+        st.caption(line)
+
+    # 마지막 작업이 끝나면 페이지 전체를 다시 실행하여 결과를 보여 준다.
+    if had_active and not any(job.active for job in jobs):
+        st.rerun()
+
+
+def sidebar_panel() -> None:
+    """
+    사이드바에 현재 세션의 작업과 진행 상황을 보여 준다. 진행 중인 작업이 있으면 POLL_SECONDS마다 새로 고친다.
+    취소 버튼은 fragment 밖에 두어, 응답을 스트리밍하는 중에 눌러도 스크립트가 바로 다시 실행되게 한다.
+    """
+
+    import streamlit as st
+
+    jobs = session_jobs()
+    if not jobs:
+        return
+
+    for job in jobs:
+        if job.active and st.session_state.get(f"cancel_job_{job.id}"):
+            job.cancel()
+
+    active = [job for job in jobs if job.active and not job.cancelled]
+
+    with st.sidebar.expander("작업", expanded=bool(active)):
+        st.fragment(_render_progress, run_every=POLL_SECONDS if active else None)(
+            [job.id for job in jobs], bool(active))
+
+        for job in active:
+            st.button(f"취소: {job.title}", key=f"cancel_job_{job.id}")
+
+        if len(active) < len(jobs) and st.button("끝난 작업 지우기", key="clear_jobs"):
+            st.session_state.jobs = [job.id for job in jobs if job.active]
+            st.rerun()
@@ -0,0 +1,347 @@
+import argparse
+import importlib
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import model_backend
+import resilience
+from percentiles import percentile
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+WORDS = ("transformer attention gradient layer token model training loss dataset "
+         "benchmark 모델 학습 데이터 결과 성능 방법 실험").split()
+
+
+def _text(num_chars: int, seed: int) -> str:
+    rng = random.Random(seed)
+    words = []
+    size = 0
+    while size < num_chars:
+        word = rng.choice(WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return " ".join(words)
+
+
+@lru_cache(maxsize=256)
+def _pdf(num_pages: int, seed: int) -> bytes:
+    from benchmark_pdf_extract import make_pdf
+
+    return make_pdf(num_pages, seed=seed)
+
+
+def _html(seed: int) -> bytes:
+    paragraphs = "".join(f"<p>{_text(600, seed * 100 + i)}</p>" for i in range(30))
+    return (f"<html><head><title>Load test {seed}</title></head><body><nav><a href='/'>Home</a></nav>"
+            f"<article><h1>Load test {seed}</h1>{paragraphs}</article></body></html>").encode("utf-8")
+
+
+class Site:
+    """
+    진입점이 내려받을 PDF와 HTML 페이지를 제공하는 로컬 HTTP 서버. seed마다 다른 문서를 내보내므로
+    요청마다 내려받기, 텍스트 추출, 캐시 저장을 모두 거친다.
+    """
+
+    def __init__(self, pdf_pages: int):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        self.pdf_pages = pdf_pages
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                name, _, seed = self.path.split("?")[0].lstrip("/").partition("-")
+                if name == "paper" and seed.endswith(".pdf") and seed[:-4].isdigit():
+                    body, content_type = site.pdf(int(seed[:-4])), "application/pdf"
+                elif name == "page" and seed.endswith(".html") and seed[:-5].isdigit():
+                    body, content_type = _html(int(seed[:-5])), "text/html; charset=utf-8"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, name="loadgen-site", daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def pdf(self, seed: int) -> bytes:
+        return _pdf(self.pdf_pages, seed)
+
+    def pdf_url(self, seed: int) -> str:
+        return f"{self.url}/paper-{seed}.pdf"
+
+    def html_url(self, seed: int) -> str:
+        return f"{self.url}/page-{seed}.html"
+
+
+class TimedModel:
+    """
+    모델 호출을 그대로 넘기면서 요청 하나에서 받은 첫 청크 시각, 청크 수, 글자 수를 센다.
+    진입점 함수와 streamlit 앱에 모델 대신 넘긴다.
+    """
+
+    def __init__(self, model):
+        self._model = model
+        self.first_chunk = None
+        self.chunks = 0
+        self.chars = 0
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+    def generate_content(self, contents, stream: bool = False, **kwargs):
+        response = self._model.generate_content(contents, stream=stream, **kwargs)
+        if not stream:
+            self._count(response.text)
+            return response
+        return self._timed(response)
+
+    def _timed(self, response):
+        for chunk in response:
+            self._count(chunk.text)
+            yield chunk
+
+    def _count(self, text: str) -> None:
+        if self.first_chunk is None:
+            self.first_chunk = time.perf_counter()
+        self.chunks += 1
+        self.chars += len(text)
+
+
+def _drain(chunks) -> None:
+    for _ in chunks:
+        pass
+
+
+def _app(script: str, model):
+    """
+    streamlit 앱을 AppTest로 한 번 실행하여 세션을 초기화한 뒤, 세션의 모델을 model로 바꾼다.
+    """
+
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(HERE, script), default_timeout=600)
+    _run_app(at)
+    at.session_state["model"] = model
+    return at
+
+
+@lru_cache(maxsize=None)
+def _share_test_runtime() -> None:
+    """
+    AppTest는 실행마다 전역 Runtime._instance를 자신의 mock으로 바꾸고 끝나면 None으로 지운다.
+    여러 앱을 동시에 실행하면 다른 앱이 먼저 끝난 뒤의 st.rerun이 runtime을 찾지 못하므로,
+    지워진 동안에는 마지막으로 설정된 mock을 돌려준다.
+    """
+
+    from streamlit.runtime import Runtime
+
+    instance = Runtime.instance.__func__
+    last = []
+
+    def shared_instance(cls):
+        if Runtime._instance is not None:
+            last[:] = [Runtime._instance]
+        elif last:
+            return last[0]
+        return instance(cls)
+
+    Runtime.instance = classmethod(shared_instance)
+
+
+def _run_app(at) -> None:
+    """
+    앱을 다시 실행한다. 앱은 오류를 st.error로 보여 주므로 예외와 함께 오류 메시지도 실패로 센다.
+    """
+
+    _share_test_runtime()
+    at.run()
+    errors = [str(e.value) for e in at.exception] + [str(e.value) for e in at.error]
+    if errors:
+        raise RuntimeError(errors[0])
+
+
+# 진입점마다 사용자가 요청할 때 실행되는 실제 함수나 streamlit 핸들러를 가짜 모델로 호출한다.
+# 각 함수는 (model, site, seed)를 받아 세션과 입력을 미리 준비하고, 요청 하나를 처리하는 함수를 돌려준다.
+def _summary_of_arxiv(model, site, seed):
+    from summary_of_arxiv import summaries
+
+    url = site.pdf_url(seed)
+    return lambda: _drain(summaries.start(url, model, summaries.journal(model)).stream())
+
+
+def _summary_of_pdf_file(model, site, seed):
+    from streamlit.testing.v1 import AppTest
+
+    def app(pdf_data):
+        # AppTest.from_function은 함수 본문만 실행하므로 필요한 모듈은 여기서 import한다.
+        import summary_of_pdf_file
+        summary_of_pdf_file.summarize(pdf_data)
+
+    at = AppTest.from_function(app, args=(site.pdf(seed),), default_timeout=600)
+    at.session_state["model"] = model
+    return lambda: _run_app(at)
+
+
+def _summary_of_youtube(model, site, seed):
+    import transcripts
+    from summary_of_youtube import summaries
+
+    # 자막은 내려받지 않고 저장소에 미리 넣어 둔다.
+    video_id = f"loadgen{seed}"
+    segments = [{"text": _text(80, seed * 1000 + i), "start": i * 5.0, "duration": 5.0} for i in range(720)]
+    transcripts.store[video_id] = transcripts.compact(segments)
+
+    return lambda: _drain(summaries.start(video_id, model, summaries.journal(model)).stream())
+
+
+def _demo_genai_pdf(model, site, seed):
+    at = _app("demo-genai-pdf.py", model)
+
+    def send():
+        # PDF URL을 입력하면 첫 요약을 만들고, 질문을 입력하면 관련 청크로 답한다.
+        at.text_input[0].input(site.pdf_url(seed))
+        _run_app(at)
+        at.text_input[1].input("실험 결과를 설명해줘.")
+        _run_app(at)
+
+    return send
+
+
+# demo-genai-streamlit에서 번갈아 보내는 입력.
+CHAT_INPUTS = ("/pdf {pdf}", "/html {html}", "{question}")
+
+
+def _demo_genai_streamlit(model, site, seed):
+    at = _app("demo-genai-streamlit.py", model)
+    prompt = CHAT_INPUTS[seed % len(CHAT_INPUTS)].format(
+        pdf=site.pdf_url(seed), html=site.html_url(seed), question=_text(300, seed))
+    at.chat_input[0].set_value(prompt)
+    return lambda: _run_app(at)
+
+
+def _demo_genai_console(model, site, seed):
+    console = importlib.import_module("demo-genai-console")
+    line = json.dumps({"id": seed, "prompt": _text(300, seed)}, ensure_ascii=False)
+
+    def send():
+        result = console.run_request(model, seed, line)
+        if "error" in result:
+            raise RuntimeError(result["error"])
+
+    return send
+
+
+SCENARIOS = {
+    "summary_of_arxiv": _summary_of_arxiv,
+    "summary_of_pdf_file": _summary_of_pdf_file,
+    "summary_of_youtube": _summary_of_youtube,
+    "demo-genai-pdf": _demo_genai_pdf,
+    "demo-genai-streamlit": _demo_genai_streamlit,
+    "demo-genai-console": _demo_genai_console,
+}
+
+
+def run_request(scenario, model, site, seed) -> dict:
+    timed = TimedModel(model)
+
+    start = time.perf_counter()
+    try:
+        send = scenario(timed, site, seed)
+        start = time.perf_counter()
+        send()
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}", "latency": time.perf_counter() - start}
+
+    return {
+        "ttft": timed.first_chunk - start if timed.first_chunk is not None else None,
+        "latency": time.perf_counter() - start,
+        "chunks": timed.chunks,
+        "chars": timed.chars,
+    }
+
+
+def run_scenario(name: str, model, site, requests: int, concurrency: int) -> dict:
+    scenario = SCENARIOS[name]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda seed: run_request(scenario, model, site, seed), range(requests)))
+    elapsed = time.perf_counter() - start
+
+    ok = [r for r in results if "error" not in r]
+    ttfts = [r["ttft"] for r in ok if r["ttft"] is not None]
+    latencies = [r["latency"] for r in ok]
+
+    return {
+        "name": name,
+        "requests": requests,
+        "errors": len(results) - len(ok),
+        "first_error": next((r["error"] for r in results if "error" in r), None),
+        "elapsed": elapsed,
+        "throughput": len(ok) / elapsed if elapsed else 0.0,
+        "chunks_per_sec": sum(r["chunks"] for r in ok) / elapsed if elapsed else 0.0,
+        "ttft_p50": percentile(ttfts, 50),
+        "ttft_p99": percentile(ttfts, 99),
+        "latency_p50": percentile(latencies, 50),
+        "latency_p99": percentile(latencies, 99),
+    }
+
+
+def print_report(report: dict) -> None:
+    print(f"[{report['name']}] {report['requests']} requests, {report['errors']} errors, "
+          f"{report['elapsed']:.2f}s")
+    print(f"  throughput: {report['throughput']:8.2f} req/s  {report['chunks_per_sec']:8.1f} chunks/s")
+    print(f"  ttft:       p50 {report['ttft_p50'] * 1e3:8.1f}ms  p99 {report['ttft_p99'] * 1e3:8.1f}ms")
+    print(f"  latency:    p50 {report['latency_p50'] * 1e3:8.1f}ms  p99 {report['latency_p99'] * 1e3:8.1f}ms")
+    if report["first_error"]:
+        print(f"  error: {report['first_error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate load against each entry point, driving its real code path with the model backend.")
+    parser.add_argument("--backend", default="fake", choices=["fake", "gemini"])
+    parser.add_argument("--entry", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--model", default=model_backend.MODEL_NAME)
+    parser.add_argument("--pages", type=int, default=20, help="Pages of each generated PDF.")
+    parser.add_argument("--data-dir", help="Directory for the data/ stores. Defaults to a new temporary directory.")
+    parser.add_argument("--resilient", action="store_true",
+                        help="Wrap the model with retries, TTFT deadline, hedging and circuit breaker.")
+    args = parser.parse_args()
+
+    # 앱이 세션을 만들 때 쓰는 모델도 같은 backend를 사용한다.
+    os.environ["MODEL_BACKEND"] = args.backend
+    model_backend.load_env()
+    model = model_backend.get_model(args.model, args.backend)
+    if args.resilient:
+        model = resilience.ResilientModel(model)
+
+    # 진입점 모듈은 data/ 아래 저장소를 import할 때 연다. 실제 요약 저장소와 섞이지 않도록 먼저 작업 디렉터리를 바꾼다.
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="loadgen-")
+    os.chdir(data_dir)
+    print(f"data: {os.path.abspath(data_dir)}")
+
+    site = Site(args.pages)
+    for name in args.entry:
+        print_report(run_scenario(name, model, site, args.requests, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,15 @@
 import streamlit as st
-from dotenv import load_dotenv
-import google.generativeai as genai
-import os
+import jobs
+import metrics
+import model_backend
 
 
 title = "Gemini Chatbot"
 
-load_dotenv()
-api_key = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=api_key)
-
+# 모델은 프로세스 전체에서 한 번만 만들고, 메뉴별 모듈은 선택될 때 import한다.
 if "model" not in st.session_state:
     MODEL_NAME = "gemini-2.5-flash"
-    st.session_state.model = genai.GenerativeModel(MODEL_NAME)
+    st.session_state.model = model_backend.shared_model(MODEL_NAME)
 
 st.set_page_config(
     page_title=title,
@@ -25,9 +22,12 @@ with st.sidebar:
 
     menu_selection = st.radio(
         "메뉴를 선택하세요:",
-        ("Youtube 요약", "논문 파일 요약", "Arxiv 논문 요약")
+        ("Youtube 요약", "논문 파일 요약", "Arxiv 논문 요약", "요약 검색")
     )
 
+    # 요약은 백그라운드 작업으로 실행되므로 메뉴를 바꿔도 계속되며, 진행 상황은 여기서 볼 수 있다.
+    jobs.sidebar_panel()
+
 if menu_selection == "Youtube 요약":
     import summary_of_youtube
 
@@ -43,3 +43,12 @@ elif menu_selection == "Arxiv 논문 요약":
     import summary_of_arxiv
 
     summary_of_arxiv.summarize()
+
+elif menu_selection == "요약 검색":
+    import summary_of_arxiv
+    import summary_of_youtube
+    import summary_search
+
+    summary_search.search_page({"arxiv": summary_of_arxiv.fs, "youtube": summary_of_youtube.fs})
+
+metrics.sidebar_panel()
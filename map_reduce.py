@@ -0,0 +1,169 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+import retrieval
+import tokens
+
+
+# 한 번의 요청으로 요약하는 최대 토큰 수. 이보다 긴 문서는 나누어 요약한 뒤 합친다.
+# 입력 한도(약 1M 토큰)까지 한 번에 넣으면 책 한 권 분량도 나누지 않아 요약이 느리고 세부 내용이 빠진다.
+# 기본값은 보통 논문(수십 쪽)은 한 번에, 수백 쪽 문서는 나누어 요약하는 크기이다.
+# 0이면 모델의 입력 한도에서 프롬프트가 차지하는 토큰을 뺀 값(tokens.TokenBudget)을 쓴다.
+CONTEXT_TOKENS = int(os.getenv("MAP_REDUCE_CONTEXT_TOKENS", "128000"))
+
+# 나누어 요약할 때 한 부분의 목표 글자 수.
+PART_CHARS = int(os.getenv("MAP_REDUCE_PART_CHARS", "100000"))
+
+# 부분 요약을 동시에 요청하는 수.
+MAX_WORKERS = int(os.getenv("MAP_REDUCE_WORKERS", "8"))
+
+# 부분 요약이 충분히 짧아지지 않아도 이 단계 수를 넘겨 반복하지 않는다.
+MAX_LEVELS = 3
+
+part_guide = """This is part {index} of {total} of a longer document{pages}.
+Summarize the main points of this part in detail using markdown bullet points.
+Keep the numbering and titles of the chapters, sections, and subsections that appear in it.
+Keep important numbers, equations, and technical terms as they are.
+Do not add an introduction or a conclusion for the whole document."""
+
+merge_guide = """The context consists of summaries of consecutive parts of one document, in order.
+Merge them into a single summary of the whole document without dropping details.
+Remove repetition between parts and ignore the part boundaries."""
+
+
+def _wrap_long_lines(text: str, width: int) -> str:
+    """
+    width보다 긴 줄을 공백에서 나눈다.
+    줄바꿈 없이 이어진 YouTube 스크립트도 split_chunks로 나눌 수 있게 한다.
+    """
+
+    lines = []
+    for line in text.splitlines():
+        while len(line) > width:
+            cut = line.rfind(" ", 0, width)
+            if cut <= 0:
+                cut = width
+            lines.append(line[:cut])
+            line = line[cut:].lstrip()
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def split_parts(pages: list, part_chars: int = PART_CHARS) -> list:
+    """
+    페이지 텍스트 목록을 절 제목이나 페이지 경계에서 part_chars 정도의 부분(Chunk)으로 나눈다.
+    """
+
+    return retrieval.split_chunks([_wrap_long_lines(page, part_chars) for page in pages], part_chars)
+
+
+def needs_map_reduce(pages: list, context_tokens: int, estimate=tokens.estimate_tokens) -> bool:
+    return sum(estimate(page) for page in pages) > context_tokens
+
+
+def _summarize_part(model, part, index: int, total: int, with_pages: bool) -> str:
+    guide = part_guide.format(
+        index=index, total=total, pages=f" ({part.pages})" if with_pages else ""
+    )
+    prompt = (
+        "Based on the following context, answer the question:\n\n"
+        + "Context: "
+        + part.text
+        + "\n\n"
+        + "Question: "
+        + guide
+    )
+
+    with metrics.span("map_reduce.part"):
+        response = model.generate_content([{"role": "user", "parts": [prompt]}])
+        return response.text
+
+
+def map_parts(model, parts: list, max_workers: int = MAX_WORKERS, with_pages: bool = True,
+              check_cancel=None) -> list:
+    """
+    부분마다 요약을 병렬로 요청하고, 문서 순서대로 부분 요약 목록을 반환한다.
+    check_cancel이 있으면 부분 요약을 요청하기 전마다 호출한다. 취소되면 남은 부분은 요청하지 않는다.
+    """
+
+    def summarize(item):
+        index, part = item
+        if check_cancel:
+            check_cancel()
+        return _summarize_part(model, part, index, len(parts), with_pages)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(parts)))) as pool:
+        return list(pool.map(summarize, enumerate(parts, start=1)))
+
+
+def context_budget(model, summary_guide: str = "") -> tokens.TokenBudget:
+    """
+    마지막 요약 요청에서 문맥에 쓸 수 있는 토큰 예산. CONTEXT_TOKENS가 있으면 그 값으로 제한한다.
+    """
+
+    budget = tokens.TokenBudget(model, template=merge_guide + "\n\n" + summary_guide)
+    if CONTEXT_TOKENS:
+        budget.tokens = min(budget.tokens, CONTEXT_TOKENS)
+    return budget
+
+
+def reduce_pages(model, pages: list, context_tokens: int = None,
+                 part_chars: int = PART_CHARS, max_workers: int = MAX_WORKERS,
+                 info: dict = None, estimate=None, check_cancel=None) -> list:
+    """
+    전체 토큰 수가 context_tokens(기본값은 context_budget()) 이하가 될 때까지 나누어 요약하기를 반복하고,
+    마지막 단계의 부분 요약 목록을 반환한다.
+    info가 있으면 "parts"(첫 단계의 부분 수)와 "levels"(반복한 단계 수)를 기록한다.
+    """
+
+    if context_tokens is None or estimate is None:
+        budget = context_budget(model)
+        context_tokens = budget.tokens if context_tokens is None else context_tokens
+        estimate = estimate or budget.estimate
+
+    level = 0
+    while level < MAX_LEVELS and needs_map_reduce(pages, context_tokens, estimate):
+        parts = split_parts(pages, part_chars)
+        summaries = map_parts(model, parts, max_workers, with_pages=level == 0, check_cancel=check_cancel)
+
+        if level == 0 and info is not None:
+            info["parts"] = len(parts)
+        level += 1
+
+        pages = [f"[Part {index}/{len(parts)}]\n{summary}\n"
+                 for index, summary in enumerate(summaries, start=1)]
+
+    if info is not None:
+        info["levels"] = level
+    return pages
+
+
+def build_contents(model, pages: list, summary_guide: str, info: dict = None, **kwargs) -> list:
+    """
+    요약 요청 contents를 만든다. 문서가 짧으면 원문 전체를, 길면 부분 요약을 문맥으로 넣는다.
+    나눈 경우에도 마지막 요청은 summary_guide를 그대로 사용하므로 결과 형식은 같다.
+    """
+
+    if info is None:
+        info = {}
+    budget = context_budget(model, summary_guide)
+    kwargs.setdefault("context_tokens", budget.tokens)
+    pages = reduce_pages(model, pages, info=info, estimate=budget.estimate, **kwargs)
+
+    question = summary_guide
+    if info["levels"]:
+        question = merge_guide + "\n\n" + summary_guide
+
+    def build(context: str) -> list:
+        prompt = (
+            "Based on the following context, answer the question:\n\n"
+            + "Context: "
+            + context
+            + "\n\n"
+            + "Question: "
+            + question
+        )
+        return [{"role": "user", "parts": [prompt]}]
+
+    # MAX_LEVELS까지 줄여도 예산을 넘으면 뒷부분을 잘라 입력 한도를 넘지 않게 한다.
+    return budget.fit_contents(build, "".join(pages))
@@ -0,0 +1,320 @@
+import contextlib
+import json
+import os
+import threading
+import time
+
+
+# 단계별 소요 시간 히스토그램의 구간(초).
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# 설정하면 끝난 span마다 한 줄씩 JSON으로 덧붙인다.
+JSONL_PATH = os.getenv("METRICS_JSONL")
+
+# 설정하면 이 포트의 /metrics에서 Prometheus 텍스트 형식으로 내보낸다.
+PORT = os.getenv("METRICS_PORT")
+
+# /metrics를 여는 주소. 기본값은 같은 호스트에서만 접근할 수 있다. 다른 호스트의 Prometheus가 수집하려면 0.0.0.0으로 설정한다.
+HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+# 설정하면 streamlit 사이드바에 측정값 패널을 보여 준다.
+PANEL = os.getenv("METRICS_PANEL", "").lower() in ("1", "true", "yes")
+
+
+def _label_value(value) -> str:
+    """
+    Prometheus text 형식에 맞게 label 값의 역슬래시, 큰따옴표, 줄바꿈을 escape한다.
+    cache label에는 Windows 경로나 사용자가 정한 디렉터리 이름이 들어갈 수 있다.
+    """
+
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_label_value(value)}"' for name, value in labels) + "}"
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        for index, bound in enumerate(BUCKETS):
+            if value <= bound:
+                break
+        else:
+            index = len(BUCKETS)
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+
+class Registry:
+    """
+    프로세스 전체의 counter와 단계별 소요 시간 히스토그램.
+    백그라운드 스레드에서도 기록하므로 lock으로 보호한다.
+    """
+
+    def __init__(self, jsonl_path: str = JSONL_PATH):
+        self.jsonl_path = jsonl_path
+        self._lock = threading.Lock()
+
+        # (name, labels) -> 값. labels는 (이름, 값) 튜플의 정렬된 튜플이다.
+        self._counters = {}
+        self._histograms = {}
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, stage: str, seconds: float, error: bool = False) -> None:
+        key = ("stage_seconds", (("stage", stage),))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+            if error:
+                errors = ("stage_errors_total", (("stage", stage),))
+                self._counters[errors] = self._counters.get(errors, 0) + 1
+
+        if self.jsonl_path:
+            self._append_event({"ts": time.time(), "stage": stage, "seconds": seconds, "error": error})
+
+    def _append_event(self, event: dict) -> None:
+        try:
+            with self._lock, open(self.jsonl_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(event) + "\n")
+        except OSError:
+            print("Error while accessing", self.jsonl_path)
+
+    @contextlib.contextmanager
+    def span(self, stage: str):
+        """
+        with 블록의 소요 시간을 stage의 히스토그램에 기록한다. 예외가 나면 오류 수도 센다.
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.observe(stage, time.perf_counter() - start, error=True)
+            raise
+        self.observe(stage, time.perf_counter() - start)
+
+    def stages(self) -> dict:
+        """
+        {stage: {"count", "mean", "max", "errors"}}를 반환.
+        """
+
+        with self._lock:
+            return {
+                labels[0][1]: {
+                    "count": histogram.count,
+                    "mean": histogram.sum / histogram.count if histogram.count else 0.0,
+                    "max": histogram.max,
+                    "errors": self._counters.get(("stage_errors_total", labels), 0),
+                }
+                for (_, labels), histogram in sorted(self._histograms.items())
+            }
+
+    def caches(self) -> dict:
+        """
+        {cache: {"hits", "misses", "hit_rate", "read_bytes", "write_bytes"}}를 반환.
+        """
+
+        results = {}
+        with self._lock:
+            for (name, labels), value in self._counters.items():
+                labels = dict(labels)
+                if name == "cache_requests_total":
+                    stats = results.setdefault(labels["cache"], {})
+                    stats["hits" if labels["result"] == "hit" else "misses"] = value
+                elif name == "cache_bytes_total":
+                    stats = results.setdefault(labels["cache"], {})
+                    stats[labels["op"] + "_bytes"] = value
+
+        for stats in results.values():
+            for field in ("hits", "misses", "read_bytes", "write_bytes"):
+                stats.setdefault(field, 0)
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return dict(sorted(results.items()))
+
+    def prometheus_text(self) -> str:
+        """
+        모든 값을 Prometheus text exposition 형식으로 반환.
+        """
+
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, _ in self._counters}):
+                lines.append(f"# TYPE {name} counter")
+                for (counter, labels), value in sorted(self._counters.items()):
+                    if counter == name:
+                        lines.append(f"{name}{_label_text(labels)} {value}")
+
+            if self._histograms:
+                lines.append("# TYPE stage_seconds histogram")
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ("+Inf",), histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_label_text(labels + (('le', bound),))} {cumulative}")
+                lines.append(f"{name}_sum{_label_text(labels)} {histogram.sum}")
+                lines.append(f"{name}_count{_label_text(labels)} {histogram.count}")
+
+        return "\n".join(lines) + "\n"
+
+    def write_jsonl(self, path: str) -> None:
+        """
+        현재 값을 한 줄의 JSON으로 path에 덧붙인다.
+        """
+
+        snapshot = {"ts": time.time(), "stages": self.stages(), "caches": self.caches()}
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(snapshot) + "\n")
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+# 프로세스 전체에서 공유하는 측정값.
+registry = Registry()
+
+inc = registry.inc
+span = registry.span
+
+
+def record_cache(cache: str, hit: bool, read_bytes: int = 0) -> None:
+    """
+    캐시 조회 결과를 센다. 저장소와 캐시의 조회 함수에서 호출한다.
+    """
+
+    registry.inc("cache_requests_total", cache=cache, result="hit" if hit else "miss")
+    if read_bytes:
+        registry.inc("cache_bytes_total", read_bytes, cache=cache, op="read")
+
+
+def record_write(cache: str, write_bytes: int) -> None:
+    registry.inc("cache_bytes_total", write_bytes, cache=cache, op="write")
+
+
+def _timed_chunks(response, stage: str, start: float):
+    first = True
+    chars = 0
+    try:
+        for chunk in response:
+            if first:
+                registry.observe(stage + ".ttft", time.perf_counter() - start)
+                stream_start = time.perf_counter()
+                first = False
+            text = chunk.text
+            chars += len(text)
+            yield text
+    except Exception:
+        # 화면이 다시 실행되어 읽기를 그만둔 경우(GeneratorExit)는 오류로 세지 않는다.
+        registry.observe(stage + ".stream", time.perf_counter() - start, error=True)
+        raise
+
+    if not first:
+        registry.observe(stage + ".stream", time.perf_counter() - stream_start)
+    registry.inc("generated_chars_total", chars, stage=stage)
+
+
+def generate_stream(model, contents, stage: str, check_cancel=None):
+    """
+    model.generate_content(contents, stream=True)를 호출하고 청크 텍스트를 내보내는 generator를 반환.
+    요청부터 첫 청크까지(<stage>.ttft)와 첫 청크부터 끝까지(<stage>.stream)의 시간을 기록한다.
+    요청은 바로 보내므로 spinner 안에서 호출하면 첫 응답을 기다리는 동안 spinner가 보인다.
+    check_cancel은 resilience.ResilientModel에만 넘겨 첫 청크를 기다리는 동안 취소를 확인한다.
+    """
+
+    kwargs = {"check_cancel": check_cancel} if check_cancel and hasattr(model, "wrapped") else {}
+
+    start = time.perf_counter()
+    try:
+        response = model.generate_content(contents, stream=True, **kwargs)
+    except BaseException:
+        registry.observe(stage + ".ttft", time.perf_counter() - start, error=True)
+        raise
+    return _timed_chunks(response, stage, start)
+
+
+def serve(port: int, host: str = HOST) -> None:
+    """
+    백그라운드 스레드에서 http://<host>:<port>/metrics로 Prometheus 텍스트를 내보낸다.
+    """
+
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+
+
+if PORT:
+    try:
+        serve(int(PORT))
+    except OSError as e:
+        # 같은 호스트의 다른 프로세스가 이미 포트를 쓰고 있으면 내보내지 않는다.
+        print("Error while starting metrics server on port", PORT, e)
+
+
+def sidebar_panel() -> None:
+    """
+    METRICS_PANEL이 설정되어 있으면 사이드바에 단계별 소요 시간과 캐시 적중률을 보여 준다.
+    """
+
+    if not PANEL:
+        return
+
+    import streamlit as st
+
+    with st.sidebar.expander("Metrics"):
+        stages = registry.stages()
+        if stages:
+            st.caption("단계별 소요 시간")
+            st.table([
+                {"stage": stage, "count": stats["count"], "mean (s)": round(stats["mean"], 3),
+                 "max (s)": round(stats["max"], 3), "errors": stats["errors"]}
+                for stage, stats in stages.items()
+            ])
+
+        caches = registry.caches()
+        if caches:
+            st.caption("캐시")
+            st.table([
+                {"cache": cache, "hit rate": f"{stats['hit_rate']:.0%}", "hits": stats["hits"],
+                 "misses": stats["misses"], "read MB": round(stats["read_bytes"] / 2**20, 2),
+                 "write MB": round(stats["write_bytes"] / 2**20, 2)}
+                for cache, stats in caches.items()
+            ])
+
+        if not stages and not caches:
+            st.caption("아직 측정값이 없다.")
+
+        st.download_button("Prometheus", registry.prometheus_text(), "metrics.txt", "text/plain")
@@ -0,0 +1,244 @@
+import os
+import random
+import threading
+import time
+
+
+MODEL_NAME = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+
+# 가짜 모델의 model_name 앞에 붙인다. 가짜 요약이 실제 모델의 현재 버전 요약으로 저장되지 않게 한다.
+FAKE_PREFIX = "fake-"
+
+FAKE_SENTENCES = [
+    "이 연구는 대규모 언어 모델의 추론 효율을 개선하는 방법을 제안한다.",
+    "제안한 방법은 attention 계산을 블록 단위로 나누어 메모리 사용량을 줄인다.",
+    "실험 결과 기존 baseline보다 처리량이 크게 향상되었다.",
+    "The approach keeps the model quality within $\\epsilon$ of the original.",
+    "추가 실험에서 batch size와 sequence length에 따른 latency 변화를 분석한다.",
+]
+
+
+class FakeChunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeResponse:
+    """
+    stream=False일 때 generate_content가 반환하는 응답. text 속성만 제공한다.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def __iter__(self):
+        yield FakeChunk(self.text)
+
+
+class FakeTokenCount:
+    def __init__(self, total_tokens: int):
+        self.total_tokens = total_tokens
+
+
+def _fake_error(message: str) -> Exception:
+    """
+    실제 API와 같은 예외 형식을 쓰도록 google.api_core 예외를 사용한다.
+    """
+
+    try:
+        from google.api_core import exceptions
+        return exceptions.ServiceUnavailable(message)
+    except ImportError:
+        return ConnectionError(message)
+
+
+class FakeModel:
+    """
+    genai.GenerativeModel과 같은 방식으로 쓸 수 있는 로컬 가짜 모델.
+    API 없이 부하 테스트와 벤치마크를 할 수 있도록 첫 토큰까지의 시간(ttft),
+    초당 토큰 수, 오류 비율을 설정하여 응답을 스트리밍한다.
+    model_name은 "fake-<흉내 내는 모델>"이므로 요약 저장소와 토큰 보정값이 실제 모델과 섞이지 않는다.
+    """
+
+    def __init__(self, model_name: str = MODEL_NAME, ttft: float = 0.5,
+                 tokens_per_sec: float = 80.0, error_rate: float = 0.0,
+                 response_tokens: int = 400, tokens_per_chunk: int = 8, seed: int = None,
+                 stall_rate: float = 0.0, stall_seconds: float = 30.0):
+        self.model_name = model_name if model_name.startswith(FAKE_PREFIX) else FAKE_PREFIX + model_name
+        self.ttft = ttft
+        self.tokens_per_sec = tokens_per_sec
+        self.error_rate = error_rate
+        self.response_tokens = response_tokens
+        self.tokens_per_chunk = tokens_per_chunk
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _roll(self) -> float:
+        with self._lock:
+            return self._random.random()
+
+    def _response_text(self) -> list:
+        """
+        response_tokens개의 토큰을 tokens_per_chunk개씩 묶은 청크 텍스트 목록을 반환한다.
+        """
+
+        words = ["# Fake summary\n\n## 개요\n\n"]
+        sentence = 0
+        while len(words) < self.response_tokens:
+            words.extend(FAKE_SENTENCES[sentence % len(FAKE_SENTENCES)].split())
+            words.append("\n\n" if sentence % 3 == 2 else "")
+            sentence += 1
+
+        words = words[:self.response_tokens]
+        return [" ".join(words[i:i + self.tokens_per_chunk]) + " "
+                for i in range(0, len(words), self.tokens_per_chunk)]
+
+    def _stream(self):
+        time.sleep(self.ttft)
+
+        # 가끔 첫 청크가 크게 늦는 요청을 흉내 낸다. 첫 청크 deadline과 hedging 테스트에 쓴다.
+        if self.stall_rate and self._roll() < self.stall_rate:
+            time.sleep(self.stall_seconds)
+
+        if self._roll() < self.error_rate:
+            raise _fake_error("Fake backend injected an error.")
+
+        delay = self.tokens_per_chunk / self.tokens_per_sec if self.tokens_per_sec else 0.0
+        for i, text in enumerate(self._response_text()):
+            if i:
+                time.sleep(delay)
+            yield FakeChunk(text)
+
+    def generate_content(self, contents, stream: bool = False, **kwargs):
+        if stream:
+            return self._stream()
+
+        return FakeResponse("".join(chunk.text for chunk in self._stream()))
+
+    def count_tokens(self, contents) -> FakeTokenCount:
+        from tokens import estimate_tokens
+
+        return FakeTokenCount(estimate_tokens(str(contents)))
+
+    def start_chat(self, history: list = None) -> "FakeChat":
+        return FakeChat(self, history)
+
+
+class FakeChat:
+    def __init__(self, model: FakeModel, history: list = None):
+        self.model = model
+        self.history = list(history or [])
+
+    def send_message(self, content, stream: bool = False, **kwargs):
+        self.history.append({"role": "user", "parts": [content]})
+        response = self.model.generate_content(list(self.history), stream=stream)
+
+        if not stream:
+            self.history.append({"role": "model", "parts": [response.text]})
+            return response
+
+        return self._record(response)
+
+    def _record(self, chunks):
+        texts = []
+        for chunk in chunks:
+            texts.append(chunk.text)
+            yield chunk
+        self.history.append({"role": "model", "parts": ["".join(texts)]})
+
+
+def fake_model_from_env(model_name: str = MODEL_NAME) -> FakeModel:
+    return FakeModel(
+        model_name,
+        ttft=float(os.getenv("FAKE_TTFT", "0.5")),
+        tokens_per_sec=float(os.getenv("FAKE_TOKENS_PER_SEC", "80")),
+        error_rate=float(os.getenv("FAKE_ERROR_RATE", "0")),
+        response_tokens=int(os.getenv("FAKE_RESPONSE_TOKENS", "400")),
+        stall_rate=float(os.getenv("FAKE_STALL_RATE", "0")),
+        stall_seconds=float(os.getenv("FAKE_STALL_SECONDS", "30")),
+    )
+
+
+_lock = threading.Lock()
+_env_loaded = False
+_configured = False
+
+# (model_name, backend)별로 프로세스 전체에서 공유하는 모델 객체.
+_shared_models = {}
+
+
+def load_env() -> None:
+    """
+    .env 파일을 프로세스에서 한 번만 읽는다.
+    """
+
+    global _env_loaded
+
+    with _lock:
+        if not _env_loaded:
+            from dotenv import load_dotenv
+
+            load_dotenv()
+            _env_loaded = True
+
+
+def configure() -> None:
+    """
+    .env와 환경 변수에서 API 키를 읽어 Gemini API를 설정한다. 프로세스에서 한 번만 설정한다.
+    """
+
+    global _configured
+
+    load_env()
+
+    with _lock:
+        if not _configured:
+            import google.generativeai as genai
+
+            genai.configure(api_key=os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY"))
+            _configured = True
+
+
+def get_model(model_name: str = MODEL_NAME, backend: str = None):
+    """
+    MODEL_BACKEND 설정에 따라 generate_content(contents, stream=True)와
+    start_chat()을 제공하는 모델 객체를 새로 만든다.
+    "gemini"(기본값)이면 Gemini API를, "fake"이면 FakeModel을 사용한다.
+    """
+
+    load_env()
+    backend = (backend or os.getenv("MODEL_BACKEND", "gemini")).lower()
+
+    if backend == "fake":
+        return fake_model_from_env(model_name)
+
+    if backend != "gemini":
+        raise ValueError(f"Unknown model backend: {backend}")
+
+    import google.generativeai as genai
+
+    configure()
+    return genai.GenerativeModel(model_name)
+
+
+def shared_model(model_name: str = MODEL_NAME, backend: str = None):
+    """
+    get_model()과 같지만, 같은 설정의 모델 객체를 프로세스 전체에서 하나만 만들어 재사용한다.
+    streamlit 앱은 세션과 rerun마다 모델을 새로 만들지 않도록 이 함수를 사용한다.
+    재시도와 circuit breaker 상태도 공유하도록 resilience.wrap()으로 감싼다.
+    """
+
+    import resilience
+
+    load_env()
+    key = (model_name, (backend or os.getenv("MODEL_BACKEND", "gemini")).lower())
+
+    model = _shared_models.get(key)
+    if model is None:
+        model = resilience.wrap(get_model(model_name, key[1]))
+        with _lock:
+            model = _shared_models.setdefault(key, model)
+    return model
@@ -0,0 +1,190 @@
+import os
+import shutil
+import tempfile
+import threading
+import metrics
+
+
+class PageCache:
+    """
+    추출한 PDF 텍스트를 페이지 단위로 저장하는 디스크 캐시.
+    key는 PDF 내용의 SHA-256과 추출기 버전으로 만들며, 문서마다 디렉터리 하나를 쓴다.
+
+    cache_dir/<key>/pages     전체 페이지 수
+    cache_dir/<key>/00000.txt 페이지 텍스트
+
+    전체 크기가 max_bytes를 넘으면 가장 오래 사용하지 않은 문서부터 지운다.
+    """
+
+    def __init__(self, cache_dir: str = "data/pdf_text", max_bytes: int = 512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._total_bytes = None
+
+        self.hits = 0
+        self.misses = 0
+        self.page_hits = 0
+        self.page_misses = 0
+        self.evictions = 0
+
+    def _doc_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def _page_path(self, key: str, index: int) -> str:
+        return os.path.join(self._doc_dir(key), f"{index:05d}.txt")
+
+    def _write(self, path: str, text: str) -> int:
+        """
+        path에 text를 쓰고 늘어난 바이트 수를 반환. 이미 있는 파일을 덮어쓰면 이전 크기를 뺀다.
+        """
+
+        data = text.encode("utf-8")
+        try:
+            old_size = os.path.getsize(path)
+        except OSError:
+            old_size = 0
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except:
+            os.remove(tmp_path)
+            raise
+        return len(data) - old_size
+
+    def get_num_pages(self, key: str) -> int:
+        """
+        캐시에 기록된 전체 페이지 수를 반환, 없으면 None 반환.
+        """
+
+        try:
+            with open(os.path.join(self._doc_dir(key), "pages"), "r", encoding="ascii") as f:
+                num_pages = int(f.read())
+        except (OSError, ValueError):
+            return None
+
+        # 최근에 사용한 문서가 나중에 지워지도록 수정 시각을 갱신한다.
+        try:
+            os.utime(self._doc_dir(key))
+        except OSError:
+            pass
+
+        return num_pages
+
+    def set_num_pages(self, key: str, num_pages: int) -> None:
+        try:
+            os.makedirs(self._doc_dir(key), exist_ok=True)
+            self._add_bytes(self._write(os.path.join(self._doc_dir(key), "pages"), str(num_pages)))
+        except OSError:
+            print("Error while accessing", self._doc_dir(key))
+
+    def iter_pages(self, key: str):
+        """
+        0번 페이지부터 연속으로 캐시된 페이지 텍스트를 순서대로 내보낸다.
+        """
+
+        index = 0
+        while True:
+            try:
+                with open(self._page_path(key, index), "r", encoding="utf-8") as f:
+                    text = f.read()
+            except OSError:
+                return
+
+            with self._lock:
+                self.page_hits += 1
+
+            yield text
+            index += 1
+
+    def put_page(self, key: str, index: int, text: str) -> None:
+        with self._lock:
+            self.page_misses += 1
+
+        try:
+            os.makedirs(self._doc_dir(key), exist_ok=True)
+            self._add_bytes(self._write(self._page_path(key, index), text))
+        except OSError:
+            print("Error while accessing", self._page_path(key, index))
+            return
+
+        self._evict_if_needed()
+
+    def record(self, hit: bool) -> None:
+        """
+        문서 단위 조회 결과를 기록한다. PdfReader 없이 캐시만으로 처리했으면 hit이다.
+        """
+
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        metrics.record_cache(self.cache_dir, hit)
+
+    def _scan(self) -> list:
+        """
+        (수정 시각, 크기, 경로) 목록을 반환한다.
+        """
+
+        docs = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_dir():
+                continue
+
+            size = 0
+            for page in os.scandir(entry.path):
+                if page.is_file():
+                    size += page.stat().st_size
+            docs.append((entry.stat().st_mtime, size, entry.path))
+        return docs
+
+    def _add_bytes(self, size: int) -> None:
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._scan())
+            else:
+                self._total_bytes += size
+
+    def _evict_if_needed(self) -> None:
+        with self._lock:
+            if self._total_bytes is None or self._total_bytes <= self.max_bytes:
+                return
+
+            docs = sorted(self._scan())
+            total = sum(size for _, size, _ in docs)
+
+            # 매번 지우지 않도록 한도의 90%까지 비운다.
+            for _, size, path in docs:
+                if total <= self.max_bytes * 0.9:
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+                self.evictions += 1
+
+            self._total_bytes = total
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "page_hits": self.page_hits,
+                "page_misses": self.page_misses,
+                "evictions": self.evictions,
+                "bytes": self._total_bytes,
+            }
+
+
+cache = PageCache(
+    os.getenv("PDF_TEXT_CACHE_DIR", "data/pdf_text"),
+    int(os.getenv("PDF_TEXT_CACHE_MB", "512")) * 1024 * 1024,
+)
@@ -0,0 +1,225 @@
+import atexit
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import PyPDF2
+from PyPDF2 import PdfReader
+import pdf_cache
+from tokens import estimate_tokens
+
+
+# 추출 결과가 달라지도록 코드를 바꾸면 올려서 페이지 캐시를 무효화한다.
+EXTRACTOR_VERSION = 1
+
+# 한 작업(task)이 추출하는 페이지 수.
+PAGES_PER_TASK = 8
+
+# 이보다 페이지가 적으면 프로세스 풀을 쓰지 않고 현재 프로세스에서 추출한다.
+MIN_PAGES_FOR_POOL = 24
+
+# 프로세스 수. PDF_EXTRACT_WORKERS=1이면 프로세스 풀을 사용하지 않는다.
+MAX_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "0")) or os.cpu_count() or 1
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# 작업 프로세스마다 마지막으로 연 PDF를 재사용한다.
+_worker_reader = (None, None)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=MAX_WORKERS)
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+        return _pool
+
+
+def _extract_range(pdf_path: str, token: str, start: int, stop: int) -> list:
+    """
+    작업 프로세스에서 실행된다. pdf_path의 start 이상 stop 미만 페이지 텍스트를 반환.
+    임시 파일 이름은 재사용될 수 있으므로 호출마다 다른 token으로 PDF를 구분한다.
+    """
+
+    global _worker_reader
+
+    cached_token, reader = _worker_reader
+    if cached_token != token:
+        reader = PdfReader(pdf_path)
+        _worker_reader = (token, reader)
+
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def read_pdf_bytes(pdf) -> bytes:
+    """
+    bytes, BytesIO, streamlit UploadedFile 등 PDF 입력을 bytes로 변환.
+    """
+
+    if isinstance(pdf, (bytes, bytearray)):
+        return bytes(pdf)
+
+    if hasattr(pdf, "getvalue"):
+        return pdf.getvalue()
+
+    pdf.seek(0)
+    return pdf.read()
+
+
+def cache_key(pdf_data: bytes) -> str:
+    """
+    PDF 내용의 SHA-256과 추출기 버전으로 페이지 캐시 key를 만든다.
+    """
+
+    digest = hashlib.sha256(pdf_data).hexdigest()
+    return f"{digest}-v{EXTRACTOR_VERSION}-pypdf2-{PyPDF2.__version__}"
+
+
+def _iter_pages_in_process(reader: PdfReader, start: int):
+    for index in range(start, len(reader.pages)):
+        yield reader.pages[index].extract_text() or ""
+
+
+def _iter_pages_in_pool(pdf_data: bytes, start: int, num_pages: int):
+    """
+    페이지 범위를 프로세스 풀에 나누어 추출하고 순서대로 내보낸다.
+    조기 종료할 때 낭비가 없도록 작업자 수의 두 배만큼만 작업을 미리 제출한다.
+    """
+
+    pool = _get_pool()
+    token = os.urandom(8).hex()
+    fd, pdf_path = tempfile.mkstemp(suffix=".pdf")
+    pending = deque()
+
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(pdf_data)
+
+        ranges = iter(
+            (index, min(index + PAGES_PER_TASK, num_pages))
+            for index in range(start, num_pages, PAGES_PER_TASK)
+        )
+
+        def submit_next() -> None:
+            page_range = next(ranges, None)
+            if page_range:
+                pending.append(pool.submit(_extract_range, pdf_path, token, *page_range))
+
+        for _ in range(MAX_WORKERS * 2):
+            submit_next()
+
+        while pending:
+            texts = pending.popleft().result()
+            submit_next()
+            yield from texts
+    finally:
+        for future in pending:
+            future.cancel()
+        for future in pending:
+            if not future.cancelled():
+                future.exception()
+        os.remove(pdf_path)
+
+
+def _iter_all_pages(pdf_data: bytes, info: dict, use_cache: bool):
+    """
+    캐시된 페이지를 먼저 내보내고, 나머지 페이지만 PdfReader로 추출하여 캐시에 저장한다.
+    info["num_pages"]에 전체 페이지 수를 기록한다.
+    """
+
+    key = cache_key(pdf_data) if use_cache else None
+    index = 0
+
+    if key:
+        info["num_pages"] = pdf_cache.cache.get_num_pages(key)
+
+        for text in pdf_cache.cache.iter_pages(key):
+            yield text
+            index += 1
+
+        if info["num_pages"] is not None and index >= info["num_pages"]:
+            return
+
+    reader = PdfReader(io.BytesIO(pdf_data))
+    num_pages = len(reader.pages)
+    info["num_pages"] = num_pages
+    info["parsed"] = True
+
+    if key:
+        pdf_cache.cache.set_num_pages(key, num_pages)
+
+    if MAX_WORKERS > 1 and num_pages - index >= MIN_PAGES_FOR_POOL:
+        pages = _iter_pages_in_pool(pdf_data, index, num_pages)
+    else:
+        pages = _iter_pages_in_process(reader, index)
+
+    try:
+        for text in pages:
+            if key:
+                pdf_cache.cache.put_page(key, index, text)
+            yield text
+            index += 1
+    finally:
+        pages.close()
+
+
+def _iter_budgeted(pdf_data: bytes, info: dict, max_chars: int, max_tokens: int,
+                   use_cache: bool, estimate=estimate_tokens):
+    pages = _iter_all_pages(pdf_data, info, use_cache)
+    chars = 0
+    tokens = 0
+
+    try:
+        for text in pages:
+            yield text
+
+            chars += len(text)
+            if max_chars is not None and chars > max_chars:
+                break
+
+            if max_tokens is not None:
+                tokens += estimate(text)
+                if tokens > max_tokens:
+                    break
+    finally:
+        pages.close()
+
+        if use_cache:
+            pdf_cache.cache.record(hit=not info.get("parsed"))
+
+
+def iter_pages(pdf, max_chars: int = None, max_tokens: int = None,
+               use_cache: bool = True, estimate=estimate_tokens):
+    """
+    PDF의 페이지 텍스트를 순서대로 내보내는 제너레이터.
+    페이지 캐시에 있는 페이지는 PdfReader 없이 바로 내보낸다.
+    페이지가 많으면 프로세스 풀에서 병렬로 추출한다.
+    지금까지 내보낸 텍스트가 max_chars 또는 max_tokens를 넘으면 멈춘다.
+    토큰 수는 estimate(text)로 센다. 모델에 맞게 보정한 tokens.TokenBudget.estimate를 넘길 수 있다.
+    """
+
+    yield from _iter_budgeted(read_pdf_bytes(pdf), {}, max_chars, max_tokens, use_cache, estimate)
+
+
+def extract_text(pdf, max_chars: int = None, max_tokens: int = None,
+                 separator: str = "", use_cache: bool = True, estimate=estimate_tokens,
+                 check_cancel=None) -> tuple:
+    """
+    PDF 텍스트를 추출하여 (text, truncated)를 반환.
+    truncated는 예산에 걸려 마지막 페이지까지 읽지 못했는지를 나타낸다.
+    check_cancel이 있으면 페이지마다 호출한다.
+    """
+
+    info = {}
+    pages = []
+    for page in _iter_budgeted(read_pdf_bytes(pdf), info, max_chars, max_tokens, use_cache, estimate):
+        if check_cancel:
+            check_cancel()
+        pages.append(page)
+    return separator.join(pages), len(pages) < info["num_pages"]
@@ -0,0 +1,10 @@
+def percentile(values, p: float) -> float:
+    """
+    값 목록의 p 백분위 값(nearest-rank)을 반환한다. 값이 없으면 nan.
+    loadgen, 콘솔 배치 보고서, 벤치마크, resilience의 hedging 기준이 함께 쓴다.
+    """
+
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
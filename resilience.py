@@ -0,0 +1,379 @@
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+import metrics
+from percentiles import percentile
+
+
+# 설정하지 않으면(기본값) shared_model()이 만든 모델에 재시도, hedging, circuit breaker를 적용한다.
+ENABLED = os.getenv("MODEL_RESILIENCE", "1").lower() not in ("0", "false", "no")
+
+# 재시도할 수 있는 오류가 나면 이 횟수까지 다시 요청한다.
+RETRIES = int(os.getenv("MODEL_RETRIES", "2"))
+
+# 재시도 대기 시간은 BACKOFF_BASE * 2^시도 (최대 BACKOFF_MAX)초 안에서 무작위로 고른다(full jitter).
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 20.0
+
+# 이 시간(초) 안에 첫 청크가 오지 않으면 요청을 포기하고 재시도한다.
+TTFT_DEADLINE = float(os.getenv("MODEL_TTFT_DEADLINE", "60"))
+
+# 0보다 크면 첫 청크가 최근 TTFT의 이 백분위수보다 늦을 때 같은 요청을 하나 더 보내 먼저 온 쪽을 쓴다.
+# 요청 비용이 늘어나므로 기본값은 꺼져 있다.
+HEDGE_PERCENTILE = float(os.getenv("MODEL_HEDGE_PERCENTILE", "0"))
+
+# hedging 기준을 정하기 전에 모을 TTFT 표본 수와 보관할 최근 표본 수.
+HEDGE_MIN_SAMPLES = 20
+TTFT_SAMPLES = 200
+
+# 재시도할 수 있는 오류가 연속으로 이 횟수만큼 나면 BREAKER_SECONDS 동안 요청을 보내지 않는다.
+BREAKER_FAILURES = int(os.getenv("MODEL_BREAKER_FAILURES", "5"))
+BREAKER_SECONDS = float(os.getenv("MODEL_BREAKER_SECONDS", "30"))
+
+# check_cancel을 받으면 첫 청크를 기다리거나 재시도를 기다리는 동안 이 간격(초)마다 취소를 확인한다.
+CANCEL_POLL_SECONDS = 0.2
+
+
+class CircuitOpenError(RuntimeError):
+    """
+    circuit breaker가 열려 있어 요청을 보내지 않았다.
+    """
+
+
+class FirstChunkTimeout(TimeoutError):
+    """
+    TTFT_DEADLINE 안에 첫 청크가 오지 않았다.
+    """
+
+
+class _Cancelled(Exception):
+    """
+    첫 청크를 기다리는 동안 check_cancel이 발생시킨 예외(error)를 재시도와 breaker 판정 없이 전달한다.
+    """
+
+    def __init__(self, error: Exception):
+        super().__init__(str(error))
+        self.error = error
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    일시적인 서버 오류, 요청 한도 초과, 시간 초과, 연결 오류이면 True.
+    """
+
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+
+    try:
+        from google.api_core import exceptions
+    except ImportError:
+        return False
+    return isinstance(error, (exceptions.ResourceExhausted, exceptions.ServiceUnavailable,
+                              exceptions.InternalServerError, exceptions.DeadlineExceeded,
+                              exceptions.TooManyRequests))
+
+
+def backoff(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_MAX) -> float:
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    closed: 요청을 보낸다. 연속 실패가 failures번이면 open이 된다.
+    open: seconds 동안 CircuitOpenError를 발생시킨다. 그 뒤 요청 하나만 시험으로 보낸다(half-open).
+    시험 요청이 성공하면 closed, 실패하면 다시 open이 된다. 시험 요청이 끝나기 전의 다른 요청은 거절한다.
+    """
+
+    def __init__(self, failures: int = BREAKER_FAILURES, seconds: float = BREAKER_SECONDS):
+        self.failures = failures
+        self.seconds = seconds
+        self.state = "closed"
+
+        self._lock = threading.Lock()
+        self._consecutive = 0
+        self._opened_at = 0.0
+
+    def before_request(self) -> bool:
+        """
+        요청을 보내도 되면 반환하고, 아니면 CircuitOpenError를 발생시킨다.
+        half-open의 시험 요청이면 True를 반환한다. 호출한 쪽은 요청이 끝나면 반드시 release()를 호출한다.
+        """
+
+        with self._lock:
+            if self.state == "closed":
+                return False
+
+            remaining = self._opened_at + self.seconds - time.monotonic()
+            if self.state == "open" and remaining <= 0:
+                self.state = "half-open"
+                return True
+
+            metrics.inc("model_requests_rejected_total")
+            if self.state == "half-open":
+                raise CircuitOpenError("The model API is failing repeatedly; a trial request is in progress.")
+            raise CircuitOpenError(
+                f"The model API is failing repeatedly; requests are paused for {max(0, remaining):.0f}s.")
+
+    def success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self._consecutive = 0
+
+    def failure(self) -> None:
+        with self._lock:
+            self._consecutive += 1
+            if self.state == "half-open" or (self.state == "closed" and self._consecutive >= self.failures):
+                self._open()
+
+    def release(self) -> None:
+        """
+        시험 요청이 success()나 failure() 없이 끝났으면(중단되었으면) 다시 open으로 돌린다.
+        half-open 상태가 남아 있으면 모든 요청이 거절된다.
+        """
+
+        with self._lock:
+            if self.state == "half-open":
+                self._open()
+
+    def _open(self) -> None:
+        self.state = "open"
+        self._opened_at = time.monotonic()
+        metrics.inc("model_circuit_opened_total")
+        print("Model circuit breaker opened after", self._consecutive, "failures")
+
+
+def _sleep(seconds: float, check_cancel=None) -> None:
+    """
+    seconds 동안 기다린다. check_cancel이 있으면 CANCEL_POLL_SECONDS마다 호출하여 취소되면 바로 예외를 전달한다.
+    """
+
+    if not check_cancel:
+        time.sleep(seconds)
+        return
+
+    deadline = time.monotonic() + seconds
+    while True:
+        check_cancel()
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        time.sleep(min(remaining, CANCEL_POLL_SECONDS))
+
+
+def _close(iterator) -> None:
+    """
+    응답 스트림을 닫는다. generator이면 close()로 연결을 정리하고, gRPC 스트림이면 cancel()한다.
+    """
+
+    for name in ("close", "cancel"):
+        method = getattr(iterator, name, None)
+        if method is not None:
+            try:
+                method()
+            except Exception as e:
+                print("Error while closing model stream:", e)
+            return
+
+
+class _Attempt(threading.Thread):
+    """
+    백그라운드 스레드에서 요청을 보내고 첫 청크를 받으면 (attempt, first, iterator, error)를 results에 넣는다.
+    hedging에서 진 요청과 deadline을 넘긴 요청은 cancel()한다. 이미 첫 청크를 받았으면 스트림을 바로 닫고,
+    아직 기다리는 중이면 첫 청크가 오는 즉시 스트림을 닫고 스레드를 끝낸다.
+    """
+
+    def __init__(self, model, contents, kwargs: dict, results: queue.Queue):
+        super().__init__(name="model-attempt", daemon=True)
+        self.model = model
+        self.contents = contents
+        self.kwargs = kwargs
+        self.results = results
+        self.start_time = time.monotonic()
+        self.iterator = None
+
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self.start()
+
+    def run(self) -> None:
+        try:
+            iterator = iter(self.model.generate_content(self.contents, stream=True, **self.kwargs))
+            first = next(iterator, None)
+        except Exception as e:
+            self.results.put((self, None, None, e))
+            return
+
+        with self._lock:
+            if not self._cancelled:
+                self.iterator = iterator
+                self.results.put((self, first, iterator, None))
+                return
+        _close(iterator)
+
+    def cancel(self) -> None:
+        with self._lock:
+            if self._cancelled:
+                return
+            self._cancelled = True
+            iterator, self.iterator = self.iterator, None
+
+        metrics.inc("model_attempts_cancelled_total")
+        if iterator is not None:
+            _close(iterator)
+
+
+class ResilientModel:
+    """
+    모델의 generate_content에 첫 청크 deadline, 지수 backoff 재시도, hedging, circuit breaker를 적용한다.
+    그 밖의 속성(model_name, count_tokens, start_chat 등)은 감싼 모델(wrapped)의 것을 그대로 쓴다.
+
+    stream=True이면 실제 API처럼 첫 청크를 받을 때까지 기다린 뒤 iterator를 반환한다.
+    첫 청크를 받기 전의 실패만 재시도한다. 이미 내보낸 청크를 되돌릴 수 없으므로 스트리밍 중의 실패는 그대로 전달한다.
+    """
+
+    def __init__(self, model, retries: int = RETRIES, ttft_deadline: float = TTFT_DEADLINE,
+                 hedge_percentile: float = HEDGE_PERCENTILE, breaker: CircuitBreaker = None):
+        self.wrapped = model
+        self.retries = retries
+        self.ttft_deadline = ttft_deadline
+        self.hedge_percentile = hedge_percentile
+        self.breaker = breaker or CircuitBreaker()
+
+        self._lock = threading.Lock()
+        self._ttfts = deque(maxlen=TTFT_SAMPLES)
+
+    def __getattr__(self, name):
+        return getattr(self.wrapped, name)
+
+    def hedge_delay(self) -> float:
+        """
+        hedging 요청을 보낼 때까지 기다릴 시간. 꺼져 있거나 표본이 부족하면 None.
+        """
+
+        if self.hedge_percentile <= 0:
+            return None
+        with self._lock:
+            if len(self._ttfts) < HEDGE_MIN_SAMPLES:
+                return None
+            return percentile(self._ttfts, self.hedge_percentile)
+
+    def _first_chunk(self, contents, kwargs: dict, check_cancel=None) -> tuple:
+        """
+        요청을 보내고 (첫 청크, 나머지 iterator)를 반환. 첫 청크가 늦으면 hedging 요청을 하나 더 보낸다.
+        check_cancel이 있으면 기다리는 동안 주기적으로 호출하고, 예외가 나면 요청을 모두 닫는다.
+        """
+
+        results = queue.Queue()
+        start = time.monotonic()
+        deadline = start + self.ttft_deadline
+        hedge_delay = self.hedge_delay()
+
+        attempts = [_Attempt(self.wrapped, contents, kwargs, results)]
+        pending = 1
+        error = None
+
+        while pending:
+            now = time.monotonic()
+            timeout = deadline - now
+            if hedge_delay is not None and len(attempts) == 1:
+                timeout = min(timeout, start + hedge_delay - now)
+            if check_cancel:
+                timeout = min(timeout, CANCEL_POLL_SECONDS)
+
+            try:
+                attempt, first, iterator, error = results.get(timeout=max(0.0, timeout))
+            except queue.Empty:
+                now = time.monotonic()
+                if now >= deadline:
+                    for attempt in attempts:
+                        attempt.cancel()
+                    raise FirstChunkTimeout(f"No response from the model within {self.ttft_deadline:.0f}s.")
+
+                if check_cancel:
+                    try:
+                        check_cancel()
+                    except Exception as e:
+                        for attempt in attempts:
+                            attempt.cancel()
+                        raise _Cancelled(e) from e
+
+                if hedge_delay is not None and len(attempts) == 1 and now >= start + hedge_delay:
+                    attempts.append(_Attempt(self.wrapped, contents, kwargs, results))
+                    pending += 1
+                    metrics.inc("model_hedges_total")
+                continue
+
+            pending -= 1
+            if error is None:
+                if attempt is not attempts[0]:
+                    metrics.inc("model_hedge_wins_total")
+                for other in attempts:
+                    if other is not attempt:
+                        other.cancel()
+                with self._lock:
+                    self._ttfts.append(time.monotonic() - attempt.start_time)
+                return first, iterator
+
+        raise error
+
+    def _stream(self, first, iterator):
+        if first is None:
+            return
+
+        yield first
+        try:
+            yield from iterator
+        except Exception as e:
+            if is_retryable(e):
+                self.breaker.failure()
+            raise
+
+    def _call(self, request, check_cancel=None):
+        for attempt in range(self.retries + 1):
+            trial = self.breaker.before_request()
+            try:
+                result = request()
+            except _Cancelled as e:
+                raise e.error from None
+            except Exception as e:
+                if not is_retryable(e):
+                    # 잘못된 요청 등은 API가 응답한 것이므로 breaker에는 성공으로 센다.
+                    self.breaker.success()
+                    raise
+                self.breaker.failure()
+                if attempt == self.retries:
+                    raise
+
+                delay = backoff(attempt)
+                metrics.inc("model_retries_total", error=type(e).__name__)
+                print(f"Retrying model request in {delay:.1f}s after {type(e).__name__}: {e}")
+                _sleep(delay, check_cancel)
+            else:
+                self.breaker.success()
+                return result
+            finally:
+                if trial:
+                    self.breaker.release()
+
+    def generate_content(self, contents, stream: bool = False, check_cancel=None, **kwargs):
+        """
+        check_cancel은 감싼 모델에 넘기지 않는다. 재시도를 기다리는 동안과, stream=True일 때 첫 청크를
+        기다리는 동안 호출한다.
+        """
+
+        if not stream:
+            return self._call(lambda: self.wrapped.generate_content(contents, **kwargs), check_cancel)
+
+        first, iterator = self._call(lambda: self._first_chunk(contents, kwargs, check_cancel), check_cancel)
+        return self._stream(first, iterator)
+
+
+def wrap(model):
+    """
+    ENABLED이면 model을 ResilientModel로 감싸서 반환.
+    """
+
+    return ResilientModel(model) if ENABLED else model
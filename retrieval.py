@@ -0,0 +1,166 @@
+import heapq
+import math
+import re
+
+
+# 청크의 목표 글자 수.
+CHUNK_CHARS = 1500
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+|[가-힣]+")
+
+# "1 Introduction", "3.2 Training", "Abstract", "References" 같은 제목 줄.
+HEADING_PATTERN = re.compile(
+    r"^\s*(?:(?:\d+(?:\.\d+)*\.?|[IVX]+\.)\s+\S.{0,80}"
+    r"|abstract|introduction|related work|conclusions?|references|acknowledge?ments?|appendix.*)\s*$",
+    re.IGNORECASE,
+)
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from in is it of on or that the this to was were with".split()
+)
+
+
+def tokenize(text: str) -> list:
+    """
+    검색용 토큰 목록을 반환한다.
+    영문과 숫자는 소문자 단어로, 한글은 조사가 붙어도 찾을 수 있도록 두 글자 단위(bigram)로 나눈다.
+    """
+
+    tokens = []
+    for word in TOKEN_PATTERN.findall(text.lower()):
+        if "가" <= word[0] <= "힣":
+            if len(word) == 1:
+                tokens.append(word)
+            else:
+                tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        elif word not in STOPWORDS:
+            tokens.append(word)
+    return tokens
+
+
+class Chunk:
+    def __init__(self, text: str, first_page: int, last_page: int, section: str):
+        self.text = text
+        self.first_page = first_page
+        self.last_page = last_page
+        self.section = section
+
+    @property
+    def pages(self) -> str:
+        if self.first_page == self.last_page:
+            return f"p. {self.first_page}"
+        return f"pp. {self.first_page}-{self.last_page}"
+
+
+def split_chunks(pages: list, chunk_chars: int = CHUNK_CHARS) -> list:
+    """
+    페이지 텍스트 목록을 청크로 나눈다.
+    제목 줄에서 새 청크를 시작하고, 청크가 chunk_chars를 넘으면 줄 단위로 나눈다.
+    너무 작은 청크가 생기지 않도록 chunk_chars의 1/4보다 짧으면 제목 줄에서 나누지 않는다.
+    페이지 번호는 1부터 시작한다.
+    """
+
+    chunks = []
+    lines = []
+    size = 0
+    first_page = last_page = 1
+    section = chunk_section = ""
+
+    def flush() -> None:
+        nonlocal lines, size
+        text = "\n".join(lines).strip()
+        if text:
+            chunks.append(Chunk(text, first_page, last_page, chunk_section))
+        lines = []
+        size = 0
+
+    for page_num, page_text in enumerate(pages, start=1):
+        for line in page_text.splitlines():
+            is_heading = HEADING_PATTERN.match(line) is not None
+
+            if lines and ((is_heading and size >= chunk_chars // 4)
+                          or size + len(line) > chunk_chars):
+                flush()
+
+            if is_heading:
+                section = line.strip()
+            if not lines:
+                first_page = page_num
+                chunk_section = section
+
+            lines.append(line)
+            size += len(line) + 1
+            last_page = page_num
+
+    flush()
+    return chunks
+
+
+class BM25Index:
+    """
+    청크 목록에 대한 메모리 내 BM25 역색인.
+    """
+
+    def __init__(self, chunks: list, k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+
+        self.postings = {}
+        self.doc_lengths = []
+
+        for doc_id, chunk in enumerate(chunks):
+            counts = {}
+            tokens = tokenize(chunk.section + "\n" + chunk.text)
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+
+            for token, tf in counts.items():
+                self.postings.setdefault(token, []).append((doc_id, tf))
+            self.doc_lengths.append(len(tokens))
+
+        num_docs = len(chunks)
+        self.avg_length = sum(self.doc_lengths) / num_docs if num_docs else 0.0
+        self.idf = {
+            token: math.log(1 + (num_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for token, posting in self.postings.items()
+        }
+
+    def search(self, query: str, k: int = 5) -> list:
+        """
+        query와 관련도가 높은 순서로 최대 k개의 (score, chunk)를 반환한다.
+        """
+
+        scores = {}
+        k1 = self.k1
+        for token in set(tokenize(query)):
+            posting = self.postings.get(token)
+            if not posting:
+                continue
+
+            idf = self.idf[token]
+            for doc_id, tf in posting:
+                norm = k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / self.avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+
+        top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(score, self.chunks[doc_id]) for doc_id, score in top]
+
+
+def build_index(pages: list, chunk_chars: int = CHUNK_CHARS) -> BM25Index:
+    return BM25Index(split_chunks(pages, chunk_chars))
+
+
+def format_context(results: list) -> str:
+    """
+    검색 결과를 페이지 번호가 붙은 프롬프트 문맥으로 만든다. 결과는 문서 순서로 정렬한다.
+    """
+
+    chunks = sorted((chunk for _, chunk in results), key=lambda chunk: chunk.first_page)
+    parts = []
+    for chunk in chunks:
+        header = f"[{chunk.pages}]"
+        if chunk.section and not chunk.text.startswith(chunk.section):
+            header += f" {chunk.section}"
+        parts.append(header + "\n" + chunk.text)
+    return "\n\n".join(parts)
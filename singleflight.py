@@ -0,0 +1,159 @@
+import itertools
+import threading
+import time
+import traceback
+
+
+class Flight:
+    """
+    진행 중인 작업 하나. producer가 만든 텍스트 청크를 모아 두고,
+    여러 구독자가 처음부터 다시 읽은 뒤 새 청크를 이어서 받을 수 있게 한다.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.info = {}
+        self.subscribers = 0
+
+        self._condition = threading.Condition()
+
+    def append(self, text: str) -> None:
+        with self._condition:
+            self.chunks.append(text)
+            self._condition.notify_all()
+
+    def finish(self, error: Exception = None) -> None:
+        with self._condition:
+            self.done = True
+            self.error = error
+            self._condition.notify_all()
+
+    @property
+    def text(self) -> str:
+        with self._condition:
+            return "".join(self.chunks)
+
+    def stream(self):
+        """
+        지금까지의 청크를 모두 내보낸 뒤, 작업이 끝날 때까지 새 청크를 기다려 내보낸다.
+        작업이 실패하면 같은 예외를 발생시킨다.
+        """
+
+        index = 0
+        while True:
+            with self._condition:
+                while index >= len(self.chunks) and not self.done:
+                    self._condition.wait()
+
+                new_chunks = self.chunks[index:]
+                done = self.done
+                error = self.error
+
+            yield from new_chunks
+            index += len(new_chunks)
+
+            if done and index >= len(self.chunks):
+                if error:
+                    raise error
+                return
+
+
+class SingleFlight:
+    """
+    같은 key의 작업이 진행 중이면 새로 시작하지 않고 진행 중인 작업에 합류시킨다.
+    작업은 백그라운드 스레드에서 실행되므로 streamlit 스크립트가 다시 실행되어도 멈추지 않는다.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def join(self, key: str, producer, on_complete=None, journal=None,
+             journal_key: str = None, on_error=None) -> Flight:
+        """
+        key에 대한 Flight를 반환한다. 진행 중인 작업이 없으면
+        producer(flight)가 반환하는 텍스트 청크 iterator를 새 스레드에서 소비한다.
+        작업이 성공하면 전체 텍스트로 on_complete(text)를 호출한 뒤 Flight를 목록에서 지운다.
+        journal(StreamJournal)이 있으면 진행 중인 텍스트를 journal_key에 주기적으로 저장하고,
+        완성되면 지운다. 실패하면 이어서 생성할 수 있도록 부분 결과를 남겨 둔다.
+        실패하면 on_error(exception)를 호출한다.
+        """
+
+        with self._lock:
+            flight = self._flights.get(key)
+            # 끝났지만 아직 목록에서 지우기 전인 Flight에는 합류하지 않는다. 실패한 작업을 다시 요청하면 새로 시작한다.
+            if flight is None or flight.done:
+                flight = Flight(key)
+                self._flights[key] = flight
+                threading.Thread(
+                    target=self._run,
+                    args=(flight, producer, on_complete, journal, journal_key or key, on_error),
+                    name=f"singleflight-{key}", daemon=True,
+                ).start()
+            flight.subscribers += 1
+            return flight
+
+    def _run(self, flight: Flight, producer, on_complete, journal, journal_key, on_error) -> None:
+        last_write = time.monotonic()
+
+        try:
+            for text in producer(flight):
+                if not text:
+                    continue
+
+                flight.append(text)
+
+                if journal and time.monotonic() - last_write >= journal.interval:
+                    journal.write(journal_key, flight.text)
+                    last_write = time.monotonic()
+
+            if on_complete and flight.text:
+                on_complete(flight.text)
+
+            if journal:
+                journal.clear(journal_key)
+        except Exception as e:
+            traceback.print_exc()
+            if journal and flight.text:
+                journal.write(journal_key, flight.text)
+            if on_error:
+                try:
+                    on_error(e)
+                except Exception:
+                    traceback.print_exc()
+            flight.finish(e)
+        else:
+            flight.finish()
+        finally:
+            with self._lock:
+                if self._flights.get(flight.key) is flight:
+                    del self._flights[flight.key]
+
+    def get(self, key: str) -> Flight:
+        with self._lock:
+            return self._flights.get(key)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+
+def peek(iterator):
+    """
+    첫 항목을 미리 받아 둔 iterator를 반환한다.
+    st.spinner 안에서 첫 청크가 올 때까지 기다릴 때 사용한다.
+    """
+
+    iterator = iter(iterator)
+    try:
+        first = next(iterator)
+    except StopIteration:
+        return iter(())
+    return itertools.chain([first], iterator)
+
+
+# 프로세스 전체에서 공유하는 작업 목록. 모든 streamlit 세션이 함께 사용한다.
+flights = SingleFlight()
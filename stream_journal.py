@@ -0,0 +1,115 @@
+import json
+import os
+import socket
+import time
+
+
+# 부분 결과를 저장하는 최소 간격(초).
+WRITE_INTERVAL = 1.0
+
+# 이 시간 동안 갱신되지 않은 부분 결과는 생성이 중단된 것으로 본다.
+STALE_SECONDS = 30.0
+
+OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+continue_guide = """Your previous answer was interrupted.
+Continue it exactly from where it stops, keeping the same format.
+Do not repeat any text that was already written."""
+
+
+def resume_contents(contents: list, partial_text: str) -> list:
+    """
+    중단된 부분 결과를 모델의 이전 답변으로 넣고, 이어서 쓰도록 요청하는 contents를 만든다.
+    """
+
+    if not partial_text:
+        return contents
+
+    return contents + [
+        {"role": "model", "parts": [partial_text]},
+        {"role": "user", "parts": [continue_guide]},
+    ]
+
+
+class StreamJournal:
+    """
+    스트리밍 중인 요약을 FileStore에 조금씩 저장한다.
+    각 항목은 {"state": "partial", "text", "updated", "owner", "version"} 형식의 JSON이며,
+    요약이 끝나 완성본이 저장되면 지운다.
+    version을 주면 다른 버전(모델, 요약 지침)으로 쓰던 부분 결과는 없는 것으로 본다.
+    """
+
+    def __init__(self, store, interval: float = WRITE_INTERVAL, stale_seconds: float = STALE_SECONDS,
+                 version: str = None):
+        self.store = store
+        self.interval = interval
+        self.stale_seconds = stale_seconds
+        self.version = version
+
+    def load(self, key: str) -> dict:
+        data = self.store[key]
+        if not data:
+            return None
+
+        try:
+            record = json.loads(data)
+        except ValueError:
+            return None
+
+        if self.version and record.get("version") != self.version:
+            return None
+        return record
+
+    def write(self, key: str, text: str, state: str = "partial") -> None:
+        self.store[key] = json.dumps(
+            {"state": state, "text": text, "updated": time.time(), "owner": OWNER, "version": self.version},
+            ensure_ascii=False,
+        )
+
+    def clear(self, key: str) -> None:
+        if key in self.store:
+            self.store[key] = None
+
+    def is_live(self, record: dict) -> bool:
+        """
+        다른 프로세스가 아직 생성 중인 부분 결과인지 확인한다.
+        현재 프로세스가 남긴 기록이면 진행 중인 작업은 SingleFlight에서 찾으므로 False이다.
+        """
+
+        return (
+            record.get("state") == "partial"
+            and record.get("owner") != OWNER
+            and time.time() - record.get("updated", 0) < self.stale_seconds
+        )
+
+    def tail(self, key: str, complete_store, poll_interval: float = 0.5):
+        """
+        다른 프로세스가 쓰고 있는 부분 결과를 처음부터 내보낸 뒤, 완성될 때까지 따라 읽는다.
+        기록이 오래 갱신되지 않으면 RuntimeError를 발생시킨다.
+        """
+
+        sent = 0
+        while True:
+            text = complete_store[key]
+            if text:
+                yield text[sent:]
+                return
+
+            record = self.load(key)
+            if record is None:
+                # 완성본 저장과 기록 삭제 사이에 읽었을 수 있으므로 한 번 더 확인한다.
+                text = complete_store[key]
+                if text:
+                    yield text[sent:]
+                    return
+                raise RuntimeError("The summary generation was abandoned.")
+
+            partial_text = record.get("text", "")
+            if len(partial_text) > sent:
+                yield partial_text[sent:]
+                sent = len(partial_text)
+
+            if not self.is_live(record):
+                raise RuntimeError("The summary generation stopped. Reload to resume it.")
+
+            time.sleep(poll_interval)
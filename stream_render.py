@@ -0,0 +1,118 @@
+import os
+import re
+import time
+import metrics
+
+
+# 청크를 모아 화면에 보내는 최소 간격(초). 화면 갱신(websocket delta)마다 markdown 전체를 다시 그린다.
+INTERVAL = float(os.getenv("STREAM_INTERVAL", "0.1"))
+
+# 모은 텍스트가 이 크기(UTF-8 바이트)를 넘으면 간격과 관계없이 보낸다.
+MAX_BYTES = int(os.getenv("STREAM_MAX_BYTES", "4096"))
+
+# 코드 블록이나 수식 안에서는 블록이 닫힐 때까지 보내지 않되, 이 크기를 넘으면 그대로 보낸다.
+HOLD_BYTES = 16384
+
+TOKEN_PATTERN = re.compile(r"\\.|```|`|\$\$|\$|\n\n", re.DOTALL)
+
+
+class MarkdownState:
+    """
+    지금까지 받은 markdown 텍스트가 코드 블록, 인라인 코드, 블록 수식, 인라인 수식 안에서 끝나는지 추적한다.
+    청크 경계에서 잘린 ``` 나 $$ 는 다음 청크와 합쳐서 판단한다.
+    """
+
+    def __init__(self):
+        self.code_block = False
+        self.inline_code = False
+        self.math_block = False
+        self.inline_math = False
+        self._pending = ""
+
+    @property
+    def is_open(self) -> bool:
+        return bool(self.code_block or self.inline_code or self.math_block or self.inline_math or self._pending)
+
+    def feed(self, text: str) -> None:
+        text = self._pending + text
+
+        # 끝의 `, $, \ 는 다음 글자에 따라 의미가 달라지므로 남겨 둔다.
+        end = len(text)
+        while end and text[end - 1] in "`$\\":
+            end -= 1
+        self._pending = text[end:]
+
+        for match in TOKEN_PATTERN.finditer(text, 0, end):
+            self._token(match.group())
+
+    def _token(self, token: str) -> None:
+        if self.code_block:
+            if token == "```":
+                self.code_block = False
+        elif self.math_block:
+            if token == "$$":
+                self.math_block = False
+        elif token == "\n\n":
+            # 인라인 코드와 인라인 수식은 문단을 넘지 않는다.
+            self.inline_code = self.inline_math = False
+        elif self.inline_code:
+            if token == "`":
+                self.inline_code = False
+        elif token == "```":
+            self.code_block = True
+        elif token == "`":
+            self.inline_code = True
+        elif token == "$$":
+            self.math_block = True
+        elif token == "$":
+            self.inline_math = not self.inline_math
+
+
+def coalesce(chunks, interval: float = INTERVAL, max_bytes: int = MAX_BYTES, hold_bytes: int = HOLD_BYTES):
+    """
+    텍스트 청크를 interval초 또는 max_bytes 단위로 모아서 내보낸다. 첫 청크는 바로 내보낸다.
+    코드 블록이나 수식이 열린 채로 끝나는 텍스트는 깨진 모양으로 그려지므로 블록이 닫힐 때까지 모은다.
+    내보낸 텍스트를 이어 붙이면 원래 텍스트와 같다.
+    """
+
+    state = MarkdownState()
+    buffer = []
+    size = 0
+    received = 0
+    sent = 0
+    last = None
+
+    for text in chunks:
+        if not text:
+            continue
+
+        received += 1
+        buffer.append(text)
+        size += len(text.encode("utf-8"))
+        state.feed(text)
+
+        now = time.monotonic()
+        due = last is None or now - last >= interval or size >= max_bytes
+        if due and (not state.is_open or size >= hold_bytes):
+            yield "".join(buffer)
+            sent += 1
+            buffer = []
+            size = 0
+            last = now
+
+    if buffer:
+        yield "".join(buffer)
+        sent += 1
+
+    metrics.inc("stream_chunks_total", received)
+    metrics.inc("stream_deltas_total", sent)
+
+
+def write_stream(chunks):
+    """
+    st.write_stream과 같지만 청크를 coalesce()로 모아서 그린다. 전체 텍스트를 반환한다.
+    """
+
+    import streamlit as st
+
+    return st.write_stream(coalesce(chunks))
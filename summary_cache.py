@@ -0,0 +1,220 @@
+import hashlib
+import json
+import os
+import time
+import metrics
+
+
+# 백그라운드 새로 고침이 실패하면 REFRESH_BACKOFF_BASE * 2^(연속 실패 수 - 1)초(최대 REFRESH_BACKOFF_MAX) 동안
+# 다시 시도하지 않는다. 화면을 열 때마다 실패할 요청을 다시 보내지 않도록 한다.
+REFRESH_BACKOFF_BASE = float(os.getenv("SUMMARY_REFRESH_BACKOFF", "60"))
+REFRESH_BACKOFF_MAX = 6 * 3600
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+
+
+class SummaryCache:
+    """
+    요약을 (입력, 모델, 요약 지침 hash)별로 저장한다.
+    versions_store에는 "<입력>\t<model>:<prompt hash>" key로 버전마다 요약을 저장하고,
+    meta_store의 같은 key에 생성 시각, 걸린 시간, 새로 고침 실패 기록을 JSON으로 기록한다.
+    store(입력 key)에는 마지막으로 만든 요약을 쓰므로 검색 색인, journal, 이전 요약은 그대로 쓸 수 있다.
+
+    현재 버전의 요약이 없으면 store의 요약을 stale로 반환하며, 화면에는 바로 보여 주고 백그라운드에서 새로 만든다.
+    """
+
+    def __init__(self, store, versions_store, meta_store, prompt: str, source: str):
+        self.store = store
+        self.versions_store = versions_store
+        self.meta_store = meta_store
+        self.prompt_hash = prompt_hash(prompt)
+        self.source = source
+
+    def version(self, model_name: str) -> str:
+        return f"{model_name}:{self.prompt_hash}"
+
+    def key(self, name: str, model_name: str) -> str:
+        """
+        versions_store와 meta_store에서 쓰는 name의 현재 버전 key.
+        """
+
+        return f"{name}\t{self.version(model_name)}"
+
+    @staticmethod
+    def split_key(key: str) -> tuple:
+        name, _, version = key.rpartition("\t")
+        return name, version
+
+    def meta(self, key: str) -> dict:
+        data = self.meta_store[key]
+        if not data:
+            return {}
+
+        try:
+            return json.loads(data)
+        except ValueError:
+            return {}
+
+    def get(self, name: str, model_name: str) -> tuple:
+        """
+        (text, fresh)를 반환. 요약이 없으면 text는 None이다.
+        현재 버전이 없으면 다른 버전으로 마지막에 만든 요약을 fresh=False로 반환한다.
+        """
+
+        text = self.versions_store[self.key(name, model_name)]
+        fresh = bool(text)
+        if not fresh:
+            text = self.store[name]
+
+        result = "miss" if not text else "fresh" if fresh else "stale"
+        metrics.inc("summary_requests_total", source=self.source, result=result)
+        return text, fresh
+
+    def put(self, name: str, text: str, model_name: str, latency: float = None) -> None:
+        """
+        요약과 버전 정보를 저장한다. 새로 고침 실패 기록은 지운다.
+        store의 listener(검색 색인)가 버전 정보를 볼 수 있도록 store에는 마지막에 쓴다.
+        """
+
+        key = self.key(name, model_name)
+        self.meta_store[key] = json.dumps({
+            "version": self.version(model_name),
+            "model": model_name,
+            "prompt_hash": self.prompt_hash,
+            "created": time.time(),
+            "latency": latency,
+            "chars": len(text),
+        })
+        self.versions_store[key] = text
+        self.store[name] = text
+
+    def record_failure(self, name: str, model_name: str, error: Exception) -> None:
+        """
+        현재 버전을 만들지 못했음을 기록한다. retry_after()가 다음 시도까지 남은 시간을 알려 준다.
+        """
+
+        key = self.key(name, model_name)
+        meta = self.meta(key)
+        meta.update({
+            "version": self.version(model_name),
+            "failures": meta.get("failures", 0) + 1,
+            "failed_at": time.time(),
+            "error": str(error)[:200],
+        })
+        self.meta_store[key] = json.dumps(meta)
+        metrics.inc("summary_refresh_failures_total", source=self.source)
+
+    def retry_after(self, name: str, model_name: str) -> float:
+        """
+        마지막 실패 뒤 backoff가 끝날 때까지 남은 시간(초). 실패 기록이 없으면 0이다.
+        """
+
+        return self._retry_after(self.meta(self.key(name, model_name)))
+
+    @staticmethod
+    def _retry_after(meta: dict) -> float:
+        failures = meta.get("failures", 0)
+        if not failures:
+            return 0.0
+
+        delay = min(REFRESH_BACKOFF_MAX, REFRESH_BACKOFF_BASE * 2 ** (failures - 1))
+        return max(0.0, meta.get("failed_at", 0) + delay - time.time())
+
+    def delete(self, name: str) -> None:
+        for key in list(self.versions_store.keys()):
+            if self.split_key(key)[0] == name:
+                self.versions_store[key] = None
+                self.meta_store[key] = None
+        self.store[name] = None
+
+    def versions(self) -> dict:
+        """
+        {version: 요약 수}를 반환. 버전별 요약이 하나도 없는 이전 요약은 "unversioned"로 센다.
+        """
+
+        counts = {}
+        names = set()
+        for key in self.versions_store.keys():
+            name, version = self.split_key(key)
+            names.add(name)
+            counts[version] = counts.get(version, 0) + 1
+
+        unversioned = sum(1 for name in self.store.keys() if name not in names)
+        if unversioned:
+            counts["unversioned"] = unversioned
+        return counts
+
+    def gc(self, model_name: str, min_age_days: float = 0, dry_run: bool = False) -> dict:
+        """
+        같은 입력의 현재 버전 요약이 있어 대체된 이전 버전 요약 중 min_age_days일보다 오래된 것과,
+        요약 없이 남은 버전 정보를 지운다. 현재 버전이 없는 입력의 요약은 유일한 요약이므로 남긴다.
+        """
+
+        version = self.version(model_name)
+        cutoff = time.time() - min_age_days * 86400
+        stats = {"kept": 0, "superseded": 0, "orphaned": 0}
+
+        keys = list(self.versions_store.keys())
+        current = {self.split_key(key)[0] for key in keys if self.split_key(key)[1] == version}
+
+        for key in keys:
+            name, key_version = self.split_key(key)
+            if key_version == version or name not in current or self.meta(key).get("created", 0) > cutoff:
+                stats["kept"] += 1
+                continue
+
+            stats["superseded"] += 1
+            if not dry_run:
+                self.versions_store[key] = None
+                self.meta_store[key] = None
+
+        # 실패 기록만 있는 항목은 backoff가 끝난 뒤에 지운다.
+        for key in list(self.meta_store.keys()):
+            if key not in self.versions_store:
+                if self._retry_after(self.meta(key)) > 0:
+                    continue
+                stats["orphaned"] += 1
+                if not dry_run:
+                    self.meta_store[key] = None
+
+        return stats
+
+
+def main():
+    import argparse
+    import model_backend
+
+    parser = argparse.ArgumentParser(description="Inspect and garbage-collect versioned summary caches.")
+    parser.add_argument("--model", default=model_backend.MODEL_NAME,
+                        help="Model whose summaries are current (default: %(default)s).")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("versions", help="Count summaries per version.")
+
+    gc_parser = subparsers.add_parser("gc", help="Drop summaries superseded by a current-version summary.")
+    gc_parser.add_argument("--min-age-days", type=float, default=0,
+                           help="Keep superseded summaries younger than this.")
+    gc_parser.add_argument("--dry-run", action="store_true")
+
+    args = parser.parse_args()
+
+    import summary_of_arxiv
+    import summary_of_youtube
+
+    for cache in (summary_of_arxiv.cache, summary_of_youtube.cache):
+        if args.command == "versions":
+            current = cache.version(args.model)
+            for version, count in sorted(cache.versions().items()):
+                mark = " (current)" if version == current else ""
+                print(f"{cache.source:8s} {version}{mark}: {count}")
+        elif args.command == "gc":
+            stats = cache.gc(args.model, args.min_age_days, args.dry_run)
+            action = "would drop" if args.dry_run else "dropped"
+            print(f"{cache.source}: kept {stats['kept']}, {action} {stats['superseded']} superseded "
+                  f"and {stats['orphaned']} orphaned entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import streamlit as st
+import time
+import traceback
+import jobs
+import stream_render
+from singleflight import peek
+from stream_journal import StreamJournal
+from summary_cache import SummaryCache
+from tokens import model_name_of
+
+
+class SummaryJobs:
+    """
+    요약 생성 작업, journal, cache를 함께 다룬다. summary_of_arxiv와 summary_of_youtube가 같이 쓴다.
+    generate(key, model, info, resume_text, check_cancel)는 요약 텍스트 청크를 내보내는 generator이다.
+    작업 key는 "<cache.source>:<key>"이고, 끝난 요약은 cache에, 중간 결과는 partial_store의 journal에 저장한다.
+    """
+
+    def __init__(self, cache: SummaryCache, partial_store, generate, title, spinner: str = "Summarizing...",
+                 parts_message: str = "Summarized in {parts} parts.", error_message: str = "An error occurred"):
+        self.cache = cache
+        self.partial_store = partial_store
+        self.generate = generate
+        self.title = title
+        self.spinner = spinner
+        self.parts_message = parts_message
+        self.error_message = error_message
+
+    def job_key(self, key: str) -> str:
+        return f"{self.cache.source}:{key}"
+
+    def journal(self, model) -> StreamJournal:
+        return StreamJournal(self.partial_store, version=self.cache.version(model_name_of(model)))
+
+    def start(self, key: str, model, journal: StreamJournal, resume_text: str = "") -> jobs.Job:
+        """
+        백그라운드 작업으로 요약 생성을 시작하고 Job을 반환. 같은 key를 생성 중이면 그 Job을 반환한다.
+        요약이 끝나면 걸린 시간과 함께 cache에 저장한다.
+        """
+
+        start = time.time()
+        model_name = model_name_of(model)
+        return jobs.queue.submit(
+            self.job_key(key),
+            self.title(key),
+            lambda task: self.generate(key, model, task.info, resume_text, task.stop_if_cancelled),
+            on_complete=lambda text: self.cache.put(key, text, model_name, time.time() - start),
+            on_error=lambda error: self._record_failure(key, model_name, error),
+            journal=journal,
+            journal_key=key,
+        )
+
+    def _record_failure(self, key: str, model_name: str, error: Exception) -> None:
+        if not isinstance(error, jobs.JobCancelled):
+            self.cache.record_failure(key, model_name, error)
+
+    def refresh(self, key: str, model) -> bool:
+        """
+        이전 버전 요약을 보여 주는 동안 백그라운드에서 새 요약을 만든다.
+        이 프로세스나 다른 프로세스가 이미 만들고 있으면 새로 시작하지 않는다. 시작했거나 진행 중이면 True.
+        최근에 실패했으면 backoff가 끝날 때까지 다시 시작하지 않고 False를 반환한다.
+        """
+
+        if jobs.queue.running(self.job_key(key)) is not None:
+            return True
+
+        if self.cache.retry_after(key, model_name_of(model)) > 0:
+            return False
+
+        journal = self.journal(model)
+        record = journal.load(key)
+        if record and journal.is_live(record):
+            return True
+
+        try:
+            self.start(key, model, journal, record["text"] if record else "")
+            return True
+        except Exception:
+            traceback.print_exc()
+            return False
+
+    def stream(self, key: str) -> str:
+        """
+        같은 key의 요약이 다른 세션에서 진행 중이면 새로 생성하지 않고 그 스트림을 함께 받는다.
+        다른 프로세스가 생성 중이면 journal에 저장된 부분 결과를 따라 읽는다.
+        중단된 부분 결과가 남아 있으면 그 뒤부터 이어서 생성한다.
+        요약이 끝나면 백그라운드 스레드에서 cache에 저장한다.
+        """
+
+        job_key = self.job_key(key)
+
+        # 이 세션에서 취소한 요약은 다시 시작을 누를 때까지 자동으로 시작하지 않는다.
+        # 다른 세션이 같은 요약을 받고 있으면 작업은 계속되고, 다시 시작하면 그 작업에 다시 합류한다.
+        previous = jobs.session_job(job_key)
+        if previous and previous.state == "cancelled":
+            st.info("요약을 취소했다. 다시 시작하면 저장된 부분 결과 뒤부터 이어서 만든다.")
+            if not st.button("다시 시작"):
+                return None
+
+        try:
+            model = st.session_state.model
+            journal = self.journal(model)
+            record = journal.load(key) if jobs.queue.running(job_key) is None else None
+
+            if record and journal.is_live(record):
+                job = None
+                with st.spinner(self.spinner):
+                    chunks = peek(journal.tail(key, self.cache.store))
+            else:
+                job = self.start(key, model, journal, record["text"] if record else "")
+                jobs.track(job)
+                chunks = jobs.watch(job)
+
+            if job and job.flight.info.get("parts"):
+                st.info(self.parts_message.format(parts=job.flight.info["parts"]))
+
+            with st.container():
+                return stream_render.write_stream(chunks)
+        except jobs.JobCancelled:
+            st.info("요약을 취소했다.")
+        except Exception as e:
+            traceback.print_exc()
+            st.error(f"{self.error_message}: {e}")
+
+    def show(self, key: str) -> None:
+        """
+        cache의 요약을 보여 준다. 요약이 없으면 생성하면서 스트리밍하고,
+        이전 버전 요약이면 그대로 보여 주면서 백그라운드에서 새로 만든다.
+        """
+
+        model = st.session_state.model
+        summary_results, fresh = self.cache.get(key, model_name_of(model))
+
+        if summary_results:
+            st.write(summary_results)
+            if not fresh and self.refresh(key, model):
+                st.caption("이전 모델 또는 요약 지침으로 만든 요약이다. 새 요약을 만들고 있으며, 끝나면 다시 열 때 보인다.")
+        else:
+            summary_results = self.stream(key)
+
+        if summary_results and st.button("Show markdown"):
+            st.text_area("Markdown:", summary_results, height=600)
@@ -1,12 +1,16 @@
 import streamlit as st
-import traceback
-import io
-import requests
-from filestore import FileStore
-from PyPDF2 import PdfReader
+import map_reduce
+import metrics
+import summary_search
+from filestore import open_store
+from stream_journal import resume_contents
+from summary_cache import SummaryCache
+from summary_jobs import SummaryJobs
 
 
-fs = FileStore("data/arxiv")
+fs = open_store("data/arxiv")
+summary_search.index.watch(fs, "arxiv")
+partial_store = open_store("data/arxiv_partial")
 
 summary_guide = """Summarize the main points from the uploaded PDF file using markdown bullet points.
 Maintain the numbering and titles of chapters, sections, and subsections as in the paper's table of contents.
@@ -17,41 +21,75 @@ Use the declarative form "이다" instead of the polite form "입니다."
 Apply heading level 1 (#) for title captions, level 2 (##) for chapter captions, level 3 (###) for section captions, and level 4 (####) for subsection captions.
 Use $...$ for inline math and $$...$$ for block math."""
 
+# 요약은 모델과 요약 지침 버전별로 저장한다. summary_guide를 바꾸면 이전 요약은 stale이 된다.
+cache = SummaryCache(fs, open_store("data/arxiv_versions"), open_store("data/arxiv_meta"), summary_guide, "arxiv")
 
-def get_arxiv_summary(pdf_url: str) -> str:
-    try:
-        response = requests.get(pdf_url)
-        pdf_data = response.content
 
-        reader = PdfReader(io.BytesIO(pdf_data))
-        pdf_text = ""
+def normalize_url(url: str) -> str:
+    """
+    arXiv 초록 페이지 URL을 PDF URL로 바꾼다. FileStore key로 사용한다.
+    """
 
-        for page in reader.pages:
-            if len(pdf_text) > 500000:
-                st.warning("Long text will be truncated.")
-                break
+    return url.strip().replace("https://arxiv.org/abs/", "https://arxiv.org/pdf/")
 
-            pdf_text += page.extract_text() or ""
 
-        prompt = (
-            "Based on the following context, answer the question:\n\n"
-            + "Context: "
-            + pdf_text
-            + "\n\n"
-            + "Question: "
-            + summary_guide
-        )
+def get_pdf_pages(pdf_url: str, check_cancel=None) -> list:
+    """
+    PDF를 내려받아 페이지 텍스트 목록을 반환.
+    저장된 요약을 볼 때는 필요 없으므로 requests와 PyPDF2는 여기서 import한다.
+    check_cancel이 있으면 내려받는 동안과 페이지마다 호출한다.
+    """
 
-        with st.spinner("Analyzing..."):
-            response = st.session_state.model.generate_content(
-                [{"role": "user", "parts": [prompt]}], stream=True
-            )
+    import http_client
+    import pdf_extract
 
-        with st.container():
-            return st.write_stream(chunk.text for chunk in response)
-    except Exception as e:
-        traceback.print_exc()
-        st.error(f"An error occurred while processing PDF file: {e}")
+    with metrics.span("arxiv.download"):
+        pdf_data = http_client.fetch(pdf_url, check_cancel=check_cancel).content
+    with metrics.span("arxiv.extract"):
+        pages = []
+        for page in pdf_extract.iter_pages(pdf_data):
+            if check_cancel:
+                check_cancel()
+            pages.append(page)
+        return pages
+
+
+def build_contents(pdf_url: str, model, info: dict = None, check_cancel=None) -> list:
+    """
+    요약 요청 contents를 만든다. 긴 논문은 부분별로 나누어 요약한 결과를 문맥으로 쓴다.
+    """
+
+    pages = get_pdf_pages(pdf_url, check_cancel)
+    with metrics.span("arxiv.prompt"):
+        return map_reduce.build_contents(model, pages, summary_guide, info, check_cancel=check_cancel)
+
+
+def generate_summary(pdf_url: str, model, info: dict, resume_text: str = "", check_cancel=None):
+    """
+    PDF를 내려받아 요약을 생성하고 텍스트 청크를 내보낸다.
+    streamlit과 무관하게 백그라운드 스레드에서 실행된다.
+    resume_text가 있으면 먼저 내보내고, 모델에게 그 뒤부터 이어서 쓰게 한다.
+    check_cancel(jobs.Task.stop_if_cancelled)은 단계마다 넘겨 취소되면 바로 멈추게 한다.
+    """
+
+    info["stage"] = "Downloading and reading the paper..."
+    contents = build_contents(pdf_url, model, info, check_cancel)
+
+    info["stage"] = "Writing the summary..."
+    yield resume_text
+
+    yield from metrics.generate_stream(
+        model, resume_contents(contents, resume_text), "arxiv", check_cancel=check_cancel)
+
+
+# 요약 작업, journal, cache를 함께 다룬다.
+summaries = SummaryJobs(
+    cache, partial_store, generate_summary,
+    title=lambda pdf_url: f"arXiv 요약: {pdf_url.rsplit('/', 1)[-1]}",
+    spinner="Analyzing...",
+    parts_message="Long paper: summarized in {parts} parts.",
+    error_message="An error occurred while processing PDF file",
+)
 
 
 def summarize() -> None:
@@ -64,16 +102,6 @@ def summarize() -> None:
     if not pdf_url:
         return
 
-    pdf_url = pdf_url.replace("https://arxiv.org/abs/", "https://arxiv.org/pdf/")
-
-    summary_results = fs[pdf_url]
-
-    if summary_results:
-        st.write(summary_results)
-    else:
-        summary_results = get_arxiv_summary(pdf_url)
-        if summary_results:
-            fs[pdf_url] = summary_results
+    pdf_url = normalize_url(pdf_url)
 
-    if summary_results and st.button("Show markdown"):
-        st.text_area("Markdown:", summary_results, height=600)
+    summaries.show(pdf_url)
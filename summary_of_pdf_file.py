@@ -1,6 +1,8 @@
 import streamlit as st
 import traceback
-from PyPDF2 import PdfReader
+import map_reduce
+import metrics
+import stream_render
 
 
 summary_guide = """Summarize the main points from the uploaded PDF file using markdown bullet points.
@@ -17,30 +19,24 @@ def summarize(pdf_file) -> None:
     if not pdf_file:
         return
 
-    try:
-        reader = PdfReader(pdf_file)
-        text = ""
-
-        for page in reader.pages:
-            if len(text) > 500000:
-                break
-
-            text += page.extract_text() or ""
+    import pdf_extract
 
-        prompt = (
-            "Based on the following context, answer the question:\n\n"
-            + "Context: "
-            + text
-            + "\n\n"
-            + "Question: "
-            + summary_guide
-        )
+    try:
+        model = st.session_state.model
+        with metrics.span("pdf_file.extract"):
+            pages = list(pdf_extract.iter_pages(pdf_file))
 
         with st.spinner("Analyzing..."):
-            response = st.session_state.model.generate_content(prompt, stream=True)
+            info = {}
+            with metrics.span("pdf_file.prompt"):
+                contents = map_reduce.build_contents(model, pages, summary_guide, info)
+            chunks = metrics.generate_stream(model, contents, "pdf_file")
+
+        if info.get("parts"):
+            st.info(f"Long document: summarized in {info['parts']} parts.")
 
         with st.container():
-            st.write_stream(chunk.text for chunk in response)
+            stream_render.write_stream(chunks)
     except Exception as e:
         traceback.print_exc()
         st.error(f"An error occurred while processing YouTube video: {e}")
@@ -1,11 +1,18 @@
-from youtube_transcript_api import YouTubeTranscriptApi
-from filestore import FileStore
+from filestore import open_store
+import map_reduce
+import metrics
+import summary_search
+import transcripts
+from stream_journal import resume_contents
+from summary_cache import SummaryCache
+from summary_jobs import SummaryJobs
 import re
 import streamlit as st
-import traceback
 
 
-fs = FileStore("data/youtube")
+fs = open_store("data/youtube")
+summary_search.index.watch(fs, "youtube")
+partial_store = open_store("data/youtube_partial")
 
 summary_guide = """Summarize the main points and detailed explanations from the script below.
 Begin with the video title caption, starting with `#`.
@@ -16,44 +23,65 @@ Maintain a direct and objective tone.
 Do not use phrases like "the script provides."
 Write the summary in Korean."""
 
+# 요약은 모델과 요약 지침 버전별로 저장한다. summary_guide를 바꾸면 이전 요약은 stale이 된다.
+cache = SummaryCache(fs, open_store("data/youtube_versions"), open_store("data/youtube_meta"), summary_guide, "youtube")
 
-def get_youtube_summary(video_id: str) -> str:
-    try:
-        with st.spinner(f"Fetching transcript..."):
-            transcript_list = YouTubeTranscriptApi.get_transcript(
-                video_id, languages=("ko", "en")
-            )
-            transcript_text = " ".join([d["text"] for d in transcript_list])
-
-        if not transcript_text.strip():
-            st.error("Could not extract transcript from the YouTube video.")
-            return
-
-        if len(transcript_text) > 500000:
-            transcript_text = (
-                transcript_text[:500000] + "\n\n[Content truncated due to length...]"
-            )
-
-        prompt = (
-            "Based on the following context, answer the question:\n\n"
-            + "Context: "
-            + transcript_text
-            + "\n\n"
-            + "Question: "
-            + summary_guide
-        )
-
-        with st.spinner("Summarizing transcript..."):
-            # prompt = summary_guide + "\n---\n" + transcript_text
-            response = st.session_state.model.generate_content(
-                [{"role": "user", "parts": [prompt]}], stream=True
-            )
-
-        with st.container():
-            return st.write_stream(chunk.text for chunk in response)
-    except Exception as e:
-        traceback.print_exc()
-        st.error(f"An error occurred while processing YouTube video: {e}")
+
+def extract_video_id(youtube_url: str) -> str:
+    """
+    YouTube URL에서 video id를 찾아 반환, 없으면 None 반환.
+    """
+
+    video_id_match = re.search(r"(?<=v=)[a-zA-Z0-9_-]+", youtube_url)
+    return video_id_match.group(0) if video_id_match else None
+
+
+def build_contents(video_id: str, model, info: dict = None, check_cancel=None,
+                   start: float = None, end: float = None) -> list:
+    """
+    요약 요청 contents를 만든다. 긴 스크립트는 시간 구간별로 나누어 요약한 결과를 문맥으로 쓴다.
+    info가 있으면 나눈 부분 수와 단계 수를 info["parts"], info["levels"]에 쓴다.
+    start, end(초)를 주면 그 구간의 스크립트만 요약한다.
+    """
+
+    with metrics.span("youtube.transcript"):
+        transcript = transcripts.get_transcript(video_id).slice(start, end)
+
+    if not transcript:
+        raise ValueError("Could not extract transcript from the YouTube video.")
+
+    if check_cancel:
+        check_cancel()
+    with metrics.span("youtube.prompt"):
+        return map_reduce.build_contents(model, transcript.pages(), summary_guide, info, check_cancel=check_cancel)
+
+
+def generate_summary(video_id: str, model, info: dict, resume_text: str = "", check_cancel=None):
+    """
+    스크립트를 가져와 요약을 생성하고 텍스트 청크를 내보낸다.
+    streamlit과 무관하게 백그라운드 스레드에서 실행된다.
+    resume_text가 있으면 먼저 내보내고, 모델에게 그 뒤부터 이어서 쓰게 한다.
+    check_cancel(jobs.Task.stop_if_cancelled)은 단계마다 넘겨 취소되면 바로 멈추게 한다.
+    """
+
+    info["stage"] = "Fetching the transcript..."
+    contents = build_contents(video_id, model, info, check_cancel)
+
+    info["stage"] = "Writing the summary..."
+    yield resume_text
+
+    yield from metrics.generate_stream(
+        model, resume_contents(contents, resume_text), "youtube", check_cancel=check_cancel)
+
+
+# 요약 작업, journal, cache를 함께 다룬다.
+summaries = SummaryJobs(
+    cache, partial_store, generate_summary,
+    title=lambda video_id: f"YouTube 요약: {video_id}",
+    spinner="Summarizing transcript...",
+    parts_message="Long video: summarized in {parts} parts.",
+    error_message="An error occurred while processing YouTube video",
+)
 
 
 def summarize() -> None:
@@ -66,14 +94,9 @@ def summarize() -> None:
     if not youtube_url:
         return
 
-    video_id_match = re.search(r"(?<=v=)[a-zA-Z0-9_-]+", youtube_url)
-    if not video_id_match:
-        st.error("Invalid YouTube URL.")
-        return
-
-    video_id = video_id_match.group(0)
+    video_id = extract_video_id(youtube_url)
     if not video_id:
-        st.error("Invalid video id.")
+        st.error("Invalid YouTube URL.")
         return
 
     st.write(
@@ -89,14 +112,4 @@ def summarize() -> None:
         unsafe_allow_html=True,
     )
 
-    summary_results = fs[video_id]
-
-    if summary_results:
-        st.write(summary_results)
-    else:
-        summary_results = get_youtube_summary(video_id)
-        if summary_results:
-            fs[video_id] = summary_results
-
-    if summary_results and st.button("Show markdown"):
-        st.text_area("Markdown:", summary_results, height=600)
+    summaries.show(video_id)
@@ -0,0 +1,304 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from filestore import open_store
+from retrieval import tokenize
+
+
+# 검색 대상 저장소. source 이름과 open_store()에 넘기는 경로이다.
+SOURCES = {
+    "arxiv": "data/arxiv",
+    "youtube": "data/youtube",
+}
+
+# 제목이 본문보다 얼마나 더 중요한지 나타내는 BM25 가중치.
+TITLE_WEIGHT = 5.0
+
+# 전체 문서의 이 비율보다 많은 문서에 나오는 토큰("이다", "model" 등)은
+# 드문 토큰이 함께 있으면 검색 조건에서 뺀다.
+COMMON_TOKEN_RATIO = 0.1
+
+SNIPPET_CHARS = 200
+
+HEADING_PATTERN = re.compile(r"^#\s+(.+)$", re.MULTILINE)
+
+
+def summary_title(text: str) -> str:
+    """
+    요약의 첫 "# " 제목을 반환, 없으면 첫 줄을 반환.
+    """
+
+    match = HEADING_PATTERN.search(text)
+    if match:
+        return match.group(1).strip()
+    return text.strip().split("\n", 1)[0][:100]
+
+
+def source_url(source: str, name: str) -> str:
+    if source == "youtube":
+        return f"https://www.youtube.com/watch?v={name}"
+    return name
+
+
+def snippet(text: str, query: str, size: int = SNIPPET_CHARS) -> str:
+    """
+    질의 단어가 처음 나오는 곳 주변의 본문을 반환.
+    """
+
+    lowered = text.lower()
+    positions = [lowered.find(word) for word in query.lower().split()]
+    positions = [position for position in positions if position >= 0]
+
+    start = max(0, min(positions) - size // 4) if positions else 0
+    text = " ".join(text[start:start + size].split())
+    return ("…" if start else "") + text + ("…" if start + size < len(lowered) else "")
+
+
+class SearchIndex:
+    """
+    저장된 요약에 대한 SQLite FTS5 역색인.
+    한글은 조사가 붙어도 찾을 수 있도록 retrieval.tokenize의 bigram으로 색인한다.
+    저장소에 add_listener()로 연결하면 요약이 저장될 때마다 색인이 갱신된다.
+
+    docs(id, source, name, title)   문서 목록
+    docs_fts(title, body)           토큰을 공백으로 이은 검색용 텍스트, rowid는 docs.id
+    """
+
+    def __init__(self, db_path: str = "data/search.sqlite3"):
+        self.db_path = db_path
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS docs ("
+            "id INTEGER PRIMARY KEY, source TEXT NOT NULL, name TEXT NOT NULL, title TEXT NOT NULL, "
+            "UNIQUE (source, name))"
+        )
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(title, body, detail=column)"
+        )
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS temp.docs_vocab USING fts5vocab(main, docs_fts, 'row')"
+        )
+
+    def _delete(self, source: str, name: str) -> None:
+        row = self._conn.execute(
+            "SELECT id FROM docs WHERE source = ? AND name = ?", (source, name)
+        ).fetchone()
+        if row:
+            self._conn.execute("DELETE FROM docs_fts WHERE rowid = ?", row)
+            self._conn.execute("DELETE FROM docs WHERE id = ?", row)
+
+    def _insert(self, source: str, name: str, text: str) -> None:
+        # 다시 만드는 중에 listener가 같은 문서를 먼저 색인했을 수 있으므로 이전 항목을 지우고 넣는다.
+        self._delete(source, name)
+        title = summary_title(text)
+        cursor = self._conn.execute(
+            "INSERT INTO docs (source, name, title) VALUES (?, ?, ?)", (source, name, title)
+        )
+        self._conn.execute(
+            "INSERT INTO docs_fts (rowid, title, body) VALUES (?, ?, ?)",
+            (cursor.lastrowid, " ".join(tokenize(title)), " ".join(tokenize(text))),
+        )
+
+    def update(self, source: str, name: str, text: str) -> None:
+        """
+        문서를 색인하거나 갱신한다. text가 비어 있으면 색인에서 지운다.
+        """
+
+        try:
+            with self._transaction():
+                if text:
+                    self._insert(source, name, text)
+                else:
+                    self._delete(source, name)
+        except sqlite3.Error as e:
+            print("Error while accessing", self.db_path, e)
+
+    @contextmanager
+    def _transaction(self):
+        """
+        lock을 잡고 트랜잭션 하나를 실행한다. 실패하면 ROLLBACK하여 공유 연결이 트랜잭션 안에 남지 않게 한다.
+        """
+
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                yield
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def watch(self, store, source: str) -> None:
+        """
+        store에 요약이 저장되거나 삭제될 때마다 색인을 갱신한다.
+        """
+
+        store.add_listener(lambda name, data: self.update(source, name, data))
+
+    def rebuild(self, store, source: str, batch_size: int = 1000) -> int:
+        """
+        store의 모든 문서로 source의 색인을 다시 만들고 색인한 문서 수를 반환.
+        batch마다 따로 커밋하므로, 그 사이에 저장된 요약은 listener가 색인한다.
+        """
+
+        count = 0
+        try:
+            with self._transaction():
+                self._conn.execute(
+                    "DELETE FROM docs_fts WHERE rowid IN (SELECT id FROM docs WHERE source = ?)", (source,)
+                )
+                self._conn.execute("DELETE FROM docs WHERE source = ?", (source,))
+
+            names = list(store.keys())
+            for i in range(0, len(names), batch_size):
+                items = store.get_many(names[i:i + batch_size])
+                with self._transaction():
+                    for name, text in items.items():
+                        if text:
+                            self._insert(source, name, text)
+                            count += 1
+        except sqlite3.Error as e:
+            print("Error while accessing", self.db_path, e)
+        return count
+
+    def _query_tokens(self, tokens: list) -> list:
+        """
+        드문 토큰이 있으면 거의 모든 문서에 나오는 토큰을 뺀다.
+        그런 토큰은 순위에 거의 영향이 없으면서 일치하는 문서 수만 늘린다.
+        """
+
+        placeholders = ",".join("?" * len(tokens))
+        document_frequency = dict(self._conn.execute(
+            f"SELECT term, doc FROM docs_vocab WHERE term IN ({placeholders})", tokens
+        ))
+        total = self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+        rare = [token for token in tokens
+                if 0 < document_frequency.get(token, 0) <= total * COMMON_TOKEN_RATIO]
+        return rare or tokens
+
+    def _ranked(self, expression: str, k: int) -> list:
+        # 일치하는 모든 문서의 bm25로 순위를 매기고 상위 k개만 docs와 join한다.
+        return self._conn.execute(
+            "SELECT docs.source, docs.name, docs.title, ranked.score FROM ("
+            f"SELECT rowid, bm25(docs_fts, {TITLE_WEIGHT}, 1.0) AS score FROM docs_fts "
+            "WHERE docs_fts MATCH ? ORDER BY score LIMIT ?"
+            ") AS ranked JOIN docs ON docs.id = ranked.rowid ORDER BY ranked.score",
+            (expression, k),
+        ).fetchall()
+
+    def search(self, query: str, k: int = 20) -> list:
+        """
+        query와 관련도가 높은 순서로 최대 k개의 (source, name, title, score)를 반환.
+        모든 단어가 들어 있는 문서가 없으면 일부 단어만 들어 있는 문서를 찾는다.
+        """
+
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+
+        with self._lock:
+            terms = ['"' + token + '"' for token in self._query_tokens(tokens)]
+            for expression in (" ".join(terms), " OR ".join(terms)):
+                rows = self._ranked(expression, k)
+                if rows or len(terms) == 1:
+                    break
+
+        # FTS5의 bm25()는 관련도가 높을수록 작은 음수이므로 부호를 바꾼다.
+        return [(source, name, title, -score) for source, name, title, score in rows]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def count(self, source: str) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM docs WHERE source = ?", (source,)
+            ).fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# 프로세스 전체에서 공유하는 색인.
+index = SearchIndex(os.getenv("SUMMARY_INDEX_PATH", "data/search.sqlite3"))
+
+
+def search_page(stores: dict) -> None:
+    """
+    요약 검색 화면. stores는 {source: store}이며 결과의 본문을 읽는 데 사용한다.
+    """
+
+    import streamlit as st
+
+    for source, store in stores.items():
+        if not index.count(source) and len(store):
+            with st.spinner(f"Indexing {source} summaries..."):
+                index.rebuild(store, source)
+
+    query = st.text_input("검색어:", key="summary_search_query")
+    if not query:
+        st.caption(f"{len(index)}개의 요약이 색인되어 있다.")
+        return
+
+    start = time.perf_counter()
+    results = index.search(query)
+    elapsed = time.perf_counter() - start
+
+    st.caption(f"{len(results)}개 결과 ({elapsed * 1e3:.1f}ms)")
+
+    for source, name, title, score in results:
+        text = stores[source][name] if source in stores else None
+        if not text:
+            continue
+
+        url = source_url(source, name)
+        st.markdown(f"**[{title}]({url})**  \n`{source}` · score {score:.2f}")
+        st.caption(snippet(text, query))
+        with st.expander("요약 보기"):
+            st.markdown(text)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Full-text index over cached summaries.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("rebuild", help="Rebuild the index from all summary stores.")
+
+    search_parser = subparsers.add_parser("search", help="Search the index.")
+    search_parser.add_argument("query")
+    search_parser.add_argument("-k", type=int, default=10)
+
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        for source, data_dir in SOURCES.items():
+            start = time.perf_counter()
+            count = index.rebuild(open_store(data_dir), source)
+            print(f"{source}: indexed {count} summaries in {time.perf_counter() - start:.1f}s")
+    elif args.command == "search":
+        start = time.perf_counter()
+        results = index.search(args.query, args.k)
+        elapsed = time.perf_counter() - start
+        for source, name, title, score in results:
+            print(f"{score:6.2f}  {source:8s} {title}  {source_url(source, name)}")
+        print(f"{len(results)} results in {elapsed * 1e3:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import unittest
+from chat_view import preview
+
+
+class PreviewTest(unittest.TestCase):
+    def test_short_message(self):
+        self.assertIsNone(preview("짧은 메시지", 100))
+
+    def test_cuts_at_paragraph_outside_code_block(self):
+        content = "첫 문단이다.\n\n```python\nx = 1\n\ny = 2\n" + "z = 3\n" * 50 + "```\n\n끝."
+        self.assertEqual(preview(content, 100), "첫 문단이다.")
+
+    def test_falls_back_to_line_boundary(self):
+        content = "첫 줄이다.\n둘째 줄이다.\n$$\na + b\n\n" + "c\n" * 100 + "$$\n"
+        self.assertEqual(preview(content, 100), "첫 줄이다.\n둘째 줄이다.")
+
+    def test_closes_block_longer_than_preview(self):
+        content = "```\n" + "line\n\n" * 100 + "```\n"
+        short = preview(content, 100)
+        self.assertTrue(short.endswith("\n```"))
+        self.assertEqual(short.count("```") % 2, 0)
+
+        content = "$$\n" + "a = b \\\\\n\n" * 100 + "$$\n"
+        short = preview(content, 100)
+        self.assertTrue(short.endswith("\n$$"))
+        self.assertEqual(short.count("$$") % 2, 0)
+
+    def test_one_line_math_is_not_a_block(self):
+        content = "$$ x^2 $$\n\n" + "본문이다.\n" * 30
+        self.assertEqual(preview(content, 100), "$$ x^2 $$")
+
+    def test_math_block_closed_at_end_of_line(self):
+        content = "$$\n\\frac{a}{b} $$\n\n" + "본문이다.\n" * 30
+        self.assertEqual(preview(content, 100), "$$\n\\frac{a}{b} $$")
+
+
+if __name__ == "__main__":
+    unittest.main()
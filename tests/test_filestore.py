@@ -0,0 +1,116 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import metrics
+from blobstore import BlobStore
+from filestore import FileStore, SqliteStore, migrate
+
+
+class StoreRoundTripMixin:
+    """
+    FileStore, SqliteStore, BlobStore가 같은 인터페이스로 동작하는지 확인한다.
+    """
+
+    def make_store(self, root: str):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = self.make_store(self.tmp.name)
+
+    def tearDown(self):
+        close = getattr(self.store, "close", None)
+        if close:
+            close()
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        name = "https://arxiv.org/pdf/2506.21384?v=1"
+        self.assertIsNone(self.store[name])
+        self.assertNotIn(name, self.store)
+
+        self.store[name] = "# 요약\n\n- $x^2$ 항목"
+        self.assertEqual(self.store[name], "# 요약\n\n- $x^2$ 항목")
+        self.assertIn(name, self.store)
+        self.assertEqual(list(self.store.keys()), [name])
+        self.assertEqual(len(self.store), 1)
+
+        self.store[name] = "updated"
+        self.assertEqual(self.store[name], "updated")
+
+        self.store[name] = None
+        self.assertIsNone(self.store[name])
+        self.assertEqual(len(self.store), 0)
+
+    def test_many(self):
+        self.store.set_many({"a": "1", "b": "2", "c": "3"})
+        self.store.set_many([("b", None)])
+        self.assertEqual(self.store.get_many(["a", "b", "c", "missing"]), {"a": "1", "c": "3"})
+        self.assertEqual(sorted(self.store.keys()), ["a", "c"])
+
+    def test_listeners(self):
+        events = []
+        self.store.add_listener(lambda name, data: events.append((name, data)))
+        self.store["doc"] = "text"
+        self.store["doc"] = None
+        self.assertEqual(events, [("doc", "text"), ("doc", None)])
+
+
+class FileStoreTest(StoreRoundTripMixin, unittest.TestCase):
+    def make_store(self, root: str):
+        return FileStore(os.path.join(root, "files"))
+
+    def test_migrate(self):
+        self.store.set_many({"a": "1", "b": "2"})
+        db_path = os.path.join(self.tmp.name, "files.sqlite3")
+        self.assertEqual(migrate(self.store.data_dir, db_path), 2)
+
+        sqlite_store = SqliteStore(db_path)
+        try:
+            self.assertEqual(sqlite_store.get_many(["a", "b"]), {"a": "1", "b": "2"})
+        finally:
+            sqlite_store.close()
+
+
+class SqliteStoreTest(StoreRoundTripMixin, unittest.TestCase):
+    def make_store(self, root: str):
+        return SqliteStore(os.path.join(root, "store.sqlite3"))
+
+
+class BlobStoreTest(StoreRoundTripMixin, unittest.TestCase):
+    def make_store(self, root: str):
+        return BlobStore(os.path.join(root, "blobs"))
+
+    def test_lzma_codec(self):
+        store = BlobStore(os.path.join(self.tmp.name, "lzma"), codec="lzma")
+        store["doc"] = "압축 " * 1000
+        self.assertEqual(store["doc"], "압축 " * 1000)
+        self.assertEqual(BlobStore(store.root)["doc"], "압축 " * 1000)
+
+    def test_same_content_shares_blob(self):
+        self.store["a"] = "same text"
+        self.store["b"] = "same text"
+        self.assertEqual(self.store.usage()["blobs"], 1)
+
+    def test_gc_removes_unreferenced_blobs(self):
+        self.store["a"] = "first"
+        self.store["b"] = "second"
+        self.store["a"] = None
+
+        with mock.patch.object(BlobStore, "GC_GRACE_SECONDS", -1):
+            self.assertEqual(self.store.gc()["removed_blobs"], 1)
+        self.assertEqual(self.store["b"], "second")
+        self.assertEqual(self.store.refcounts(), {self.store._parse_pointer(self.store._read_file("b"))[1]: 1})
+
+    def test_refcounts_do_not_count_as_lookups(self):
+        self.store["a"] = "same text"
+        self.store["b"] = "same text"
+
+        before = metrics.registry.caches().get(self.store.data_dir)
+        self.assertEqual(list(self.store.refcounts().values()), [2])
+        self.assertEqual(metrics.registry.caches().get(self.store.data_dir), before)
+
+
+if __name__ == "__main__":
+    unittest.main()
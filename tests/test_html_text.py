@@ -0,0 +1,28 @@
+import unittest
+from html_text import MIN_MAIN_CHARS, reduce_html
+
+
+class ReduceHtmlTest(unittest.TestCase):
+    def test_keeps_header_inside_article(self):
+        body = "본문 " * MIN_MAIN_CHARS
+        html = ("<html><body><header><a href='/'>Site menu</a></header>"
+                f"<article><header><h1>Paper title</h1></header><p>{body}</p>"
+                "<footer>Posted by author</footer></article>"
+                "<footer>Copyright site</footer></body></html>")
+
+        text = reduce_html(html, "https://example.com/")
+        self.assertIn("# Paper title", text)
+        self.assertIn("Posted by author", text)
+        self.assertNotIn("Site menu", text)
+        self.assertNotIn("Copyright site", text)
+
+    def test_skips_page_header_without_article(self):
+        html = "<body><header>Site menu</header><p>content</p><footer>Copyright</footer></body>"
+        text = reduce_html(html)
+        self.assertIn("content", text)
+        self.assertNotIn("Site menu", text)
+        self.assertNotIn("Copyright", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
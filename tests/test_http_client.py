@@ -0,0 +1,141 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import http_client
+from http_client import FetchResult, ValidatorStore
+
+
+class Page:
+    """
+    ETag로 조건부 GET에 답하는 테스트 서버의 문서. 받은 If-None-Match 헤더를 기록한다.
+    """
+
+    def __init__(self):
+        self.etag = '"v1"'
+        self.body = b"first version"
+        self.requests = []
+
+
+def serve(page: Page) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/old":
+                self.send_response(302)
+                self.send_header("Location", "/doc")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            page.requests.append(self.headers.get("If-None-Match"))
+            if self.headers.get("If-None-Match") == page.etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; charset=utf-8")
+            self.send_header("Content-Length", str(len(page.body)))
+            self.send_header("ETag", page.etag)
+            self.end_headers()
+            self.wfile.write(page.body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class FetchTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.validators = http_client.validators
+        http_client.validators = ValidatorStore(self.tmp.name)
+
+        self.page = Page()
+        self.server = serve(self.page)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/doc"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        http_client.validators = self.validators
+        self.tmp.cleanup()
+
+    def test_revalidation(self):
+        first = http_client.fetch(self.url)
+        self.assertEqual((first.status_code, first.content, first.from_cache), (200, b"first version", False))
+
+        again = http_client.fetch(self.url)
+        self.assertEqual((again.content, again.from_cache), (b"first version", True))
+        self.assertEqual(self.page.requests, [None, '"v1"'])
+
+        self.page.etag = '"v2"'
+        self.page.body = b"second version"
+        changed = http_client.fetch(self.url)
+        self.assertEqual((changed.content, changed.from_cache), (b"second version", False))
+        self.assertEqual(http_client.fetch(self.url).from_cache, True)
+        self.assertEqual(self.page.requests[2:], ['"v1"', '"v2"'])
+
+    def test_redirect_keeps_final_url(self):
+        old_url = self.url.replace("/doc", "/old")
+        first = http_client.fetch(old_url)
+        self.assertEqual(first.url, self.url)
+
+        again = http_client.fetch(old_url)
+        self.assertEqual((again.url, again.from_cache), (self.url, True))
+        self.assertEqual(self.page.requests, [None, '"v1"'])
+
+    def test_without_revalidate(self):
+        http_client.fetch(self.url)
+        result = http_client.fetch(self.url, revalidate=False)
+        self.assertFalse(result.from_cache)
+        self.assertEqual(self.page.requests, [None, None])
+
+
+class ValidatorStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def result(self, url: str, size: int) -> FetchResult:
+        return FetchResult(url, 200, {"ETag": '"x"'}, b"x" * size)
+
+    def test_evicts_least_recently_used(self):
+        store = ValidatorStore(self.tmp.name, max_bytes=3000, max_body_bytes=2000)
+        store.save(self.result("a", 1000))
+        store.save(self.result("b", 1000))
+
+        # a를 읽으면 b가 더 오래 사용하지 않은 응답이 된다.
+        past = time.time() - 60
+        os.utime(store._path("a", ".body"), (past, past))
+        os.utime(store._path("b", ".body"), (past + 1, past + 1))
+        self.assertIsNotNone(store.load("a"))
+
+        store.save(self.result("c", 1000))
+        self.assertIsNone(store.load("b"))
+        self.assertIsNotNone(store.load("a"))
+        self.assertIsNotNone(store.load("c"))
+        self.assertEqual(store.evictions, 1)
+        self.assertFalse(os.path.exists(store._path("b", ".json")))
+
+    def test_overwrite_counts_size_once(self):
+        store = ValidatorStore(self.tmp.name, max_bytes=10000, max_body_bytes=2000)
+        store.save(self.result("a", 1000))
+        store.save(self.result("a", 1000))
+        store.save(self.result("b", 1000))
+        self.assertEqual(store._total_bytes, sum(size for _, size, _ in store._scan()))
+
+    def test_large_body_not_stored(self):
+        store = ValidatorStore(self.tmp.name, max_bytes=3000, max_body_bytes=2000)
+        store.save(self.result("big", 2500))
+        self.assertIsNone(store.load("big"))
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
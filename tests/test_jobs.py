@@ -0,0 +1,141 @@
+import threading
+import time
+import unittest
+from jobs import JobCancelled, JobQueue
+
+
+class Producer:
+    """
+    release()할 때마다 청크를 하나씩 내보내는 producer. 몇 개를 만들었는지 센다.
+    """
+
+    def __init__(self, count: int = 5):
+        self.count = count
+        self.produced = 0
+        self._ready = threading.Semaphore(0)
+
+    def release(self, n: int = 1) -> None:
+        for _ in range(n):
+            self._ready.release()
+
+    def __call__(self, task):
+        for index in range(self.count):
+            if not self._ready.acquire(timeout=5):
+                raise TimeoutError("The test did not release the producer.")
+            self.produced += 1
+            yield f"chunk{index} "
+
+
+def wait_until(condition, timeout: float = 2.0) -> bool:
+    end = time.monotonic() + timeout
+    while not condition() and time.monotonic() < end:
+        time.sleep(0.01)
+    return condition()
+
+
+class JobQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.queue = JobQueue(max_running=1)
+
+    def test_same_key_shares_task(self):
+        producer = Producer()
+        first = self.queue.submit("doc", "A", producer)
+        second = self.queue.submit("doc", "B", Producer())
+
+        self.assertIsNot(first, second)
+        self.assertIs(first.task, second.task)
+        producer.release(5)
+        self.assertEqual("".join(second.stream()), "".join(f"chunk{i} " for i in range(5)))
+
+    def test_cancel_detaches_only_one_subscriber(self):
+        producer = Producer()
+        first = self.queue.submit("doc", "A", producer)
+        second = self.queue.submit("doc", "B", producer)
+
+        first.cancel()
+        self.assertEqual(first.state, "cancelled")
+        self.assertFalse(first.active)
+        with self.assertRaises(JobCancelled):
+            list(first.stream())
+
+        producer.release(5)
+        self.assertEqual(len("".join(second.stream()).split()), 5)
+        self.assertEqual(second.state, "done")
+        self.assertEqual(producer.produced, 5)
+
+    def test_last_cancel_stops_producer(self):
+        producer = Producer()
+        first = self.queue.submit("doc", "A", producer)
+        second = self.queue.submit("doc", "B", producer)
+
+        producer.release()
+        self.assertTrue(wait_until(lambda: first.flight.chunks))
+        first.cancel()
+        second.cancel()
+        producer.release(4)
+
+        self.assertTrue(wait_until(lambda: first.flight.done))
+        self.assertIsInstance(first.flight.error, JobCancelled)
+        self.assertLess(producer.produced, 5)
+        self.assertIsNone(self.queue.running("doc"))
+
+    def test_resubmit_after_cancel_rejoins_running_task(self):
+        producer = Producer()
+        first = self.queue.submit("doc", "A", producer)
+        first.cancel()
+        again = self.queue.submit("doc", "A", Producer())
+
+        self.assertIs(again.task, first.task)
+        producer.release(5)
+        self.assertEqual(len("".join(again.stream()).split()), 5)
+
+    def test_resubmit_after_stop_starts_new_task(self):
+        producer = Producer()
+        first = self.queue.submit("doc", "A", producer)
+        first.cancel()
+        producer.release()
+        self.assertTrue(wait_until(lambda: first.flight.done))
+
+        replacement = Producer()
+        again = self.queue.submit("doc", "A", replacement)
+        self.assertIsNot(again.task, first.task)
+        replacement.release(5)
+        self.assertEqual(len("".join(again.stream()).split()), 5)
+
+    def test_cancel_while_queued(self):
+        blocker = Producer()
+        running = self.queue.submit("busy", "busy", blocker)
+        self.assertTrue(wait_until(lambda: running.state == "running"))
+
+        queued = self.queue.submit("doc", "A", Producer())
+        self.assertEqual(queued.state, "queued")
+        queued.cancel()
+        self.assertTrue(wait_until(lambda: queued.flight.done))
+        self.assertIsInstance(queued.flight.error, JobCancelled)
+
+        blocker.release(5)
+        self.assertEqual(len("".join(running.stream()).split()), 5)
+
+    def test_cancel_inside_stage(self):
+        stage_calls = []
+
+        def producer(task):
+            # 청크를 내기 전의 긴 단계(내려받기 등)에서 check_cancel을 호출한다.
+            task.info["stage"] = "downloading"
+            while True:
+                task.stop_if_cancelled()
+                stage_calls.append(1)
+                time.sleep(0.01)
+            yield "never"
+
+        job = self.queue.submit("doc", "A", producer)
+        self.assertTrue(wait_until(lambda: stage_calls))
+        self.assertEqual(job.progress()["stage"], "downloading")
+
+        job.cancel()
+        self.assertTrue(wait_until(lambda: job.flight.done, timeout=1))
+        self.assertIsInstance(job.flight.error, JobCancelled)
+
+
+if __name__ == "__main__":
+    unittest.main()
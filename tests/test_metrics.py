@@ -0,0 +1,23 @@
+import unittest
+from metrics import Registry
+
+
+class PrometheusTextTest(unittest.TestCase):
+    def test_label_values_are_escaped(self):
+        registry = Registry(jsonl_path=None)
+        registry.inc("cache_requests_total", cache='C:\\data\\"arxiv"\nx', result="hit")
+
+        line = registry.prometheus_text().splitlines()[1]
+        self.assertEqual(line, 'cache_requests_total{cache="C:\\\\data\\\\\\"arxiv\\"\\nx",result="hit"} 1')
+
+    def test_histogram_labels(self):
+        registry = Registry(jsonl_path=None)
+        registry.observe("arxiv.ttft", 0.2)
+
+        text = registry.prometheus_text()
+        self.assertIn('le="0.25"} 1', text)
+        self.assertIn('le="+Inf"} 1', text)
+
+
+if __name__ == "__main__":
+    unittest.main()
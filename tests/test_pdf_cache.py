@@ -0,0 +1,34 @@
+import tempfile
+import unittest
+from pdf_cache import PageCache
+
+
+class PageCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = PageCache(self.tmp.name, max_bytes=10000)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def scanned_bytes(self) -> int:
+        return sum(size for _, size, _ in self.cache._scan())
+
+    def test_pages_round_trip(self):
+        self.cache.put_page("doc", 0, "first")
+        self.cache.put_page("doc", 1, "second")
+        self.cache.set_num_pages("doc", 2)
+        self.assertEqual(self.cache.get_num_pages("doc"), 2)
+        self.assertEqual(list(self.cache.iter_pages("doc")), ["first", "second"])
+
+    def test_overwrite_counts_size_once(self):
+        self.cache.put_page("doc", 0, "x" * 1000)
+        self.cache.put_page("doc", 0, "x" * 1000)
+        self.cache.put_page("doc", 0, "x" * 500)
+        self.cache.set_num_pages("doc", 1)
+        self.cache.set_num_pages("doc", 1)
+        self.assertEqual(self.cache.stats()["bytes"], self.scanned_bytes())
+
+
+if __name__ == "__main__":
+    unittest.main()
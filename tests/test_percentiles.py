@@ -0,0 +1,20 @@
+import math
+import unittest
+from percentiles import percentile
+
+
+class PercentileTest(unittest.TestCase):
+    def test_nearest_rank(self):
+        values = [5, 1, 4, 2, 3]
+        self.assertEqual(percentile(values, 0), 1)
+        self.assertEqual(percentile(values, 50), 3)
+        self.assertEqual(percentile(values, 99), 5)
+        self.assertEqual(percentile(values, 100), 5)
+        self.assertEqual(values, [5, 1, 4, 2, 3])
+
+    def test_empty(self):
+        self.assertTrue(math.isnan(percentile([], 50)))
+
+
+if __name__ == "__main__":
+    unittest.main()
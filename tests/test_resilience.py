@@ -0,0 +1,199 @@
+import threading
+import time
+import unittest
+from unittest import mock
+from model_backend import FakeModel
+from resilience import CircuitBreaker, CircuitOpenError, ResilientModel
+
+
+class ScriptedModel(FakeModel):
+    """
+    error가 설정되어 있으면 첫 청크 전에 그 예외를 발생시키는 FakeModel.
+    delays가 있으면 요청마다 차례로 꺼내 첫 청크까지의 시간으로 쓰고, 끝까지 읽지 않고 닫힌 스트림 수를 센다.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__("fake-test", ttft=0, tokens_per_sec=0, response_tokens=16, **kwargs)
+        self.error = None
+        self.delays = []
+        self.closed = 0
+
+    def generate_content(self, contents, stream: bool = False, **kwargs):
+        if self.error is not None:
+            raise self.error
+        if stream and self.delays:
+            return self._delayed(self.delays.pop(0))
+        return super().generate_content(contents, stream=stream, **kwargs)
+
+    def _delayed(self, delay: float):
+        time.sleep(delay)
+        finished = False
+        try:
+            yield from self._stream()
+            finished = True
+        finally:
+            if not finished:
+                self.closed += 1
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker(failures=2, seconds=0.05)
+        self.fake = ScriptedModel()
+        self.model = ResilientModel(self.fake, retries=0, ttft_deadline=5, breaker=self.breaker)
+
+    def generate(self) -> str:
+        return "".join(chunk.text for chunk in self.model.generate_content("hello", stream=True))
+
+    def open_breaker(self) -> None:
+        self.fake.error_rate = 1.0
+        for _ in range(2):
+            with self.assertRaises(Exception) as context:
+                self.generate()
+            self.assertNotIsInstance(context.exception, CircuitOpenError)
+        self.fake.error_rate = 0.0
+        self.assertEqual(self.breaker.state, "open")
+
+    def wait_for_half_open(self) -> None:
+        time.sleep(self.breaker.seconds * 1.5)
+
+    def test_closed_stays_closed_below_threshold(self):
+        self.fake.error_rate = 1.0
+        with self.assertRaises(Exception):
+            self.generate()
+        self.fake.error_rate = 0.0
+        self.assertTrue(self.generate())
+        self.assertEqual(self.breaker.state, "closed")
+
+    def test_open_rejects_requests(self):
+        self.open_breaker()
+        with self.assertRaises(CircuitOpenError):
+            self.generate()
+
+    def test_successful_trial_closes(self):
+        self.open_breaker()
+        self.wait_for_half_open()
+        self.assertTrue(self.generate())
+        self.assertEqual(self.breaker.state, "closed")
+
+    def test_failed_trial_reopens(self):
+        self.open_breaker()
+        self.wait_for_half_open()
+        self.fake.error_rate = 1.0
+        with self.assertRaises(Exception) as context:
+            self.generate()
+        self.assertNotIsInstance(context.exception, CircuitOpenError)
+        self.assertEqual(self.breaker.state, "open")
+
+    def test_non_retryable_trial_closes(self):
+        self.open_breaker()
+        self.wait_for_half_open()
+        self.fake.error = ValueError("bad request")
+        with self.assertRaises(ValueError):
+            self.generate()
+        self.assertEqual(self.breaker.state, "closed")
+
+    def test_empty_trial_closes(self):
+        self.open_breaker()
+        self.wait_for_half_open()
+        self.fake.response_tokens = 0
+        self.assertEqual(self.generate(), "")
+        self.assertEqual(self.breaker.state, "closed")
+
+    def test_interrupted_trial_reopens(self):
+        self.open_breaker()
+        self.wait_for_half_open()
+        self.fake.error = KeyboardInterrupt()
+        with self.assertRaises(KeyboardInterrupt):
+            self.model.generate_content("hello")
+        self.assertEqual(self.breaker.state, "open")
+
+    def test_only_one_trial_at_a_time(self):
+        self.open_breaker()
+        self.wait_for_half_open()
+        self.fake.ttft = 0.2
+
+        results = []
+        trial = threading.Thread(target=lambda: results.append(self.generate()))
+        trial.start()
+        time.sleep(0.05)
+        self.assertEqual(self.breaker.state, "half-open")
+        with self.assertRaises(CircuitOpenError):
+            self.generate()
+
+        trial.join()
+        self.assertTrue(results[0])
+        self.assertEqual(self.breaker.state, "closed")
+
+
+class HedgingTest(unittest.TestCase):
+    def wait_for(self, condition, timeout: float = 2.0) -> bool:
+        end = time.monotonic() + timeout
+        while not condition() and time.monotonic() < end:
+            time.sleep(0.01)
+        return condition()
+
+    def test_losing_attempt_is_closed(self):
+        fake = ScriptedModel()
+        fake.delays = [0.3, 0.0]
+        model = ResilientModel(fake, retries=0, ttft_deadline=5, hedge_percentile=50)
+        model._ttfts.extend([0.02] * 20)
+
+        text = "".join(chunk.text for chunk in model.generate_content("hello", stream=True))
+        self.assertTrue(text)
+        self.assertTrue(self.wait_for(lambda: fake.closed == 1))
+        self.assertTrue(self.wait_for(lambda: not any(
+            thread.name == "model-attempt" for thread in threading.enumerate())))
+
+    def test_timed_out_attempt_is_closed(self):
+        fake = ScriptedModel()
+        fake.delays = [0.3]
+        model = ResilientModel(fake, retries=0, ttft_deadline=0.1)
+
+        with self.assertRaises(TimeoutError):
+            model.generate_content("hello", stream=True)
+        self.assertTrue(self.wait_for(lambda: fake.closed == 1))
+
+    def test_cancel_while_waiting_for_first_chunk(self):
+        fake = ScriptedModel()
+        fake.delays = [0.5]
+        breaker = CircuitBreaker(failures=1, seconds=60)
+        model = ResilientModel(fake, retries=2, ttft_deadline=5, breaker=breaker)
+
+        cancelled = threading.Event()
+        threading.Timer(0.05, cancelled.set).start()
+
+        def check_cancel():
+            if cancelled.is_set():
+                raise InterruptedError("cancelled")
+
+        start = time.monotonic()
+        with self.assertRaises(InterruptedError):
+            model.generate_content("hello", stream=True, check_cancel=check_cancel)
+        self.assertLess(time.monotonic() - start, 0.4)
+        self.assertEqual(breaker.state, "closed")
+        self.assertTrue(self.wait_for(lambda: fake.closed == 1))
+
+
+class RetryTest(unittest.TestCase):
+    def test_cancel_during_backoff(self):
+        fake = ScriptedModel()
+        fake.error = ConnectionError("unavailable")
+        model = ResilientModel(fake, retries=3, breaker=CircuitBreaker(failures=10, seconds=60))
+
+        cancelled = threading.Event()
+        threading.Timer(0.05, cancelled.set).start()
+
+        def check_cancel():
+            if cancelled.is_set():
+                raise InterruptedError("cancelled")
+
+        start = time.monotonic()
+        with mock.patch("resilience.backoff", return_value=5.0):
+            with self.assertRaises(InterruptedError):
+                model.generate_content("hello", check_cancel=check_cancel)
+        self.assertLess(time.monotonic() - start, 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import threading
+import unittest
+from singleflight import SingleFlight, peek
+
+
+class RecordingJournal:
+    interval = 0.0
+
+    def __init__(self):
+        self.records = {}
+
+    def write(self, key: str, text: str) -> None:
+        self.records[key] = text
+
+    def clear(self, key: str) -> None:
+        self.records.pop(key, None)
+
+
+class SingleFlightTest(unittest.TestCase):
+    def setUp(self):
+        self.flights = SingleFlight()
+        self.release = threading.Event()
+        self.calls = 0
+
+    def producer(self, error: Exception = None):
+        def produce(flight):
+            self.calls += 1
+            yield "first "
+            self.release.wait(5)
+            yield "second"
+            if error:
+                raise error
+        return produce
+
+    def test_joins_running_flight(self):
+        completed = []
+        first = self.flights.join("key", self.producer(), on_complete=completed.append)
+        second = self.flights.join("key", self.producer(), on_complete=completed.append)
+
+        self.assertIs(first, second)
+        self.assertEqual(first.subscribers, 2)
+        self.assertEqual(len(self.flights), 1)
+
+        self.release.set()
+        self.assertEqual("".join(first.stream()), "first second")
+        self.assertEqual("".join(second.stream()), "first second")
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(completed, ["first second"])
+
+    def test_new_flight_after_finish(self):
+        self.release.set()
+        first = self.flights.join("key", self.producer())
+        "".join(first.stream())
+
+        second = self.flights.join("key", self.producer())
+        self.assertIsNot(first, second)
+        "".join(second.stream())
+        self.assertEqual(self.calls, 2)
+
+    def test_error_reaches_subscribers_and_keeps_partial_text(self):
+        errors = []
+        journal = RecordingJournal()
+        flight = self.flights.join("key", self.producer(ValueError("boom")),
+                                   journal=journal, journal_key="doc", on_error=errors.append)
+        self.release.set()
+
+        chunks = []
+        with self.assertRaises(ValueError):
+            for chunk in flight.stream():
+                chunks.append(chunk)
+
+        self.assertEqual(chunks, ["first ", "second"])
+        self.assertEqual([str(e) for e in errors], ["boom"])
+        self.assertEqual(journal.records, {"doc": "first second"})
+        self.assertIsNone(self.flights.get("key"))
+
+    def test_journal_cleared_on_success(self):
+        journal = RecordingJournal()
+        self.release.set()
+        flight = self.flights.join("key", self.producer(), journal=journal, journal_key="doc")
+        "".join(flight.stream())
+        self.assertEqual(journal.records, {})
+
+    def test_peek(self):
+        self.assertEqual(list(peek(iter(["a", "b"]))), ["a", "b"])
+        self.assertEqual(list(peek(iter([]))), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
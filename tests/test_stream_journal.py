@@ -0,0 +1,74 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from filestore import FileStore
+from stream_journal import StreamJournal, continue_guide, resume_contents
+
+
+class StreamJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.partial = FileStore(os.path.join(self.tmp.name, "partial"))
+        self.complete = FileStore(os.path.join(self.tmp.name, "complete"))
+        self.journal = StreamJournal(self.partial, stale_seconds=5, version="v1")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_other(self, text: str, age: float = 0.0, version: str = "v1") -> None:
+        # 다른 프로세스가 남긴 부분 결과.
+        self.partial["doc"] = json.dumps({"state": "partial", "text": text, "updated": time.time() - age,
+                                          "owner": "other-host:1", "version": version})
+
+    def test_write_load_clear(self):
+        self.journal.write("doc", "부분 결과")
+        record = self.journal.load("doc")
+        self.assertEqual((record["state"], record["text"]), ("partial", "부분 결과"))
+
+        self.assertIsNone(StreamJournal(self.partial, version="v2").load("doc"))
+
+        self.journal.clear("doc")
+        self.assertIsNone(self.journal.load("doc"))
+
+    def test_is_live(self):
+        self.journal.write("doc", "text")
+        self.assertFalse(self.journal.is_live(self.journal.load("doc")))
+
+        self.write_other("text")
+        self.assertTrue(self.journal.is_live(self.journal.load("doc")))
+
+        self.write_other("text", age=10)
+        self.assertFalse(self.journal.is_live(self.journal.load("doc")))
+
+    def test_tail_follows_until_complete(self):
+        self.write_other("first ")
+        tail = self.journal.tail("doc", self.complete, poll_interval=0.01)
+        self.assertEqual(next(tail), "first ")
+
+        self.write_other("first second ")
+        self.assertEqual(next(tail), "second ")
+
+        self.complete["doc"] = "first second third"
+        self.journal.clear("doc")
+        self.assertEqual(list(tail), ["third"])
+
+    def test_tail_stops_when_writer_is_gone(self):
+        self.write_other("first ", age=10)
+        tail = self.journal.tail("doc", self.complete, poll_interval=0.01)
+        self.assertEqual(next(tail), "first ")
+        with self.assertRaises(RuntimeError):
+            next(tail)
+
+    def test_resume_contents(self):
+        contents = [{"role": "user", "parts": ["summarize"]}]
+        self.assertIs(resume_contents(contents, ""), contents)
+        self.assertEqual(resume_contents(contents, "partial")[1:], [
+            {"role": "model", "parts": ["partial"]},
+            {"role": "user", "parts": [continue_guide]},
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from filestore import FileStore
+from summary_cache import SummaryCache
+
+
+class SummaryCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.store = FileStore(os.path.join(root, "summaries"))
+        self.cache = SummaryCache(
+            self.store, FileStore(os.path.join(root, "versions")), FileStore(os.path.join(root, "meta")),
+            "guide", "test")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_versions_coexist(self):
+        self.cache.put("doc", "old summary", "model-a")
+        self.assertEqual(self.cache.get("doc", "model-a"), ("old summary", True))
+        self.assertEqual(self.cache.get("doc", "model-b"), ("old summary", False))
+
+        self.cache.put("doc", "new summary", "model-b")
+        self.assertEqual(self.cache.get("doc", "model-b"), ("new summary", True))
+        self.assertEqual(self.cache.get("doc", "model-a"), ("old summary", True))
+        self.assertEqual(self.store["doc"], "new summary")
+
+    def test_prompt_change_is_stale(self):
+        self.cache.put("doc", "summary", "model-a")
+        other = SummaryCache(self.store, self.cache.versions_store, self.cache.meta_store, "new guide", "test")
+        self.assertEqual(other.get("doc", "model-a"), ("summary", False))
+
+    def test_miss(self):
+        self.assertEqual(self.cache.get("missing", "model-a"), (None, False))
+
+    def test_gc_drops_only_superseded_versions(self):
+        self.cache.put("doc", "old", "model-a")
+        self.cache.put("doc", "new", "model-b")
+        self.cache.put("only-old", "old", "model-a")
+
+        stats = self.cache.gc("model-b")
+        self.assertEqual(stats["superseded"], 1)
+        self.assertEqual(self.cache.get("doc", "model-a"), ("new", False))
+        self.assertEqual(self.cache.get("only-old", "model-b"), ("old", False))
+        self.assertEqual(self.cache.versions(), {self.cache.version("model-a"): 1, self.cache.version("model-b"): 1})
+
+    def test_gc_dry_run_and_min_age(self):
+        self.cache.put("doc", "old", "model-a")
+        self.cache.put("doc", "new", "model-b")
+
+        self.assertEqual(self.cache.gc("model-b", min_age_days=1)["superseded"], 0)
+        self.assertEqual(self.cache.gc("model-b", dry_run=True)["superseded"], 1)
+        self.assertEqual(self.cache.get("doc", "model-a"), ("old", True))
+
+    def test_failure_backoff(self):
+        self.assertEqual(self.cache.retry_after("doc", "model-a"), 0)
+
+        self.cache.record_failure("doc", "model-a", RuntimeError("boom"))
+        first = self.cache.retry_after("doc", "model-a")
+        self.assertGreater(first, 0)
+        self.cache.record_failure("doc", "model-a", RuntimeError("boom"))
+        self.assertGreater(self.cache.retry_after("doc", "model-a"), first)
+
+        # 실패 기록은 backoff가 끝나기 전에는 gc로 지우지 않고, 성공하면 지워진다.
+        self.assertEqual(self.cache.gc("model-a")["orphaned"], 0)
+        self.cache.put("doc", "summary", "model-a")
+        self.assertEqual(self.cache.retry_after("doc", "model-a"), 0)
+
+    def test_expired_failure_is_orphaned(self):
+        self.cache.record_failure("doc", "model-a", RuntimeError("boom"))
+        key = self.cache.key("doc", "model-a")
+        meta = self.cache.meta(key)
+        meta["failed_at"] = time.time() - 3600
+        self.cache.meta_store[key] = json.dumps(meta)
+        self.assertEqual(self.cache.gc("model-a")["orphaned"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import os
+import tempfile
+import unittest
+from filestore import FileStore
+from summary_search import SearchIndex
+
+
+class SearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.index = SearchIndex(os.path.join(self.tmp.name, "search.sqlite3"))
+        self.store = FileStore(os.path.join(self.tmp.name, "summaries"))
+
+    def tearDown(self):
+        self.index.close()
+        self.tmp.cleanup()
+
+    def test_rebuild_after_concurrent_update(self):
+        self.store["a"] = "# Attention\n\nfirst"
+        self.store["b"] = "# Gradient\n\nsecond"
+
+        # listener가 rebuild의 batch 사이에 같은 문서를 먼저 색인한 경우.
+        get_many = self.store.get_many
+
+        def racing_get_many(names):
+            self.index.update("arxiv", "a", "# Attention\n\nfirst")
+            return get_many(names)
+
+        self.store.get_many = racing_get_many
+        self.assertEqual(self.index.rebuild(self.store, "arxiv", batch_size=1), 2)
+        self.assertEqual(self.index.count("arxiv"), 2)
+
+        # 연결이 트랜잭션 안에 남아 있지 않아야 이후 갱신이 반영된다.
+        self.index.update("arxiv", "b", "# Transformer\n\nthird")
+        self.assertEqual([row[1] for row in self.index.search("transformer")], ["b"])
+
+    def test_ranks_all_matches(self):
+        self.index.update("arxiv", "old", "# Attention attention\n\nattention")
+        for i in range(1200):
+            self.index.update("arxiv", f"new{i}", f"# Paper {i}\n\nattention appears once among many other words")
+
+        self.assertEqual(self.index.search("attention", k=1)[0][1], "old")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+from youtube_transcript_api import TranscriptsDisabled
+import transcripts
+from filestore import FileStore
+
+
+class GetTranscriptTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(transcripts, "store", FileStore(os.path.join(self.tmp.name, "transcripts")))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_stores_transcript(self):
+        segments = [{"text": "hello", "start": 0.0, "duration": 2.0}]
+        with mock.patch.object(transcripts, "fetch_segments", return_value=segments) as fetch:
+            self.assertEqual(transcripts.get_transcript("vid").text, "[0:00:00] hello\n")
+            self.assertEqual(transcripts.get_transcript("vid").text, "[0:00:00] hello\n")
+        self.assertEqual(fetch.call_count, 1)
+
+    def test_no_captions_marker(self):
+        with mock.patch.object(transcripts, "fetch_segments", side_effect=TranscriptsDisabled("vid")) as fetch:
+            self.assertFalse(transcripts.get_transcript("vid"))
+            self.assertFalse(transcripts.get_transcript("vid"))
+        self.assertEqual(fetch.call_count, 1)
+
+        # 다시 확인할 시간이 지나면 새로 내려받는다.
+        transcripts.store["vid"] = f"{transcripts.HEADER}{transcripts.NO_CAPTIONS}{int(time.time()) - 10}\n"
+        segments = [{"text": "captions added", "start": 0.0, "duration": 2.0}]
+        with mock.patch.object(transcripts, "NO_CAPTIONS_RETRY_SECONDS", 5), \
+                mock.patch.object(transcripts, "fetch_segments", return_value=segments):
+            self.assertEqual(transcripts.get_transcript("vid").text, "[0:00:00] captions added\n")
+
+    def test_transient_error_not_stored(self):
+        with mock.patch.object(transcripts, "fetch_segments", side_effect=ConnectionError("offline")):
+            with self.assertRaises(ConnectionError):
+                transcripts.get_transcript("vid")
+        self.assertIsNone(transcripts.store["vid"])
+
+
+if __name__ == "__main__":
+    unittest.main()
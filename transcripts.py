@@ -0,0 +1,216 @@
+import bisect
+import os
+import re
+import time
+from filestore import open_store
+
+
+# 저장 형식이 바뀌면 올린다. 첫 줄의 버전이 다르면 스크립트를 다시 내려받는다.
+FORMAT_VERSION = 1
+HEADER = f"# youtube transcript v{FORMAT_VERSION}\n"
+
+# 자막 조각을 이 길이(초) 정도의 블록으로 합친다. 블록마다 시작 시각을 붙인다.
+BLOCK_SECONDS = 30
+
+# 긴 영상을 나누어 요약하거나 질문할 때 쓰는 구간 길이(초).
+PAGE_SECONDS = 600
+
+LANGUAGES = ("ko", "en")
+
+# 자막이 없는 영상은 머리말 뒤에 이 표시와 확인한 시각만 저장한다.
+NO_CAPTIONS = "# no captions "
+
+# 자막이 없던 영상은 이 시간(초)이 지나면 다시 확인한다. 업로드 뒤에 자동 자막이 생길 수 있다.
+NO_CAPTIONS_RETRY_SECONDS = int(os.getenv("TRANSCRIPT_NO_CAPTIONS_RETRY", str(24 * 3600)))
+
+BLOCK_PATTERN = re.compile(r"^\[(\d+):(\d\d):(\d\d)\] ", re.MULTILINE)
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def format_time(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def parse_time(text: str) -> float:
+    """
+    "1:02:03", "12:34", "75" 형식의 시각을 초로 바꾼다.
+    """
+
+    seconds = 0.0
+    for field in text.strip().split(":"):
+        seconds = seconds * 60 + float(field)
+    return seconds
+
+
+def compact(segments, block_seconds: float = BLOCK_SECONDS) -> str:
+    """
+    자막 조각 목록({"text", "start", "duration"})을 시작 시각이 붙은 블록으로 합친다.
+    공백을 정리하고, 자동 자막에서 앞 조각과 같거나 겹치는 부분은 한 번만 남긴다.
+
+        # youtube transcript v1
+        [0:00:00] 첫 30초 정도의 자막 ...
+        [0:00:31] 다음 블록 ...
+    """
+
+    lines = [HEADER.rstrip("\n")]
+    block_start = None
+    block = []
+    previous = ""
+
+    def flush():
+        if block:
+            lines.append(f"[{format_time(block_start)}] " + " ".join(block))
+
+    for segment in segments:
+        text = WHITESPACE_PATTERN.sub(" ", segment["text"]).strip()
+        if not text or text == previous:
+            continue
+
+        # 앞 조각을 다시 보여 주며 이어지는 자막은 새로 붙은 부분만 남긴다.
+        if previous and text.startswith(previous):
+            text = text[len(previous):].strip()
+            previous = WHITESPACE_PATTERN.sub(" ", segment["text"]).strip()
+            if not text:
+                continue
+        else:
+            previous = text
+
+        start = float(segment.get("start", 0.0))
+        if block_start is None or start - block_start >= block_seconds:
+            flush()
+            block_start = start
+            block = []
+        block.append(text)
+
+    flush()
+    return "\n".join(lines) + "\n"
+
+
+class Transcript:
+    """
+    compact() 형식의 스크립트. 블록의 시작 시각은 slice()나 pages()를 처음 부를 때 색인한다.
+    """
+
+    def __init__(self, text: str):
+        # 머리말 줄은 모델에 보내지 않는다.
+        self.text = text[len(HEADER):] if text.startswith(HEADER) else text
+        if self.text.startswith(NO_CAPTIONS):
+            self.text = ""
+        self._starts = None
+        self._offsets = None
+
+    def _index(self) -> None:
+        if self._starts is not None:
+            return
+
+        self._starts = []
+        self._offsets = []
+        for match in BLOCK_PATTERN.finditer(self.text):
+            hours, minutes, seconds = map(int, match.groups())
+            self._starts.append(hours * 3600 + minutes * 60 + seconds)
+            self._offsets.append(match.start())
+
+    def __bool__(self) -> bool:
+        return bool(self.text.strip())
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    @property
+    def duration(self) -> float:
+        """
+        마지막 블록의 시작 시각. 영상 길이의 근삿값이다.
+        """
+
+        self._index()
+        return self._starts[-1] if self._starts else 0.0
+
+    def slice(self, start: float = None, end: float = None) -> "Transcript":
+        """
+        start초부터 end초 전까지 시작하는 블록만 담은 Transcript를 반환.
+        """
+
+        self._index()
+        if not self._starts:
+            return self
+
+        first = 0 if start is None else max(0, bisect.bisect_right(self._starts, start) - 1)
+        last = len(self._starts) if end is None else bisect.bisect_left(self._starts, end)
+        stop = self._offsets[last] if last < len(self._offsets) else len(self.text)
+        return Transcript(self.text[self._offsets[first]:stop] if first < last else "")
+
+    def pages(self, page_seconds: float = PAGE_SECONDS) -> list:
+        """
+        page_seconds 단위의 구간 텍스트 목록을 반환. map_reduce에 페이지로 넘긴다.
+        """
+
+        self._index()
+        if not self._starts:
+            return [self.text] if self else []
+
+        pages = []
+        first = 0
+        for index, start in enumerate(self._starts):
+            if start - self._starts[first] >= page_seconds:
+                pages.append(self.text[self._offsets[first]:self._offsets[index]])
+                first = index
+        pages.append(self.text[self._offsets[first]:])
+        return pages
+
+    def plain_text(self) -> str:
+        return BLOCK_PATTERN.sub("", self.text)
+
+
+def fetch_segments(video_id: str, languages=LANGUAGES) -> list:
+    """
+    YouTube에서 자막 조각 목록을 내려받는다. youtube_transcript_api의 이전/이후 API를 모두 지원한다.
+    """
+
+    from youtube_transcript_api import YouTubeTranscriptApi
+
+    if hasattr(YouTubeTranscriptApi, "get_transcript"):
+        return YouTubeTranscriptApi.get_transcript(video_id, languages=languages)
+    return YouTubeTranscriptApi().fetch(video_id, languages=languages).to_raw_data()
+
+
+# 원본 스크립트 저장소. 요약과 따로 저장하므로 요약 지침을 바꾸거나 질문할 때 다시 내려받지 않는다.
+store = open_store("data/youtube_transcript")
+
+
+def _fetch_text(video_id: str) -> str:
+    from youtube_transcript_api import NoTranscriptFound, TranscriptsDisabled
+
+    try:
+        return compact(fetch_segments(video_id))
+    except (NoTranscriptFound, TranscriptsDisabled):
+        return f"{HEADER}{NO_CAPTIONS}{int(time.time())}\n"
+
+
+def _should_refetch(text: str) -> bool:
+    if text is None or not text.startswith(HEADER):
+        return True
+
+    body = text[len(HEADER):]
+    if not body.startswith(NO_CAPTIONS):
+        return False
+    try:
+        checked = float(body[len(NO_CAPTIONS):])
+    except ValueError:
+        return True
+    return time.time() - checked > NO_CAPTIONS_RETRY_SECONDS
+
+
+def get_transcript(video_id: str) -> Transcript:
+    """
+    저장된 스크립트를 반환하고, 없거나 형식 버전이 다르면 내려받아 저장한다.
+    자막이 없는 영상은 확인한 시각을 저장하여 NO_CAPTIONS_RETRY_SECONDS 동안 빈 스크립트를 반환한다.
+    네트워크 오류처럼 일시적인 실패는 저장하지 않는다.
+    """
+
+    text = store[video_id]
+    if _should_refetch(text):
+        text = _fetch_text(video_id)
+        store[video_id] = text
+    return Transcript(text)